@@ -0,0 +1,140 @@
+import logging
+from typing import Callable, List, NamedTuple, Optional, Sequence, Tuple
+
+import pyopencl as cl
+
+from core.config import MAX_LOCAL_WORK_SIZE, VECTOR_WIDTHS, HostSetting
+from core.opencl.cache import get_program_binaries
+from core.opencl.manager import DEFAULT_DEVICE_FILTER, get_vector_width
+from core.opencl.profile import DeviceProfile
+from core.searcher import Searcher, get_build_options
+
+DEFAULT_TARGET_SECONDS = 0.1
+LOCAL_WORK_SIZES = (32, 64, 128, MAX_LOCAL_WORK_SIZE)
+KEYS_PER_ITEM_CHOICES = (1, 2, 4, 8)
+BUILD_OPTION_CHOICES: Tuple[Tuple[str, ...], ...] = ((), ("-cl-mad-enable",))
+# blocks large enough for any launch the target duration allows
+TUNE_ITERATION_BITS = 40
+
+
+class Variant(NamedTuple):
+    """
+    A kernel build to tune: keys per work item, vector lanes and extra flags
+    """
+
+    keys_per_item: int
+    vector_width: int
+    build_options: Tuple[str, ...]
+
+
+def get_variants(
+    device: cl.Device,
+    keys_per_item_choices: Sequence[int] = KEYS_PER_ITEM_CHOICES,
+    build_option_choices: Sequence[Tuple[str, ...]] = BUILD_OPTION_CHOICES,
+) -> List[Variant]:
+    """
+    Scalar kernels for every keys_per_item choice, plus the vector kernels up
+    to the native width on CPUs, each with every set of build options
+    """
+    kernels = [(keys_per_item, 1) for keys_per_item in keys_per_item_choices]
+    native_width = get_vector_width(device)
+    kernels += [
+        (width, width) for width in VECTOR_WIDTHS if 1 < width <= native_width
+    ]
+    return [
+        Variant(keys_per_item, vector_width, tuple(options))
+        for keys_per_item, vector_width in kernels
+        for options in build_option_choices
+    ]
+
+
+def tune_launch(
+    time_launch: Callable[[int], float], granule: int, target_seconds: float
+) -> Tuple[int, float]:
+    """
+    Largest launch, doubled from granule keys, that completes within
+    target_seconds, and its keys per second. The first launch only warms up.
+    """
+    time_launch(granule)
+    size = granule
+    elapsed = time_launch(size)
+    # a launch of twice the size runs about twice as long
+    while elapsed * 2 <= target_seconds:
+        doubled = time_launch(size * 2)
+        if doubled > target_seconds:
+            break
+        size, elapsed = size * 2, doubled
+    return size, size / elapsed
+
+
+def tune_device(
+    index: int,
+    device: cl.Device,
+    kernel_source: str,
+    variants: Sequence[Variant],
+    local_work_sizes: Sequence[int] = LOCAL_WORK_SIZES,
+    target_seconds: float = DEFAULT_TARGET_SECONDS,
+    chosen_devices: Optional[Tuple[int, List[int]]] = None,
+    device_filter: str = DEFAULT_DEVICE_FILTER,
+) -> Optional[DeviceProfile]:
+    """
+    Measure every variant at every work group size the device allows and
+    return the fastest, None when nothing could run
+    """
+    best: Optional[DeviceProfile] = None
+    for variant in variants:
+        setting = HostSetting(
+            kernel_source,
+            TUNE_ITERATION_BITS,
+            keys_per_item=variant.keys_per_item,
+            vector_width=variant.vector_width,
+        )
+        setting.build_options = variant.build_options
+        setting.use_profile = False
+        try:
+            binary = get_program_binaries(
+                [device], kernel_source, get_build_options(setting)
+            )[0]
+        except cl.Error as e:
+            logging.warning(f"{device.name}: {variant} does not build: {e}")
+            continue
+        for local_work_size in local_work_sizes:
+            if local_work_size > device.max_work_group_size:
+                continue
+            setting.local_work_size = local_work_size
+            searcher = Searcher(
+                kernel_source,
+                index,
+                setting,
+                chosen_devices,
+                binary,
+                device_filter,
+            )
+            try:
+                launch_keys, speed = tune_launch(
+                    searcher.time_launch,
+                    variant.keys_per_item * local_work_size,
+                    target_seconds,
+                )
+            except cl.Error as e:
+                logging.info(f"{device.name}: {variant} local {local_work_size}: {e}")
+                continue
+            finally:
+                searcher.close()
+            logging.info(
+                f"{device.name}: keys per item {variant.keys_per_item}, vector "
+                f"width {variant.vector_width}, options "
+                f"{' '.join(variant.build_options) or '-'}, local "
+                f"{local_work_size}: {speed / 1e6:.3f} MH/s, {launch_keys} keys "
+                "per launch"
+            )
+            if best is None or speed > best.speed:
+                best = DeviceProfile(
+                    local_work_size,
+                    variant.keys_per_item,
+                    variant.vector_width,
+                    variant.build_options,
+                    launch_keys,
+                    speed,
+                )
+    return best
@@ -0,0 +1,252 @@
+import hashlib
+import json
+import logging
+import platform
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import pyopencl as cl
+
+from core.autotune import tune_launch
+from core.config import HostSetting
+from core.opencl.cache import compile_binary, device_identity
+from core.opencl.manager import DEFAULT_DEVICE_FILTER, get_vector_width
+from core.searcher import Searcher, get_build_options
+from core.utils.helpers import load_kernel_source, load_runtime_kernel_source
+from core.utils.pattern import build_pattern_table
+
+DEFAULT_CASE_SECONDS = 2.0
+DEFAULT_THRESHOLD = 0.1
+# launches of about this long, so that a case runs many of them
+LAUNCH_SECONDS = 0.1
+BENCH_ITERATION_BITS = 40
+RESULT_VERSION = 1
+
+Metrics = Dict[str, float]
+
+
+class BenchCase(NamedTuple):
+    name: str
+    starts_with: Tuple[str, ...]
+    ends_with: Tuple[str, ...]
+    is_case_sensitive: bool
+
+
+# pattern lengths, case sensitivity and numbers of prefixes, all searched with
+# the runtime pattern kernel so one build per variant serves every case
+DEFAULT_CASES = (
+    BenchCase("prefix2", ("Wa",), (), True),
+    BenchCase("prefix3", ("Wat",), (), True),
+    BenchCase("prefix4", ("Wate",), (), True),
+    BenchCase("prefix3-nocase", ("Wat",), (), False),
+    BenchCase(
+        "prefix3x8",
+        ("Wat", "Dun", "Spi", "Arr", "Kes", "Fre", "Mua", "Cha"),
+        (),
+        True,
+    ),
+    BenchCase("suffix3", (), ("abc",), True),
+)
+# HostSetting arguments of every variant but the vector kernel, whose width
+# depends on the device, and the match histogram, which is not an argument
+VARIANT_ARGS: Dict[str, Dict[str, object]] = {
+    "scalar": {},
+    "keys4": {"keys_per_item": 4},
+    "radix51": {"field": "radix51"},
+    "wide-table": {"base_table": "wide"},
+    "variable-time": {"lookup": "variable-time"},
+    "local-table": {"lookup": "variable-time", "table_memory": "local"},
+}
+VARIANTS = (
+    "scalar",
+    "keys4",
+    "vector",
+    "radix51",
+    "wide-table",
+    "variable-time",
+    "local-table",
+    "match-histogram",
+)
+
+
+class Regression(NamedTuple):
+    metric: str
+    baseline: float
+    current: float
+
+    @property
+    def change(self) -> float:
+        return self.current / self.baseline - 1
+
+
+def higher_is_better(metric: str) -> bool:
+    """
+    Throughputs are reported in keys per second, everything else in seconds
+    """
+    return metric.endswith("keys_per_second")
+
+
+def case_seed(name: str, iteration_bits: int = BENCH_ITERATION_BITS) -> bytearray:
+    """
+    Fixed seed of a case, the iteration bytes zeroed as in HostSetting
+    """
+    iteration_bytes = (iteration_bits + 7) // 8
+    digest = hashlib.sha256(name.encode()).digest()
+    return bytearray(digest[: 32 - iteration_bytes] + bytes(iteration_bytes))
+
+
+def time_call(function: Callable[[], object], min_seconds: float = 0.2) -> float:
+    """
+    Mean seconds per call, repeated until min_seconds have passed
+    """
+    calls = 0
+    start_time = time.perf_counter()
+    while True:
+        function()
+        calls += 1
+        elapsed = time.perf_counter() - start_time
+        if elapsed >= min_seconds:
+            return elapsed / calls
+
+
+def bench_host() -> Metrics:
+    setting = HostSetting("", 24)
+    many = DEFAULT_CASES[4]
+    return {
+        "host/load_kernel_source_seconds": time_call(
+            lambda: load_kernel_source(("Wat",), (), True)
+        ),
+        "host/load_runtime_kernel_source_seconds": time_call(
+            load_runtime_kernel_source
+        ),
+        "host/build_pattern_table_seconds": time_call(
+            lambda: build_pattern_table(many.starts_with, (), False)
+        ),
+        "host/increase_key32_seconds": time_call(setting.increase_key32),
+    }
+
+
+def variant_setting(
+    variant: str, device: cl.Device, kernel_source: str
+) -> Optional[HostSetting]:
+    """
+    Setting of a named kernel variant, None when the device has no use for it
+    """
+    table = build_pattern_table(("Wa",), (), True)
+    if variant in VARIANT_ARGS:
+        setting = HostSetting(
+            kernel_source, BENCH_ITERATION_BITS, table, **VARIANT_ARGS[variant]
+        )
+    elif variant == "vector":
+        width = get_vector_width(device)
+        if width == 1:
+            return None
+        setting = HostSetting(
+            kernel_source, BENCH_ITERATION_BITS, table, vector_width=width
+        )
+    elif variant == "match-histogram":
+        # the default kernel, prefilters included, counting match depths
+        setting = HostSetting(kernel_source, BENCH_ITERATION_BITS, table)
+        setting.match_histogram = True
+    else:
+        raise ValueError(f"Unknown variant {variant!r}, expected one of {VARIANTS}")
+    # measure the variant itself, not a tuned profile
+    setting.use_profile = False
+    return setting
+
+
+def bench_case(searcher: Searcher, case: BenchCase, seconds: float) -> float:
+    """
+    Keys per second of searcher over seconds of back to back launches
+    """
+    searcher.set_pattern_table(
+        build_pattern_table(case.starts_with, case.ends_with, case.is_case_sensitive)
+    )
+    searcher.setting.key32[:] = case_seed(case.name)
+    # restart the range at the case's seed
+    searcher.set_work_range(searcher.work_range)
+    # fills the pipeline, not timed
+    searcher.find(False)
+    launches = 0
+    start_time = time.perf_counter()
+    while True:
+        searcher.find(False)
+        launches += 1
+        elapsed = time.perf_counter() - start_time
+        if elapsed >= seconds:
+            return launches * searcher.setting.launch_keys / elapsed
+
+
+def bench_device(
+    index: int,
+    device: cl.Device,
+    cases: Sequence[BenchCase] = DEFAULT_CASES,
+    variants: Sequence[str] = VARIANTS,
+    seconds: float = DEFAULT_CASE_SECONDS,
+    chosen_devices: Optional[Tuple[int, List[int]]] = None,
+    device_filter: str = DEFAULT_DEVICE_FILTER,
+) -> Metrics:
+    kernel_source = load_runtime_kernel_source()
+    name = device.name.strip()
+    metrics: Metrics = {}
+    for variant in variants:
+        setting = variant_setting(variant, device, kernel_source)
+        if setting is None:
+            continue
+        start_time = time.perf_counter()
+        # compiled from source every time, the cache would hide the build
+        binary = compile_binary(device, kernel_source, get_build_options(setting))
+        metrics[f"{name}/{variant}/build_seconds"] = time.perf_counter() - start_time
+        searcher = Searcher(
+            kernel_source, index, setting, chosen_devices, binary, device_filter
+        )
+        try:
+            searcher.set_work_range((0, setting.global_work_size))
+            setting.launch_keys, _ = tune_launch(
+                searcher.time_launch,
+                setting.keys_per_item * setting.local_work_size,
+                LAUNCH_SECONDS,
+            )
+            for case in cases:
+                speed = bench_case(searcher, case, seconds)
+                metrics[f"{name}/{variant}/{case.name}/keys_per_second"] = speed
+                logging.info(f"{name} {variant} {case.name}: {speed / 1e6:.3f} MH/s")
+        finally:
+            searcher.close()
+    return metrics
+
+
+def bench_result(metrics: Metrics, devices: Sequence[cl.Device]) -> Dict:
+    return {
+        "version": RESULT_VERSION,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "host": {"python": platform.python_version(), "machine": platform.machine()},
+        "devices": [device_identity(device) for device in devices],
+        "metrics": metrics,
+    }
+
+
+def load_metrics(path: str) -> Metrics:
+    with open(path) as f:
+        return json.load(f)["metrics"]
+
+
+def compare_metrics(
+    baseline: Metrics, current: Metrics, threshold: float = DEFAULT_THRESHOLD
+) -> List[Regression]:
+    """
+    Metrics of both runs that got worse by more than threshold, a fraction of
+    the baseline
+    """
+    regressions = []
+    for metric, base in sorted(baseline.items()):
+        value = current.get(metric)
+        if value is None or base <= 0:
+            continue
+        if higher_is_better(metric):
+            worse = value < base * (1 - threshold)
+        else:
+            worse = value > base * (1 + threshold)
+        if worse:
+            regressions.append(Regression(metric, base, value))
+    return regressions
@@ -1,19 +1,98 @@
+import json
 import logging
 import multiprocessing
 import sys
-from multiprocessing.pool import Pool
+from contextlib import nullcontext
 from typing import List, Optional, Tuple
 
 import click
 import pyopencl as cl
+from click.core import ParameterSource
 
-from core.config import DEFAULT_ITERATION_BITS, HostSetting
+from core.autotune import (
+    BUILD_OPTION_CHOICES,
+    DEFAULT_TARGET_SECONDS,
+    KEYS_PER_ITEM_CHOICES,
+    LOCAL_WORK_SIZES,
+    get_variants,
+    tune_device,
+)
+from core.bench import (
+    DEFAULT_CASE_SECONDS,
+    DEFAULT_CASES,
+    DEFAULT_THRESHOLD,
+    VARIANTS,
+    bench_device,
+    bench_host,
+    bench_result,
+    compare_metrics,
+    load_metrics,
+)
+from core.config import (
+    BASE_TABLES,
+    DEFAULT_BASE_TABLE,
+    DEFAULT_FIELD,
+    DEFAULT_ITERATION_BITS,
+    DEFAULT_LOOKUP,
+    DEFAULT_TABLE_MEMORY,
+    FIELDS,
+    LOOKUPS,
+    MAX_ITERATION_BITS,
+    MAX_KEYS_PER_ITEM,
+    TABLE_MEMORIES,
+    VALID_LOCAL_WORK_SIZES,
+    VECTOR_WIDTHS,
+    HostSetting,
+)
+from core.driver import (
+    DRIVERS,
+    create_driver,
+    get_settings_binaries,
+    measure_work_ranges,
+)
+from core.metrics import DEFAULT_METRICS_HOST, serve_metrics
+from core.opencl.cache import get_cache_dir
 from core.opencl.manager import (
-    get_all_gpu_devices,
+    DEFAULT_DEVICE_FILTER,
+    DEVICE_FILTERS,
+    DEVICE_TYPES,
+    filter_devices,
+    get_all_devices,
     get_chosen_devices,
+    get_selected_devices,
+    get_vector_width,
+)
+from core.opencl.profile import apply_profile, profiled_speed, save_profile
+from core.utils.checkpoint import (
+    DEFAULT_CHECKPOINT_SECONDS,
+    Checkpoint,
+    CheckpointState,
+    SearchJob,
+    load_checkpoint,
+    resume_allocator,
+)
+from core.utils.counters import (
+    SearchCounters,
+    expected_rates,
+    format_acceptance,
+    total_match_depths,
 )
-from core.searcher import multi_gpu_init, save_result
-from core.utils.helpers import check_character, load_kernel_source
+from core.utils.crypto import get_public_key_from_private_bytes, save_keypair
+from core.utils.helpers import (
+    check_character,
+    check_pattern_odds,
+    load_kernel_source,
+    load_runtime_kernel_source,
+)
+from core.utils.keyspace import KeyspaceAllocator
+from core.utils.odds import (
+    describe_eta,
+    describe_odds,
+    prefilter_probability,
+    time_to_hits,
+)
+from core.utils.pattern import build_pattern_table
+from core.utils.trace import HOST_PID, Tracer
 
 logging.basicConfig(level="INFO", format="[%(levelname)s %(asctime)s] %(message)s")
 
@@ -34,8 +113,9 @@ def cli():
 @click.option(
     "--ends-with",
     type=str,
-    default="",
-    help="Public key ends with the indicated suffix.",
+    default=[],
+    help="Public key ends with the indicated suffix. Provide multiple arguments to search for multiple suffixes.",
+    multiple=True,
 )
 @click.option("--count", type=int, default=1, help="Count of pubkeys to generate.")
 @click.option(
@@ -49,25 +129,177 @@ def cli():
     default=False,
     help="Select OpenCL device manually",
 )
+@click.option(
+    "--device-type",
+    type=click.Choice(DEVICE_FILTERS),
+    default=DEFAULT_DEVICE_FILTER,
+    help="OpenCL devices to search on. auto uses the GPUs, or every device when "
+    "there is no GPU.",
+)
+@click.option(
+    "--partition",
+    type=click.Choice(["dynamic", "measured", "even"]),
+    default="dynamic",
+    help="dynamic hands every launch the next chunk of one shared keyspace, "
+    "sized to the device's recent speed. measured and even give each device a "
+    "fixed share of the iteration space, in proportion to the throughput "
+    "measured before the search or evenly.",
+)
 @click.option(
     "--iteration-bits",
-    type=int,
+    type=click.IntRange(0, MAX_ITERATION_BITS),
     default=DEFAULT_ITERATION_BITS,
-    help="Iteration bits (e.g., 24, 26, 28, etc.)",
+    help="Iteration bits (e.g., 24, 26, 28, etc.): each seed covers 2^bits keys.",
 )
 @click.option(
     "--is-case-sensitive", type=bool, default=True, help="Case sensitive search flag."
 )
+@click.option(
+    "--runtime-pattern/--no-runtime-pattern",
+    default=False,
+    help="Upload the pattern at runtime so one cached kernel build serves every pattern.",
+)
+@click.option(
+    "--keys-per-item",
+    type=click.Choice(["1", "2", "4", "8", "16"]),
+    default="1",
+    help="Keys derived by each work item, their points share one field inversion.",
+)
+@click.option(
+    "--base-table",
+    type=click.Choice(BASE_TABLES),
+    default=DEFAULT_BASE_TABLE,
+    help="Fixed-base table: ref10's constant time radix-16 one, or a radix-256 one "
+    "with half the point additions and no doublings. wide is faster but leaks the "
+    "found keys through timing and cache side channels: only use it on hardware "
+    "nobody else can observe.",
+)
+@click.option(
+    "--field",
+    type=click.Choice(FIELDS),
+    default=DEFAULT_FIELD,
+    help="Field arithmetic: ref10's 32-bit limbs, or 51-bit limbs for devices "
+    "with fast 64-bit multiplies.",
+)
+@click.option(
+    "--lookup",
+    type=click.Choice(LOOKUPS),
+    default=DEFAULT_LOOKUP,
+    help="ref10 table lookups. variable-time is faster but leaks the found keys "
+    "through timing and cache side channels: only use it on hardware nobody "
+    "else can observe.",
+)
+@click.option(
+    "--table-memory",
+    type=click.Choice(TABLE_MEMORIES),
+    default=DEFAULT_TABLE_MEMORY,
+    help="Keep the ref10 table in constant memory, or copy it to local memory "
+    "per work group. local requires --lookup variable-time.",
+)
+@click.option(
+    "--vector-width",
+    type=click.Choice(["auto"] + [str(width) for width in VECTOR_WIDTHS]),
+    default="auto",
+    help="Keys per work item in vector lanes, 1 for the scalar kernel. auto uses "
+    "the native width on CPU devices and the scalar kernel on GPUs.",
+)
+@click.option(
+    "--profile/--no-profile",
+    default=True,
+    help="Use the settings autotune stored for each device, unless a kernel "
+    "variant is chosen explicitly.",
+)
+@click.option(
+    "--driver",
+    type=click.Choice(DRIVERS),
+    default="process",
+    help="Run one process per device, or every device on threads of this process.",
+)
+@click.option(
+    "--trace",
+    type=click.Path(dir_okay=False, writable=True),
+    default=None,
+    help="Write a Chrome trace of every launch, copy and host phase to this "
+    "file, for chrome://tracing or ui.perfetto.dev.",
+)
+@click.option(
+    "--metrics-port",
+    type=click.IntRange(0, 65535),
+    default=None,
+    help="Serve exact per-device counters in the Prometheus text format on "
+    "this port, at /metrics.",
+)
+@click.option(
+    "--metrics-host",
+    type=str,
+    default=DEFAULT_METRICS_HOST,
+    help="Address the metrics endpoint listens on, 0.0.0.0 for every interface.",
+)
+@click.option(
+    "--match-histogram/--no-match-histogram",
+    default=False,
+    help="Count keys by how many pattern characters they matched, and report "
+    "the measured acceptance rate of the prefilters and of every character "
+    "behind them. Runs the same prefilters as a normal search, compare the "
+    "speed with main.py bench --variant match-histogram.",
+)
+@click.option(
+    "--checkpoint",
+    type=click.Path(dir_okay=False, writable=True),
+    default=None,
+    help="Periodically write the searched keyspace and saved hits to this file, "
+    "so that --resume can continue the search.",
+)
+@click.option(
+    "--checkpoint-interval",
+    type=click.FloatRange(min=0),
+    default=DEFAULT_CHECKPOINT_SECONDS,
+    help="Seconds between checkpoints.",
+)
+@click.option(
+    "--resume/--no-resume",
+    default=False,
+    help="Continue the search of --checkpoint where it stopped, with its "
+    "pattern, count and iteration bits.",
+)
 def search_pubkey(
     starts_with,
     ends_with,
     count,
     output_dir,
     select_device,
+    device_type,
+    partition,
     iteration_bits,
     is_case_sensitive,
+    runtime_pattern,
+    keys_per_item,
+    base_table,
+    field,
+    lookup,
+    table_memory,
+    vector_width,
+    profile,
+    driver,
+    trace,
+    metrics_port,
+    metrics_host,
+    match_histogram,
+    checkpoint,
+    checkpoint_interval,
+    resume,
 ):
     """Search for Solana vanity pubkeys."""
+    resumed = None
+    if resume:
+        resumed = load_resumed(
+            checkpoint,
+            SearchJob(starts_with, ends_with, is_case_sensitive, iteration_bits, count),
+        )
+        starts_with, ends_with, is_case_sensitive, iteration_bits, count = resumed.job
+    if checkpoint is not None and partition != "dynamic":
+        logging.error("--checkpoint needs the dynamic partition")
+        sys.exit(1)
     if not starts_with and not ends_with:
         click.echo("Please provide at least one of --starts-with or --ends-with.")
         ctx = click.get_current_context()
@@ -76,58 +308,485 @@ def search_pubkey(
 
     for prefix in starts_with:
         check_character("starts_with", prefix)
-    check_character("ends_with", ends_with)
+    for suffix in ends_with:
+        check_character("ends_with", suffix)
+    # impossible patterns are rejected before anything is built
+    odds = check_pattern_odds(starts_with, ends_with, is_case_sensitive)
 
     chosen_devices: Optional[Tuple[int, List[int]]] = None
     if select_device:
-        chosen_devices = get_chosen_devices()
-        gpu_counts = len(chosen_devices[1])
+        chosen_devices = get_chosen_devices(device_type)
+        devices = get_selected_devices(*chosen_devices, device_type)
     else:
-        gpu_counts = len(get_all_gpu_devices())
+        devices = get_all_devices(device_type)
+    if not devices:
+        logging.error(f"No {device_type} OpenCL devices found")
+        sys.exit(1)
 
     logging.info(
-        "Searching Solana pubkey with starts_with=(%s), ends_with=%s, is_case_sensitive=%s",
+        "Searching Solana pubkey with starts_with=(%s), ends_with=(%s), is_case_sensitive=%s",
         ", ".join(repr(s) for s in starts_with),
-        repr(ends_with),
+        ", ".join(repr(s) for s in ends_with),
         is_case_sensitive,
     )
-    logging.info(f"Using {gpu_counts} OpenCL device(s)")
+    logging.info(f"Every key matches with odds of {describe_odds(odds)}")
+    logging.info(
+        f"Using {len(devices)} OpenCL device(s): "
+        + ", ".join(device.name for device in devices)
+    )
+    if lookup == "variable-time" or base_table == "wide":
+        logging.warning(
+            "Variable-time table lookups: the keys found leak through timing and "
+            "cache side channels of the device running the search"
+        )
+
+    if runtime_pattern:
+        kernel_source = load_runtime_kernel_source()
+        pattern_table = build_pattern_table(starts_with, ends_with, is_case_sensitive)
+    else:
+        kernel_source = load_kernel_source(starts_with, ends_with, is_case_sensitive)
+        pattern_table = None
+    # the vector kernel only covers the default field and table
+    scalar_only = (int(keys_per_item), base_table, field, lookup) != (
+        1,
+        "ref10",
+        "ref10",
+        "constant-time",
+    )
+
+    def new_setting(width: int) -> HostSetting:
+        return HostSetting(
+            kernel_source,
+            iteration_bits,
+            pattern_table,
+            int(keys_per_item),
+            base_table,
+            field,
+            lookup,
+            table_memory,
+            vector_width=width,
+        )
+
+    # hits still missing
+    remaining = count - (0 if resumed is None else len(resumed.hits))
+    if remaining <= 0:
+        logging.info(f"All {count} pubkey(s) of {checkpoint} were already found")
+        return
+
+    settings = []
+    speed = profiled_speed(devices)
+    if speed is not None:
+        logging.info(
+            f"{remaining} pubkey(s) at the profiled {speed / 1e6:.2f} MH/s: "
+            + describe_eta(time_to_hits(odds.probability, speed, remaining))
+        )
+    for device in devices:
+        setting = new_setting(1 if vector_width == "auto" else int(vector_width))
+        setting.use_profile = profile
+        # an autotuned profile replaces the default kernel, auto vector widths
+        # included; before anything is built so every worker agrees
+        tuned = apply_profile(setting, device) is not None
+        if not tuned and vector_width == "auto" and not scalar_only:
+            setting = new_setting(get_vector_width(device))
+            setting.use_profile = False
+        setting.match_histogram = match_histogram
+        settings.append(setting)
+    tracer = None
+    if trace is not None:
+        tracer = Tracer(trace)
+        tracer.name_process(HOST_PID, "Host", {0: "main"})
+
+    def trace_span(name: str):
+        return nullcontext() if tracer is None else tracer.span(name, HOST_PID)
+
+    allocator = None
+    granularity = MAX_KEYS_PER_ITEM * max(
+        setting.local_work_size for setting in settings
+    )
+    if resumed is not None:
+        try:
+            allocator = resume_allocator(resumed, len(devices), granularity)
+        except ValueError as e:
+            logging.error(str(e))
+            sys.exit(1)
+    elif partition == "dynamic":
+        allocator = KeyspaceAllocator(iteration_bits, len(devices), granularity)
+    if len(devices) > 1 and partition == "measured":
+        with trace_span("build programs"):
+            binaries = get_settings_binaries(devices, settings)
+        measure_work_ranges(settings, chosen_devices, device_type, binaries)
+    elif driver == "process" and get_cache_dir() is not None:
+        # compile every device in parallel once, workers then load cached binaries
+        with trace_span("build programs"):
+            get_settings_binaries(devices, settings)
+
+    counters = None
+    if metrics_port is not None or match_histogram or checkpoint is not None:
+        counters = SearchCounters(len(devices))
+    if metrics_port is not None:
+        serve_metrics(
+            counters, [device.name for device in devices], metrics_port, metrics_host
+        )
+
+    checkpointer = None
+    if checkpoint is not None:
+        checkpointer = Checkpoint(
+            checkpoint,
+            SearchJob(starts_with, ends_with, is_case_sensitive, iteration_bits, count),
+            allocator,
+            counters,
+            resumed,
+            checkpoint_interval,
+        )
+        checkpointer.save()
+
+    def on_result(result: bytes) -> bool:
+        if checkpointer is not None:
+            pubkey = get_public_key_from_private_bytes(result[1:])
+            if pubkey in checkpointer.hits:
+                logging.info(f"{pubkey} was already found before the search resumed")
+                return False
+        with trace_span("save_keypair"):
+            pubkey = save_keypair(result[1:], output_dir)
+        if checkpointer is None:
+            return True
+        checkpointer.add_hit(pubkey)
+        checkpointer.save()
+        return True
+
+    # one long-lived worker per device streams hits until the target is reached
+    search_driver = create_driver(
+        driver, settings, chosen_devices, device_type, allocator, tracer, counters
+    )
+    search_driver.start()
+    try:
+        results = search_driver.collect(
+            remaining,
+            on_result=on_result,
+            on_chunk=None if checkpointer is None else checkpointer.add_chunk,
+        )
+    finally:
+        if checkpointer is not None:
+            # also after Ctrl-C, with every chunk and hit collected so far
+            logging.info(f"Checkpoint written to {checkpointer.save()}")
+    if match_histogram:
+        pattern_length = max(map(len, starts_with), default=0) + max(
+            map(len, ends_with), default=0
+        )
+        snapshot = counters.snapshot()
+        logging.info(
+            "Measured acceptance per pattern character (expected): "
+            + format_acceptance(
+                total_match_depths(snapshot),
+                pattern_length,
+                expected_rates(starts_with, ends_with, is_case_sensitive),
+                sum(c.prefiltered for c in snapshot),
+                prefilter_probability(starts_with, ends_with, is_case_sensitive),
+            )
+        )
+    if tracer is not None:
+        logging.info(f"Trace written to {tracer.save()}")
+    if len(results) < remaining:
+        logging.error(f"Search stopped after {len(results)} of {remaining} pubkeys")
+        sys.exit(1)
+
+
+def load_resumed(checkpoint: Optional[str], given: SearchJob) -> CheckpointState:
+    """
+    Checkpoint to resume, exits when there is none or the command line asks
+    for a different job than it records
+    """
+    if checkpoint is None:
+        logging.error("--resume needs the --checkpoint to continue")
+        sys.exit(1)
+    try:
+        state = load_checkpoint(checkpoint)
+    except ValueError as e:
+        logging.error(str(e))
+        sys.exit(1)
+    ctx = click.get_current_context()
+    for name, value in given._asdict().items():
+        recorded = getattr(state.job, name)
+        if (
+            ctx.get_parameter_source(name) == ParameterSource.COMMANDLINE
+            and value != recorded
+        ):
+            logging.error(
+                f"--{name.replace('_', '-')} {value!r} differs from {recorded!r} "
+                f"in {checkpoint}"
+            )
+            sys.exit(1)
+    return state
+
+
+@cli.command(context_settings={"show_default": True})
+@click.option(
+    "--select-device/--no-select-device",
+    default=False,
+    help="Select OpenCL device manually",
+)
+@click.option(
+    "--device-type",
+    type=click.Choice(DEVICE_FILTERS),
+    default=DEFAULT_DEVICE_FILTER,
+    help="OpenCL devices to tune, as for search-pubkey.",
+)
+@click.option(
+    "--target-ms",
+    type=click.FloatRange(min=1),
+    default=DEFAULT_TARGET_SECONDS * 1e3,
+    help="Longest kernel launch allowed, bounds cancellation and UI latency.",
+)
+@click.option(
+    "--local-work-size",
+    type=click.Choice([str(size) for size in VALID_LOCAL_WORK_SIZES]),
+    multiple=True,
+    default=[str(size) for size in LOCAL_WORK_SIZES],
+    help="Work group sizes to try.",
+)
+@click.option(
+    "--keys-per-item",
+    type=click.Choice(["1", "2", "4", "8", "16"]),
+    multiple=True,
+    default=[str(k) for k in KEYS_PER_ITEM_CHOICES],
+    help="Scalar kernels to try. CPUs also try the vector kernels.",
+)
+@click.option(
+    "--build-options",
+    type=str,
+    multiple=True,
+    default=[" ".join(options) for options in BUILD_OPTION_CHOICES],
+    help="Compiler flag sets to try, '' for none.",
+)
+@click.option(
+    "--ends-with",
+    type=str,
+    default="So1",
+    help="Pattern of the tuned kernel, the fastest setting rarely depends on it.",
+)
+@click.option(
+    "--save/--no-save",
+    default=True,
+    help="Store the fastest setting as the device's profile for search-pubkey.",
+)
+def autotune(
+    select_device,
+    device_type,
+    target_ms,
+    local_work_size,
+    keys_per_item,
+    build_options,
+    ends_with,
+    save,
+):
+    """Find the fastest work group size, launch size and kernel per device."""
+    check_character("ends_with", ends_with)
+    chosen_devices: Optional[Tuple[int, List[int]]] = None
+    if select_device:
+        chosen_devices = get_chosen_devices(device_type)
+        devices = get_selected_devices(*chosen_devices, device_type)
+    else:
+        devices = get_all_devices(device_type)
+    if not devices:
+        logging.error(f"No {device_type} OpenCL devices found")
+        sys.exit(1)
+
+    kernel_source = load_kernel_source((), ends_with, True)
+    option_sets = [tuple(options.split()) for options in build_options]
+    for index, device in enumerate(devices):
+        variants = get_variants(
+            device, [int(k) for k in keys_per_item], option_sets
+        )
+        best = tune_device(
+            index,
+            device,
+            kernel_source,
+            variants,
+            [int(size) for size in local_work_size],
+            target_ms / 1e3,
+            chosen_devices,
+            device_type,
+        )
+        if best is None:
+            logging.error(f"No setting ran on {device.name}")
+            continue
+        click.echo(
+            f"{device.name}: {best.speed / 1e6:.3f} MH/s with local work size "
+            f"{best.local_work_size}, {best.keys_per_item} keys per item, vector "
+            f"width {best.vector_width}, build options "
+            f"{' '.join(best.build_options) or '-'}, {best.launch_keys} keys per launch"
+        )
+        if save:
+            click.echo(f"  saved to {save_profile(device, best)}")
+
+
+@cli.command(context_settings={"show_default": True})
+@click.option(
+    "--select-device/--no-select-device",
+    default=False,
+    help="Select OpenCL device manually",
+)
+@click.option(
+    "--device-type",
+    type=click.Choice(DEVICE_FILTERS),
+    default=DEFAULT_DEVICE_FILTER,
+    help="OpenCL devices to benchmark, as for search-pubkey.",
+)
+@click.option(
+    "--seconds",
+    type=click.FloatRange(min=0.1),
+    default=DEFAULT_CASE_SECONDS,
+    help="Duration of every benchmark case.",
+)
+@click.option(
+    "--variant",
+    type=click.Choice(VARIANTS),
+    multiple=True,
+    default=VARIANTS,
+    help="Kernel variants to benchmark, vector only runs on CPU devices.",
+)
+@click.option(
+    "--case",
+    "case_names",
+    type=click.Choice([case.name for case in DEFAULT_CASES]),
+    multiple=True,
+    default=[case.name for case in DEFAULT_CASES],
+    help="Patterns to benchmark.",
+)
+@click.option(
+    "--host/--no-host",
+    default=True,
+    help="Also time host overheads: kernel source generation, pattern tables "
+    "and seed increments.",
+)
+@click.option(
+    "--output",
+    type=click.Path(dir_okay=False, writable=True),
+    default=None,
+    help="Write the JSON result to a file instead of stdout.",
+)
+@click.option(
+    "--baseline",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="JSON result of an earlier run to compare against.",
+)
+@click.option(
+    "--threshold",
+    type=click.FloatRange(min=0),
+    default=DEFAULT_THRESHOLD,
+    help="Relative change against the baseline reported as a regression.",
+)
+def bench(
+    select_device,
+    device_type,
+    seconds,
+    variant,
+    case_names,
+    host,
+    output,
+    baseline,
+    threshold,
+):
+    """Benchmark every device with fixed seeds and compare with a baseline."""
+    chosen_devices: Optional[Tuple[int, List[int]]] = None
+    if select_device:
+        chosen_devices = get_chosen_devices(device_type)
+        devices = get_selected_devices(*chosen_devices, device_type)
+    else:
+        devices = get_all_devices(device_type)
+    if not devices:
+        logging.error(f"No {device_type} OpenCL devices found")
+        sys.exit(1)
 
-    result_count = 0
-    with multiprocessing.Manager() as manager:
-        with Pool(processes=gpu_counts) as pool:
-            kernel_source = load_kernel_source(
-                starts_with, ends_with, is_case_sensitive
+    cases = [case for case in DEFAULT_CASES if case.name in case_names]
+    metrics = bench_host() if host else {}
+    for index, device in enumerate(devices):
+        metrics.update(
+            bench_device(
+                index, device, cases, variant, seconds, chosen_devices, device_type
             )
-            lock = manager.Lock()
-            while result_count < count:
-                stop_flag = manager.Value("i", 0)
-                results = pool.starmap(
-                    multi_gpu_init,
-                    [
-                        (
-                            x,
-                            HostSetting(kernel_source, iteration_bits),
-                            gpu_counts,
-                            stop_flag,
-                            lock,
-                            chosen_devices,
-                        )
-                        for x in range(gpu_counts)
-                    ],
-                )
-                result_count += save_result(results, output_dir)
+        )
+    result = json.dumps(bench_result(metrics, devices), indent=2)
+    if output is None:
+        click.echo(result)
+    else:
+        with open(output, "w") as f:
+            f.write(result + "\n")
+
+    if baseline is not None:
+        regressions = compare_metrics(load_metrics(baseline), metrics, threshold)
+        for regression in regressions:
+            logging.error(
+                f"Regression {regression.metric}: {regression.baseline:.6g} -> "
+                f"{regression.current:.6g} ({regression.change:+.1%})"
+            )
+        if regressions:
+            sys.exit(1)
+        logging.info(f"No regression beyond {threshold:.0%} of {baseline}")
+
+
+@cli.command(context_settings={"show_default": True})
+@click.option("--starts-with", type=str, default=[], multiple=True, help="Prefix.")
+@click.option("--ends-with", type=str, default=[], multiple=True, help="Suffix.")
+@click.option("--count", type=int, default=1, help="Count of pubkeys to generate.")
+@click.option(
+    "--is-case-sensitive", type=bool, default=True, help="Case sensitive search flag."
+)
+@click.option(
+    "--throughput",
+    type=click.FloatRange(min=0, min_open=True),
+    default=None,
+    help="Keys per second to estimate the search time at. Defaults to the "
+    "autotuned profiles of the --device-type devices.",
+)
+@click.option(
+    "--device-type",
+    type=click.Choice(DEVICE_FILTERS),
+    default=DEFAULT_DEVICE_FILTER,
+    help="Devices whose profiles give the throughput.",
+)
+def analyze(starts_with, ends_with, count, is_case_sensitive, throughput, device_type):
+    """Show the odds of a pattern and how long finding it takes."""
+    for prefix in starts_with:
+        check_character("starts_with", prefix)
+    for suffix in ends_with:
+        check_character("ends_with", suffix)
+    odds = check_pattern_odds(starts_with, ends_with, is_case_sensitive)
+    if starts_with:
+        click.echo(f"Prefix odds: 1 in {1 / odds.prefix:,.0f}")
+    if ends_with:
+        click.echo(f"Suffix odds: 1 in {1 / odds.suffix:,.0f}")
+    click.echo(f"Pattern odds: {describe_odds(odds)}")
+    click.echo(f"Expected keys for {count}: {count * odds.expected_keys:,.0f}")
+    if throughput is None:
+        throughput = profiled_speed(get_all_devices(device_type))
+    if throughput is None:
+        click.echo("Pass --throughput or run autotune for time estimates.")
+        return
+    eta = time_to_hits(odds.probability, throughput, count)
+    click.echo(f"At {throughput / 1e6:.2f} MH/s: {describe_eta(eta)}")
 
 
 @cli.command(context_settings={"show_default": True})
-def show_device():
+@click.option(
+    "--device-type",
+    type=click.Choice(DEVICE_FILTERS),
+    default=DEFAULT_DEVICE_FILTER,
+    help="Device numbering of search-pubkey --device-type.",
+)
+def show_device(device_type):
     """Show available OpenCL devices."""
     platforms = cl.get_platforms()
     for p_index, platform in enumerate(platforms):
         click.echo(f"Platform {p_index}: {platform.name}")
-        devices = platform.get_devices(device_type=cl.device_type.GPU)
+        devices = filter_devices(platform.get_devices(), device_type)
         for d_index, device in enumerate(devices):
-            click.echo(f"  - Device {d_index}: {device.name}")
+            kind = next(
+                (name for name in ("gpu", "cpu") if device.type & DEVICE_TYPES[name]),
+                "other",
+            )
+            click.echo(f"  - Device {d_index}: {device.name} ({kind})")
 
 
 if __name__ == "__main__":
@@ -1,20 +1,127 @@
 import secrets
 from math import ceil
+from pathlib import Path
+from typing import Optional, Tuple
 
 DEFAULT_ITERATION_BITS = 24
+# the kernel adds 64-bit key offsets to the seed
+MAX_ITERATION_BITS = 64
 DEFAULT_LOCAL_WORK_SIZE = 32
+# largest work group autotune tries
+MAX_LOCAL_WORK_SIZE = 256
+# work group sizes whose launches tile the power-of-two keyspace blocks
+VALID_LOCAL_WORK_SIZES = tuple(1 << i for i in range(MAX_LOCAL_WORK_SIZE.bit_length()))
+DEFAULT_RESULT_CAPACITY = 1024
+DEFAULT_PIPELINE_DEPTH = 2
+DEFAULT_KEYS_PER_ITEM = 1
+# fixed-base multiplication: ref10's constant time radix-16 table in the
+# kernel source, or a radix-256 table uploaded as a buffer
+BASE_TABLES = ("ref10", "wide")
+DEFAULT_BASE_TABLE = "ref10"
+# field arithmetic: ref10's ten 32-bit limbs, or five 51-bit limbs for devices
+# with fast 64-bit multiplies
+FIELDS = ("ref10", "radix51")
+DEFAULT_FIELD = "ref10"
+# ref10 table lookups: constant time scans of every entry, or direct indexing,
+# which leaks the searched keys through side channels of the device
+LOOKUPS = ("constant-time", "variable-time")
+DEFAULT_LOOKUP = "constant-time"
+# address space of ref10's 32KB table with variable-time lookups
+TABLE_MEMORIES = ("constant", "local")
+DEFAULT_TABLE_MEMORY = "constant"
+REF10_TABLE_BYTES = 32 * 8 * 128
+# keys per work item hashed and multiplied together in vector lanes, 1 for
+# the scalar kernel
+VECTOR_WIDTHS = (1, 4, 8)
+DEFAULT_VECTOR_WIDTH = 1
+# work ranges of devices start at multiples of the largest keys_per_item
+MAX_KEYS_PER_ITEM = 256
+# address length byte followed by the 32 byte seed
+RESULT_SIZE = 33
+# match depths counted with match_histogram, the last bin counts deeper
+# matches too
+MATCH_DEPTH_BINS = 16
+DEFAULT_KERNEL_CACHE_DIR = Path.home() / ".cache" / "solana-vanity" / "kernels"
+DEFAULT_PROFILE_DIR = Path.home() / ".cache" / "solana-vanity" / "profiles"
 
 
 class HostSetting:
-    def __init__(self, kernel_source: str, iteration_bits: int):
-        if iteration_bits < 0 or iteration_bits > 255:
-            raise ValueError("iteration_bits must be between 0 and 255")
+    def __init__(
+        self,
+        kernel_source: str,
+        iteration_bits: int,
+        pattern_table: Optional[bytes] = None,
+        keys_per_item: int = DEFAULT_KEYS_PER_ITEM,
+        base_table: str = DEFAULT_BASE_TABLE,
+        field: str = DEFAULT_FIELD,
+        lookup: str = DEFAULT_LOOKUP,
+        table_memory: str = DEFAULT_TABLE_MEMORY,
+        vector_width: int = DEFAULT_VECTOR_WIDTH,
+    ):
+        if iteration_bits < 0 or iteration_bits > MAX_ITERATION_BITS:
+            raise ValueError(
+                f"iteration_bits must be between 0 and {MAX_ITERATION_BITS}"
+            )
+        if vector_width not in VECTOR_WIDTHS:
+            raise ValueError(f"vector_width must be one of {VECTOR_WIDTHS}")
+        if vector_width > 1:
+            if keys_per_item not in (1, vector_width):
+                raise ValueError("keys_per_item is the vector width of vector kernels")
+            if (base_table, field, lookup) != ("ref10", "ref10", "constant-time"):
+                raise ValueError(
+                    "vector kernels use the ref10 field and constant-time ref10 table"
+                )
+            # one key per lane
+            keys_per_item = vector_width
+        # keys of one work item differ only in the last byte
+        if keys_per_item not in [1 << i for i in range(9)]:
+            raise ValueError("keys_per_item must be a power of two up to 256")
+        if keys_per_item > 1 << iteration_bits:
+            raise ValueError("keys_per_item must not exceed 2^iteration_bits")
+        if base_table not in BASE_TABLES:
+            raise ValueError(f"base_table must be one of {BASE_TABLES}")
+        if field not in FIELDS:
+            raise ValueError(f"field must be one of {FIELDS}")
+        if lookup not in LOOKUPS:
+            raise ValueError(f"lookup must be one of {LOOKUPS}")
+        if table_memory not in TABLE_MEMORIES:
+            raise ValueError(f"table_memory must be one of {TABLE_MEMORIES}")
+        if table_memory == "local" and (
+            lookup != "variable-time" or base_table != "ref10"
+        ):
+            raise ValueError(
+                "table_memory 'local' requires variable-time lookups of the ref10 table"
+            )
         self.iteration_bits = iteration_bits
         # iteration_bytes 为需要被迭代覆盖的字节数（向上取整）
         self.iteration_bytes = int(ceil(iteration_bits / 8))
         self.global_work_size = 1 << iteration_bits
         self.local_work_size = DEFAULT_LOCAL_WORK_SIZE
+        self.result_capacity = DEFAULT_RESULT_CAPACITY
+        # launches kept queued on the device by Searcher.find
+        self.pipeline_depth = DEFAULT_PIPELINE_DEPTH
+        # keys derived by one work item, their points share one field inversion
+        self.keys_per_item = keys_per_item
+        self.base_table = base_table
+        self.field = field
+        self.lookup = lookup
+        self.table_memory = table_memory
+        self.vector_width = vector_width
+        # (offset, size) of the iteration space this device searches, an even
+        # share of the devices when None
+        self.work_range: Optional[Tuple[int, int]] = None
+        # compiler flags appended to the build options
+        self.build_options: Tuple[str, ...] = ()
+        # most keys one launch covers, None for no limit
+        self.launch_keys: Optional[int] = None
+        # load the device's autotuned profile before building, cleared once
+        # it was looked up
+        self.use_profile = True
+        # count keys by how many pattern characters they matched
+        self.match_histogram = False
         self.kernel_source = kernel_source
+        # set when kernel_source is the pattern independent runtime kernel
+        self.pattern_table = pattern_table
         self.key32 = self.generate_key32()
 
     def generate_key32(self) -> bytearray:
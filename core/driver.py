@@ -0,0 +1,232 @@
+import logging
+import multiprocessing
+import queue
+import threading
+from contextlib import nullcontext
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from core.config import MAX_KEYS_PER_ITEM, HostSetting
+from core.opencl.cache import get_program_binaries
+from core.opencl.manager import (
+    DEFAULT_DEVICE_FILTER,
+    get_all_devices,
+    get_selected_devices,
+)
+from core.searcher import Searcher, get_build_options, search_worker
+from core.utils.cancel import CancelToken
+from core.utils.counters import SearchCounters
+from core.utils.keyspace import Chunk, KeyspaceAllocator
+from core.utils.partition import partition_work
+from core.utils.trace import HOST_PID, Tracer
+
+DRIVERS = ("process", "thread")
+
+
+def get_settings_binaries(
+    devices: Sequence, settings: Sequence[HostSetting]
+) -> List[bytes]:
+    """
+    Program binary of every device, compiled once per distinct build options
+    and device model
+    """
+    groups: Dict[Tuple[str, ...], List[int]] = {}
+    for index, setting in enumerate(settings):
+        groups.setdefault(tuple(get_build_options(setting)), []).append(index)
+    binaries: List[bytes] = [b""] * len(settings)
+    for options, indices in groups.items():
+        group_binaries = get_program_binaries(
+            [devices[i] for i in indices], settings[indices[0]].kernel_source, options
+        )
+        for position, index in enumerate(indices):
+            binaries[index] = group_binaries[position]
+    return binaries
+
+
+def measure_work_ranges(
+    settings: Sequence[HostSetting],
+    chosen_devices: Optional[Tuple[int, List[int]]] = None,
+    device_filter: str = DEFAULT_DEVICE_FILTER,
+    binaries: Optional[Sequence[bytes]] = None,
+) -> None:
+    """
+    Measure every device alone and give each a share of the iteration space
+    in proportion to its throughput, so that launches of a fast GPU and a
+    slow CPU last about as long. Sets work_range of every setting.
+    """
+    speeds = []
+    for index, setting in enumerate(settings):
+        searcher = Searcher(
+            setting.kernel_source,
+            index,
+            setting,
+            chosen_devices,
+            None if binaries is None else binaries[index],
+            device_filter,
+        )
+        try:
+            speeds.append(searcher.measure_speed())
+        finally:
+            searcher.close()
+        logging.info(
+            f"Device {searcher.display_index} ({searcher.device_name}): "
+            f"{speeds[-1] / 1e6:.2f} MH/s measured"
+        )
+    ranges = partition_work(
+        settings[0].global_work_size,
+        speeds,
+        MAX_KEYS_PER_ITEM * max(setting.local_work_size for setting in settings),
+    )
+    for setting, work_range in zip(settings, ranges):
+        setting.work_range = work_range
+
+
+class Driver:
+    """
+    Runs search_worker on every device and collects the streamed hits
+    """
+
+    def __init__(
+        self, cancel_token: CancelToken, result_queue, workers: List
+    ) -> None:
+        self.cancel_token = cancel_token
+        self.result_queue = result_queue
+        self.workers = workers
+
+    def start(self) -> None:
+        for worker in self.workers:
+            worker.start()
+
+    def stop(self) -> None:
+        self.cancel_token.cancel()
+
+    def join(self) -> None:
+        for worker in self.workers:
+            worker.join()
+
+    def collect(
+        self,
+        count: int,
+        on_result: Optional[Callable[[bytes], Optional[bool]]] = None,
+        on_chunk: Optional[Callable[[Chunk], None]] = None,
+    ) -> List[bytes]:
+        """
+        Wait for count hits, or until every worker exited, then stop the
+        workers. Hits on_result returns False for are not counted, on_chunk
+        sees every chunk of a shared keyspace searched completely.
+        """
+        results: List[bytes] = []
+        running = len(self.workers)
+        try:
+            while running:
+                result = self.result_queue.get()
+                if result is None:
+                    running -= 1
+                elif isinstance(result, Chunk):
+                    if on_chunk is not None:
+                        on_chunk(result)
+                elif len(results) < count:
+                    if on_result is not None and on_result(result) is False:
+                        continue
+                    results.append(result)
+                    if len(results) >= count:
+                        self.stop()
+        finally:
+            self.stop()
+            self.join()
+        return results
+
+
+class ProcessDriver(Driver):
+    """
+    One spawned process per device
+    """
+
+    def __init__(
+        self,
+        settings: Sequence[HostSetting],
+        chosen_devices: Optional[Tuple[int, List[int]]] = None,
+        device_filter: str = DEFAULT_DEVICE_FILTER,
+        allocator: Optional[KeyspaceAllocator] = None,
+        tracer: Optional[Tracer] = None,
+        counters: Optional[SearchCounters] = None,
+    ) -> None:
+        cancel_token = CancelToken()
+        result_queue = multiprocessing.Queue()
+        workers = [
+            multiprocessing.Process(
+                target=search_worker,
+                args=(index, setting, cancel_token, result_queue, chosen_devices),
+                kwargs={
+                    "device_filter": device_filter,
+                    "allocator": allocator,
+                    "tracer": tracer,
+                    "counters": counters,
+                },
+            )
+            for index, setting in enumerate(settings)
+        ]
+        super().__init__(cancel_token, result_queue, workers)
+
+
+class ThreadedDriver(Driver):
+    """
+    Every device in this process: one context and command queue per device,
+    driven by one thread each. Devices of the same model share one compiled
+    program binary.
+    """
+
+    def __init__(
+        self,
+        settings: Sequence[HostSetting],
+        chosen_devices: Optional[Tuple[int, List[int]]] = None,
+        device_filter: str = DEFAULT_DEVICE_FILTER,
+        allocator: Optional[KeyspaceAllocator] = None,
+        tracer: Optional[Tracer] = None,
+        counters: Optional[SearchCounters] = None,
+    ) -> None:
+        if chosen_devices is None:
+            devices = get_all_devices(device_filter)
+        else:
+            devices = get_selected_devices(*chosen_devices, device_filter)
+        with nullcontext() if tracer is None else tracer.span(
+            "build programs", HOST_PID
+        ):
+            binaries = get_settings_binaries(devices, settings)
+        cancel_token = CancelToken()
+        result_queue: queue.Queue = queue.Queue()
+        workers = [
+            threading.Thread(
+                target=search_worker,
+                args=(index, setting, cancel_token, result_queue, chosen_devices),
+                kwargs={
+                    "binary": binaries[index],
+                    "device_filter": device_filter,
+                    "allocator": allocator,
+                    "tracer": tracer,
+                    "counters": counters,
+                },
+                daemon=True,
+            )
+            for index, setting in enumerate(settings)
+        ]
+        super().__init__(cancel_token, result_queue, workers)
+
+
+def create_driver(
+    driver: str,
+    settings: Sequence[HostSetting],
+    chosen_devices: Optional[Tuple[int, List[int]]] = None,
+    device_filter: str = DEFAULT_DEVICE_FILTER,
+    allocator: Optional[KeyspaceAllocator] = None,
+    tracer: Optional[Tracer] = None,
+    counters: Optional[SearchCounters] = None,
+) -> Driver:
+    if driver == "thread":
+        return ThreadedDriver(
+            settings, chosen_devices, device_filter, allocator, tracer, counters
+        )
+    if driver == "process":
+        return ProcessDriver(
+            settings, chosen_devices, device_filter, allocator, tracer, counters
+        )
+    raise ValueError(f"Unknown driver {driver!r}, expected one of {DRIVERS}")
@@ -0,0 +1,112 @@
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Sequence
+
+from core.utils.counters import THROUGHPUT_BUCKETS, DeviceCounters, SearchCounters
+
+DEFAULT_METRICS_HOST = "127.0.0.1"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def format_metrics(
+    counters: Sequence[DeviceCounters], device_names: Sequence[str]
+) -> str:
+    """
+    Counters in the Prometheus text exposition format
+    """
+    lines = []
+
+    def family(name: str, kind: str, help_text: str) -> None:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    def labels(device: int, **extra: str) -> str:
+        name = device_names[device].strip().replace("\\", "\\\\").replace('"', '\\"')
+        pairs = [f'device="{device}"', f'name="{name}"']
+        pairs += [f'{key}="{value}"' for key, value in extra.items()]
+        return "{" + ",".join(pairs) + "}"
+
+    for metric, kind, help_text, field in (
+        ("vanity_keys_total", "counter", "Keys tried.", "keys"),
+        ("vanity_launches_total", "counter", "Kernel launches completed.", "launches"),
+        ("vanity_hits_total", "counter", "Matching keys found.", "hits"),
+        (
+            "vanity_kernel_seconds_total",
+            "counter",
+            "Seconds the device ran search kernels.",
+            "kernel_seconds",
+        ),
+        (
+            "vanity_idle_seconds_total",
+            "counter",
+            "Seconds the device idled between launches.",
+            "idle_seconds",
+        ),
+    ):
+        family(metric, kind, help_text)
+        for device, device_counters in enumerate(counters):
+            value = getattr(device_counters, field)
+            lines.append(f"{metric}{labels(device)} {value}")
+
+    if any(
+        any(device_counters.match_depths) or device_counters.prefiltered
+        for device_counters in counters
+    ):
+        metric = "vanity_match_depth_keys_total"
+        family(metric, "counter", "Keys by the number of pattern characters matched.")
+        for device, device_counters in enumerate(counters):
+            for depth, count in enumerate(device_counters.match_depths):
+                lines.append(f"{metric}{labels(device, depth=str(depth))} {count}")
+        metric = "vanity_prefiltered_keys_total"
+        family(metric, "counter", "Keys rejected by the prefilters before encoding.")
+        for device, device_counters in enumerate(counters):
+            lines.append(f"{metric}{labels(device)} {device_counters.prefiltered}")
+
+    metric = "vanity_launch_keys_per_second"
+    family(metric, "histogram", "Throughput of single kernel launches.")
+    for device, device_counters in enumerate(counters):
+        cumulative = 0
+        bounds = [repr(bound) for bound in THROUGHPUT_BUCKETS] + ["+Inf"]
+        for bound, count in zip(bounds, device_counters.throughput_counts):
+            cumulative += count
+            lines.append(f"{metric}_bucket{labels(device, le=bound)} {cumulative}")
+        lines.append(f"{metric}_sum{labels(device)} {device_counters.throughput_sum}")
+        lines.append(f"{metric}_count{labels(device)} {device_counters.launches}")
+    return "\n".join(lines) + "\n"
+
+
+def serve_metrics(
+    counters: SearchCounters,
+    device_names: Sequence[str],
+    port: int,
+    host: str = DEFAULT_METRICS_HOST,
+) -> ThreadingHTTPServer:
+    """
+    Serve the counters for Prometheus on http://host:port/metrics from a
+    daemon thread, until the returned server is shut down
+    """
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = format_metrics(counters.snapshot(), device_names).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args) -> None:
+            # one line per scrape would drown the search log
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logging.info(
+        f"Serving metrics on http://{host}:{server.server_address[1]}/metrics"
+    )
+    return server
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import pyopencl as cl
+
+from core.config import DEFAULT_KERNEL_CACHE_DIR
+
+
+def get_cache_dir() -> Optional[Path]:
+    """
+    Directory holding compiled program binaries, None when caching is disabled
+    """
+    if os.environ.get("VANITY_KERNEL_CACHE", "1").lower() in ("0", "false", "no"):
+        return None
+    return Path(os.environ.get("VANITY_KERNEL_CACHE_DIR", DEFAULT_KERNEL_CACHE_DIR))
+
+
+def device_identity(device: cl.Device) -> Dict[str, str]:
+    """
+    Device model and driver, the same for identical devices of one host
+    """
+    return {
+        "platform": device.platform.name.strip(),
+        "platform_version": device.platform.version.strip(),
+        "device": device.name.strip(),
+        "device_version": device.version.strip(),
+        "driver_version": device.driver_version.strip(),
+    }
+
+
+def program_cache_key(
+    source: str, device: cl.Device, options: Sequence[str] = ()
+) -> str:
+    """
+    Content address of a program binary: generated source, device, driver and build options
+    """
+    payload = {
+        "source": hashlib.sha256(source.encode()).hexdigest(),
+        **device_identity(device),
+        "options": list(options),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def load_binary(cache_dir: Path, key: str) -> Optional[bytes]:
+    path = cache_dir / f"{key}.bin"
+    try:
+        return path.read_bytes()
+    except OSError:
+        return None
+
+
+def store_binary(cache_dir: Path, key: str, binary: bytes) -> None:
+    """
+    Write a binary atomically so concurrent workers never read a partial file
+    """
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(binary)
+        os.replace(tmp_path, cache_dir / f"{key}.bin")
+    except OSError as e:
+        logging.warning(f"Failed to store kernel binary in {cache_dir}: {e}")
+
+
+def compile_binary(device: cl.Device, source: str, options: Sequence[str]) -> bytes:
+    context = cl.Context([device])
+    program = cl.Program(context, source).build(options=list(options))
+    return program.get_info(cl.program_info.BINARIES)[0]
+
+
+def get_program_binaries(
+    devices: Sequence[cl.Device], source: str, options: Sequence[str] = ()
+) -> Dict[int, bytes]:
+    """
+    Return {device index: binary}, compiling every cache miss in parallel
+    """
+    cache_dir = get_cache_dir()
+    keys = [program_cache_key(source, device, options) for device in devices]
+    binaries: Dict[int, bytes] = {}
+    if cache_dir is not None:
+        for i, key in enumerate(keys):
+            binary = load_binary(cache_dir, key)
+            if binary:
+                binaries[i] = binary
+
+    # devices with the same key (same model and driver) share one compilation
+    missing: Dict[str, List[int]] = {}
+    for i, key in enumerate(keys):
+        if i not in binaries:
+            missing.setdefault(key, []).append(i)
+    if not missing:
+        return binaries
+
+    with ThreadPoolExecutor(max_workers=len(missing)) as executor:
+        futures = {
+            key: executor.submit(compile_binary, devices[indices[0]], source, options)
+            for key, indices in missing.items()
+        }
+        for key, future in futures.items():
+            binary = future.result()
+            if cache_dir is not None:
+                store_binary(cache_dir, key, binary)
+            for i in missing[key]:
+                binaries[i] = binary
+    return binaries
+
+
+def build_program(
+    context: cl.Context,
+    devices: Sequence[cl.Device],
+    source: str,
+    options: Sequence[str] = (),
+    binaries: Optional[Sequence[bytes]] = None,
+) -> cl.Program:
+    """
+    Build a program for devices of one context through the binary cache, or
+    from binaries compiled by the caller for these devices
+    """
+    if binaries is None:
+        binaries = get_program_binaries(devices, source, options)
+    try:
+        return cl.Program(
+            context, list(devices), [binaries[i] for i in range(len(devices))]
+        ).build(options=list(options))
+    except cl.Error as e:
+        # stale or foreign binary, drop it and compile from source
+        logging.warning(f"Cached kernel binary rejected, rebuilding: {e}")
+        cache_dir = get_cache_dir()
+        if cache_dir is not None:
+            for device in devices:
+                key = program_cache_key(source, device, options)
+                (cache_dir / f"{key}.bin").unlink(missing_ok=True)
+        return cl.Program(context, source).build(options=list(options))
+
+
+def warm_program_cache(
+    devices: Sequence[cl.Device], source: str, options: Sequence[str] = ()
+) -> None:
+    """
+    Compile missing binaries for all devices up front, e.g. before spawning workers
+    """
+    if get_cache_dir() is None:
+        return
+    get_program_binaries(devices, source, options)
@@ -7,26 +7,78 @@ import click
 import pyopencl as cl
 
 os.environ["PYOPENCL_COMPILER_OUTPUT"] = "1"
+# program binaries are cached by core.opencl.cache
 os.environ["PYOPENCL_NO_CACHE"] = "TRUE"
 
 
+# device types searched: GPUs when there are any and every device otherwise,
+# GPUs only, CPUs only, or every device
+DEVICE_FILTERS = ("auto", "gpu", "cpu", "all")
+DEFAULT_DEVICE_FILTER = "auto"
+DEVICE_TYPES = {
+    "gpu": cl.device_type.GPU,
+    "cpu": cl.device_type.CPU,
+    "all": cl.device_type.ALL,
+}
+
+
+def filter_devices(devices: List[cl.Device], device_filter: str) -> List[cl.Device]:
+    """
+    Devices of the types device_filter selects, in enumeration order
+    """
+    if device_filter not in DEVICE_FILTERS:
+        raise ValueError(f"device_filter must be one of {DEVICE_FILTERS}")
+    if device_filter == "auto":
+        gpus = filter_devices(devices, "gpu")
+        return gpus if gpus else devices
+    return [d for d in devices if d.type & DEVICE_TYPES[device_filter]]
+
+
+def get_all_devices(device_filter: str = DEFAULT_DEVICE_FILTER) -> List[cl.Device]:
+    return filter_devices(
+        [
+            device
+            for platform_obj in cl.get_platforms()
+            for device in platform_obj.get_devices()
+        ],
+        device_filter,
+    )
+
+
 def get_all_gpu_devices() -> List[cl.Device]:
-    return [
-        device
-        for platform_obj in cl.get_platforms()
-        for device in platform_obj.get_devices(device_type=cl.device_type.GPU)
-    ]
+    return get_all_devices("gpu")
 
 
-def get_selected_gpu_devices(
-    platform_id: int, device_ids: List[int]
+def get_vector_width(device: cl.Device) -> int:
+    """
+    Lanes of the vector kernel for a device: its native int vector width on
+    CPUs, rounded down to a width the kernel supports, 1 (scalar) elsewhere
+    """
+    if not device.type & cl.device_type.CPU:
+        return 1
+    width = device.native_vector_width_int
+    return 8 if width >= 8 else 4 if width >= 4 else 1
+
+
+def get_selected_devices(
+    platform_id: int,
+    device_ids: List[int],
+    device_filter: str = DEFAULT_DEVICE_FILTER,
 ) -> List[cl.Device]:
     platform_obj = cl.get_platforms()[platform_id]
-    devices = platform_obj.get_devices(device_type=cl.device_type.GPU)
+    devices = filter_devices(platform_obj.get_devices(), device_filter)
     return [devices[d_id] for d_id in device_ids]
 
 
-def get_chosen_devices() -> Tuple[int, List[int]]:
+def get_selected_gpu_devices(
+    platform_id: int, device_ids: List[int]
+) -> List[cl.Device]:
+    return get_selected_devices(platform_id, device_ids, "gpu")
+
+
+def get_chosen_devices(
+    device_filter: str = DEFAULT_DEVICE_FILTER,
+) -> Tuple[int, List[int]]:
     if "CHOSEN_OPENCL_DEVICES" in os.environ:
         platform_str, devices_str = os.environ.get("CHOSEN_OPENCL_DEVICES", "").split(
             ":"
@@ -39,9 +91,9 @@ def get_chosen_devices() -> Tuple[int, List[int]]:
     platform_id = click.prompt(
         "Choice", default=0, type=click.IntRange(0, len(platforms) - 1)
     )
-    all_devices = platforms[platform_id].get_devices(device_type=cl.device_type.GPU)
+    all_devices = filter_devices(platforms[platform_id].get_devices(), device_filter)
     if not all_devices:
-        logging.error(f"Platform {platform_id} doesn't have GPU devices.")
+        logging.error(f"Platform {platform_id} doesn't have {device_filter} devices.")
         sys.exit(-1)
     click.echo("Choose device(s):")
     for d_idx, device in enumerate(all_devices):
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import NamedTuple, Optional, Sequence, Tuple
+
+import pyopencl as cl
+
+from core.config import (
+    DEFAULT_BASE_TABLE,
+    DEFAULT_FIELD,
+    DEFAULT_KEYS_PER_ITEM,
+    DEFAULT_LOOKUP,
+    DEFAULT_PROFILE_DIR,
+    DEFAULT_TABLE_MEMORY,
+    DEFAULT_VECTOR_WIDTH,
+    MAX_KEYS_PER_ITEM,
+    VALID_LOCAL_WORK_SIZES,
+    VECTOR_WIDTHS,
+    HostSetting,
+)
+from core.opencl.cache import device_identity
+
+
+class DeviceProfile(NamedTuple):
+    """
+    Fastest setting autotune found for a device model, with the largest launch
+    that still completed within the target duration
+    """
+
+    local_work_size: int
+    keys_per_item: int
+    vector_width: int
+    build_options: Tuple[str, ...]
+    launch_keys: int
+    # keys per second of the tuned setting
+    speed: float
+
+
+def get_profile_dir() -> Path:
+    return Path(os.environ.get("VANITY_PROFILE_DIR", DEFAULT_PROFILE_DIR))
+
+
+def profile_path(device: cl.Device) -> Path:
+    payload = json.dumps(device_identity(device), sort_keys=True).encode()
+    return get_profile_dir() / f"{hashlib.sha256(payload).hexdigest()}.json"
+
+
+def check_profile(profile: DeviceProfile) -> None:
+    """
+    ValueError unless a profile is a setting autotune could have chosen,
+    hand-edited or stale profiles bypass the checks of HostSetting
+    """
+    if profile.local_work_size not in VALID_LOCAL_WORK_SIZES:
+        raise ValueError(
+            f"local_work_size {profile.local_work_size} is not one of "
+            f"{VALID_LOCAL_WORK_SIZES}"
+        )
+    if profile.vector_width not in VECTOR_WIDTHS:
+        raise ValueError(f"vector_width must be one of {VECTOR_WIDTHS}")
+    if profile.keys_per_item not in [
+        1 << i for i in range(MAX_KEYS_PER_ITEM.bit_length())
+    ]:
+        raise ValueError(
+            f"keys_per_item must be a power of two up to {MAX_KEYS_PER_ITEM}"
+        )
+    if profile.vector_width > 1 and profile.keys_per_item != profile.vector_width:
+        raise ValueError("keys_per_item is the vector width of vector kernels")
+    work_group_keys = profile.keys_per_item * profile.local_work_size
+    if profile.launch_keys <= 0 or profile.launch_keys % work_group_keys:
+        raise ValueError(
+            f"launch_keys must be a positive multiple of {work_group_keys}"
+        )
+    if not all(isinstance(option, str) for option in profile.build_options):
+        raise ValueError("build_options must be strings")
+
+
+def load_profile(device: cl.Device) -> Optional[DeviceProfile]:
+    try:
+        data = json.loads(profile_path(device).read_text())
+        profile = DeviceProfile(
+            local_work_size=int(data["local_work_size"]),
+            keys_per_item=int(data["keys_per_item"]),
+            vector_width=int(data["vector_width"]),
+            build_options=tuple(data["build_options"]),
+            launch_keys=int(data["launch_keys"]),
+            speed=float(data["speed"]),
+        )
+        check_profile(profile)
+        return profile
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logging.warning(f"Ignoring unreadable profile of {device.name}: {e}")
+        return None
+
+
+def profiled_speed(devices: Sequence[cl.Device]) -> Optional[float]:
+    """
+    Combined keys per second of the devices' profiles, None unless every
+    device has one
+    """
+    speeds = [load_profile(device) for device in devices]
+    if not devices or None in speeds:
+        return None
+    return sum(profile.speed for profile in speeds)
+
+
+def save_profile(device: cl.Device, profile: DeviceProfile) -> Path:
+    """
+    Write a profile atomically, next to the identity of the device it belongs to
+    """
+    path = profile_path(device)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = {**profile._asdict(), "build_options": list(profile.build_options)}
+    data["device"] = device_identity(device)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+
+def apply_profile(setting: HostSetting, device: cl.Device) -> Optional[DeviceProfile]:
+    """
+    Switch a setting of the default kernel variant to the device's profile.
+    Settings with an explicit variant were not what the profile measured and
+    are left alone. Looks the profile up once per setting.
+    """
+    if not setting.use_profile:
+        return None
+    setting.use_profile = False
+    variant = (
+        setting.keys_per_item,
+        setting.vector_width,
+        setting.base_table,
+        setting.field,
+        setting.lookup,
+        setting.table_memory,
+        setting.build_options,
+    )
+    default_variant = (
+        DEFAULT_KEYS_PER_ITEM,
+        DEFAULT_VECTOR_WIDTH,
+        DEFAULT_BASE_TABLE,
+        DEFAULT_FIELD,
+        DEFAULT_LOOKUP,
+        DEFAULT_TABLE_MEMORY,
+        (),
+    )
+    if variant != default_variant:
+        return None
+    profile = load_profile(device)
+    if profile is None or profile.keys_per_item > 1 << setting.iteration_bits:
+        return None
+    setting.local_work_size = profile.local_work_size
+    setting.keys_per_item = profile.keys_per_item
+    setting.vector_width = profile.vector_width
+    setting.build_options = profile.build_options
+    setting.launch_keys = profile.launch_keys
+    return profile
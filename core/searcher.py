@@ -1,16 +1,102 @@
 import logging
+import threading
 import time
-from typing import List, Optional, Tuple
+from collections import deque
+from contextlib import nullcontext
+from typing import ContextManager, Deque, Dict, List, Optional, Tuple
 
 import pyopencl as cl
 
-from core.config import HostSetting
+from core.config import (
+    MATCH_DEPTH_BINS,
+    MAX_KEYS_PER_ITEM,
+    MAX_LOCAL_WORK_SIZE,
+    REF10_TABLE_BYTES,
+    RESULT_SIZE,
+    HostSetting,
+)
+from core.opencl.cache import build_program
 from core.opencl.manager import (
-    get_all_gpu_devices,
-    get_selected_gpu_devices,
+    DEFAULT_DEVICE_FILTER,
+    get_all_devices,
+    get_selected_devices,
+)
+from core.opencl.profile import apply_profile
+from core.utils.counters import SearchCounters
+from core.utils.ed25519 import wide_base_table
+from core.utils.keyspace import Chunk, KeyspaceAllocator
+from core.utils.partition import WorkRange, partition_work
+from core.utils.trace import (
+    HOST_TID,
+    QUEUE_TID,
+    READ_QUEUE_TID,
+    Tracer,
+    calibrate,
+    device_pid,
 )
 
 
+def get_build_options(setting: HostSetting) -> List[str]:
+    options = []
+    if setting.pattern_table is not None:
+        options.append("-DRUNTIME_PATTERN")
+    if setting.keys_per_item != 1:
+        options.append(f"-DKEYS_PER_ITEM={setting.keys_per_item}")
+    if setting.base_table == "wide":
+        options.append("-DWIDE_BASE_TABLE")
+    if setting.field == "radix51":
+        options.append("-DFE_RADIX51")
+    if setting.lookup == "variable-time":
+        options.append("-DVARIABLE_TIME_LOOKUP")
+    if setting.table_memory == "local":
+        options.append("-DLOCAL_BASE_TABLE")
+    if setting.vector_width > 1:
+        options.append(f"-DVECTOR_WIDTH={setting.vector_width}")
+    if setting.match_histogram:
+        options += ["-DMATCH_HISTOGRAM", f"-DMATCH_DEPTH_BINS={MATCH_DEPTH_BINS}"]
+    options.extend(setting.build_options)
+    return options
+
+
+class LaunchSlot:
+    """
+    Device buffers of one in-flight launch: seed, key offset, hit counter,
+    hit records and match depth counts
+    """
+
+    def __init__(self, context: cl.Context, setting: HostSetting):
+        self.memobj_key32 = cl.Buffer(
+            context, cl.mem_flags.READ_ONLY, len(setting.key32)
+        )
+        self.memobj_key_offset = cl.Buffer(context, cl.mem_flags.READ_ONLY, 8)
+        self.memobj_result_count = cl.Buffer(context, cl.mem_flags.READ_WRITE, 4)
+        self.memobj_results = cl.Buffer(
+            context, cl.mem_flags.READ_WRITE, RESULT_SIZE * setting.result_capacity
+        )
+        self.memobj_match_depths = None
+        if setting.match_histogram:
+            self.memobj_match_depths = cl.Buffer(
+                context, cl.mem_flags.READ_WRITE, 4 * MATCH_DEPTH_BINS
+            )
+        # host copies must outlive the non-blocking transfers using them
+        self.key32 = bytes(setting.key32)
+        self.key_offset = bytes(8)
+        self.zero = bytearray(4)
+        self.result_count = bytearray(4)
+        self.zero_depths = bytes(4 * MATCH_DEPTH_BINS)
+        self.match_depths = bytearray(4 * MATCH_DEPTH_BINS)
+        # completes once the hit count of the launch is on the host
+        self.event: Optional[cl.Event] = None
+        self.work_size = 0
+        # keys the launch searches
+        self.chunk: Optional[Chunk] = None
+        # first command and kernel of the launch, profiled when counting
+        self.first_event: Optional[cl.Event] = None
+        self.kernel_event: Optional[cl.Event] = None
+        # commands of the launch and their events, kept when tracing
+        self.commands: List[Tuple[str, cl.Event, Dict]] = []
+
+
 class Searcher:
     def __init__(
         self,
@@ -18,73 +104,486 @@ class Searcher:
         index: int,
         setting: HostSetting,
         chosen_devices: Optional[Tuple[int, List[int]]] = None,
+        binary: Optional[bytes] = None,
+        device_filter: str = DEFAULT_DEVICE_FILTER,
+        allocator: Optional[KeyspaceAllocator] = None,
+        tracer: Optional[Tracer] = None,
+        counters: Optional[SearchCounters] = None,
     ):
         if chosen_devices is None:
-            devices = get_all_gpu_devices()
+            devices = get_all_devices(device_filter)
         else:
-            devices = get_selected_gpu_devices(*chosen_devices)
+            devices = get_selected_devices(*chosen_devices, device_filter)
         enabled_device = devices[index]
+        apply_profile(setting, enabled_device)
+        # a keyspace smaller than one work group launches a smaller group,
+        # padding it would search some keys twice
+        setting.local_work_size = min(
+            setting.local_work_size,
+            max(setting.global_work_size // setting.keys_per_item, 1),
+        )
+        if (
+            setting.table_memory == "local"
+            and enabled_device.local_mem_size < REF10_TABLE_BYTES
+        ):
+            raise ValueError(
+                f"{enabled_device.name} has {enabled_device.local_mem_size} bytes "
+                f"of local memory, the base table needs {REF10_TABLE_BYTES}"
+            )
         self.context = cl.Context([enabled_device])
-        self.gpu_chunks = len(devices)
-        self.command_queue = cl.CommandQueue(self.context)
+        # commands are only timed when tracing or counting, profiling costs a
+        # little per command on some drivers
+        properties = (
+            cl.command_queue_properties.PROFILING_ENABLE
+            if tracer is not None or counters is not None
+            else 0
+        )
+        self.command_queue = cl.CommandQueue(self.context, properties=properties)
+        # hit records are read on a second queue so that reading them does not
+        # wait for the launches queued behind
+        self.read_queue = cl.CommandQueue(self.context, properties=properties)
+        # the abort word is written out of order with the queued launches
+        self.abort_queue = cl.CommandQueue(self.context)
         self.setting = setting
         self.index = index
         self.display_index = (
             index if chosen_devices is None else chosen_devices[1][index]
         )
-        self.prev_time = None
+        self.device_name = enabled_device.name
+        # global sizes are size_t on the device
+        self.max_work_items = (1 << enabled_device.address_bits) - 1
         self.is_nvidia = "NVIDIA" in enabled_device.platform.name.upper()
+        self.prev_time = None
+        self.launch_time = None
+        self.tracer = tracer
+        self.counters = counters
+        # device time the previous counted launch completed at
+        self.prev_end: Optional[int] = None
+        self.trace_pid = device_pid(self.display_index)
+        if tracer is not None:
+            tracer.name_process(
+                self.trace_pid, f"Device {self.display_index}: {self.device_name}"
+            )
+            # device timestamps shifted onto the host clock
+            self.clock_offset = calibrate(self.command_queue)
 
-        program = cl.Program(self.context, kernel_source).build()
+        with self.trace_span("build program", cached=binary is not None):
+            program = build_program(
+                self.context,
+                [enabled_device],
+                kernel_source,
+                get_build_options(setting),
+                None if binary is None else [binary],
+            )
         self.kernel = cl.Kernel(program, "generate_pubkey")
-        self.memobj_key32 = cl.Buffer(
+        # hits are appended to a ring of RESULT_SIZE byte records (address
+        # length followed by the seed), slots are claimed with an atomic counter
+        self.memobj_result_capacity = cl.Buffer(
             self.context,
             cl.mem_flags.READ_ONLY | cl.mem_flags.COPY_HOST_PTR,
-            len(self.setting.key32),
-            hostbuf=self.setting.key32,
-        )
-        self.memobj_output = cl.Buffer(
-            self.context, cl.mem_flags.READ_WRITE, 33
+            hostbuf=self.setting.result_capacity.to_bytes(4, "little"),
         )
         self.memobj_occupied_bytes = cl.Buffer(
             self.context,
             cl.mem_flags.READ_WRITE | cl.mem_flags.COPY_HOST_PTR,
             hostbuf=bytearray([self.setting.iteration_bytes]),
         )
-        self.memobj_group_offset = cl.Buffer(
+        self.kernel.set_arg(3, self.memobj_result_capacity)
+        self.kernel.set_arg(4, self.memobj_occupied_bytes)
+        self.memobj_abort = cl.Buffer(
             self.context,
             cl.mem_flags.READ_WRITE | cl.mem_flags.COPY_HOST_PTR,
-            hostbuf=bytearray([self.index]),
+            hostbuf=bytearray(4),
         )
-        self.output = bytearray(33)
-        self.kernel.set_arg(0, self.memobj_key32)
-        self.kernel.set_arg(1, self.memobj_output)
-        self.kernel.set_arg(2, self.memobj_occupied_bytes)
-        self.kernel.set_arg(3, self.memobj_group_offset)
+        self.abort_word = (1).to_bytes(4, "little")
+        self.aborted = False
+        self.closed = False
+        self.kernel.set_arg(6, self.memobj_abort)
+        self.free_slots = deque(
+            LaunchSlot(self.context, setting)
+            for _ in range(max(setting.pipeline_depth, 1))
+        )
+        self.in_flight: Deque[LaunchSlot] = deque()
+        # keys of the launch find() last returned the hits of, None when it
+        # was aborted
+        self.completed_chunk: Optional[Chunk] = None
+        # chunks of a keyspace shared with the other devices when set,
+        # otherwise a fixed range of every block after setting.key32
+        self.allocator = allocator
+        if setting.work_range is None:
+            # an even share, aligned for the work groups of every other device
+            self.set_work_range(
+                partition_work(
+                    setting.global_work_size,
+                    [1] * len(devices),
+                    MAX_KEYS_PER_ITEM * MAX_LOCAL_WORK_SIZE,
+                )[index]
+            )
+        else:
+            self.set_work_range(setting.work_range)
+        if allocator is not None and setting.launch_keys is not None:
+            allocator.set_limit(index, setting.launch_keys)
+        # optional arguments follow abort_flag in this order
+        self.pattern_arg = 7
+        self.base_table_arg = 7 + (setting.pattern_table is not None)
+        self.match_depth_arg = self.base_table_arg + (setting.base_table == "wide")
+        self.memobj_pattern = None
+        if self.setting.pattern_table is not None:
+            self.set_pattern_table(self.setting.pattern_table)
+        self.memobj_base_table = None
+        if setting.base_table == "wide":
+            # uploaded once, read only for the lifetime of the searcher
+            self.memobj_base_table = cl.Buffer(
+                self.context,
+                cl.mem_flags.READ_ONLY | cl.mem_flags.COPY_HOST_PTR,
+                hostbuf=wide_base_table(setting.field),
+            )
+            self.kernel.set_arg(self.base_table_arg, self.memobj_base_table)
 
-    def find(self, log_stats: bool = True) -> bytearray:
-        start_time = time.time()
-        cl.enqueue_copy(self.command_queue, self.memobj_key32, self.setting.key32)
-        global_work_size = self.setting.global_work_size // self.gpu_chunks
+    def trace_span(self, name: str, **args) -> ContextManager:
+        """
+        Record a host phase of this device when tracing
+        """
+        if self.tracer is None:
+            return nullcontext()
+        return self.tracer.span(name, self.trace_pid, HOST_TID, **args)
+
+    def trace_commands(self, slot: LaunchSlot) -> None:
+        for name, event, args in slot.commands:
+            self.tracer.device_command(
+                name, event, self.clock_offset, self.trace_pid, QUEUE_TID, **args
+            )
+        slot.commands = []
+
+    def set_pattern_table(self, pattern_table: bytes) -> None:
+        """
+        Switch the runtime pattern kernel to a new pattern without rebuilding
+        """
+        if self.setting.pattern_table is None:
+            raise ValueError("Searcher was not built with a runtime pattern")
+        # launches already queued belong to the previous pattern
+        self.discard_in_flight()
+        self.setting.pattern_table = pattern_table
+        if self.memobj_pattern is None or self.memobj_pattern.size != len(
+            pattern_table
+        ):
+            self.memobj_pattern = cl.Buffer(
+                self.context,
+                cl.mem_flags.READ_ONLY | cl.mem_flags.COPY_HOST_PTR,
+                hostbuf=pattern_table,
+            )
+            self.kernel.set_arg(self.pattern_arg, self.memobj_pattern)
+        else:
+            cl.enqueue_copy(self.command_queue, self.memobj_pattern, pattern_table)
+
+    def set_work_range(self, work_range: WorkRange) -> None:
+        """
+        Search keys [offset, offset + size) of every 2^iteration_bits block from
+        the next launch on. offset must be a multiple of keys_per_item.
+        """
+        offset, size = work_range
+        if offset % self.setting.keys_per_item:
+            raise ValueError("work range offset must be a multiple of keys_per_item")
+        launch_keys = min(size, self.setting.launch_keys or size)
+        if launch_keys // self.setting.keys_per_item > self.max_work_items:
+            raise ValueError(
+                f"a launch of {launch_keys} keys exceeds the global size limit of "
+                f"{self.device_name}, use fewer iteration bits or the dynamic "
+                "partition"
+            )
+        self.work_range = work_range
+        # keys of the range already launched for the current seed
+        self.range_position = 0
+
+    def next_chunk(self) -> Chunk:
+        if self.allocator is not None:
+            with self.trace_span("allocate chunk"):
+                return self.allocator.allocate(self.index)
+        offset, size = self.work_range
+        # ranges larger than launch_keys take several launches per seed
+        launch_keys = self.setting.launch_keys or size
+        chunk = Chunk(
+            bytes(self.setting.key32),
+            offset + self.range_position,
+            min(launch_keys, size - self.range_position),
+        )
+        self.range_position += chunk.size
+        if self.range_position >= size:
+            self.range_position = 0
+            with self.trace_span("increase_key32"):
+                self.setting.increase_key32()
+        return chunk
+
+    def enqueue_launch(self, chunk: Optional[Chunk] = None) -> None:
+        if chunk is None:
+            chunk = self.next_chunk()
+        global_work_size = chunk.size
         local_size = self.setting.local_work_size
-        global_size = ((global_work_size + local_size - 1) // local_size) * local_size # align global size and local size
-        cl.enqueue_nd_range_kernel(
+        # every work item derives keys_per_item keys, padded work groups would
+        # wrap around to keys of the chunk's block that are searched elsewhere
+        if global_work_size % (self.setting.keys_per_item * local_size):
+            raise ValueError(
+                f"a chunk of {global_work_size} keys is not a multiple of "
+                f"{self.setting.keys_per_item} keys per item times the local "
+                f"work size {local_size}"
+            )
+        global_size = global_work_size // self.setting.keys_per_item
+        slot = self.free_slots.popleft()
+        slot.chunk = chunk
+        slot.key32 = chunk.seed
+        slot.key_offset = chunk.offset.to_bytes(8, "little")
+        slot.work_size = global_work_size
+
+        write_seed = cl.enqueue_copy(
+            self.command_queue, slot.memobj_key32, slot.key32, is_blocking=False
+        )
+        write_offset = cl.enqueue_copy(
+            self.command_queue,
+            slot.memobj_key_offset,
+            slot.key_offset,
+            is_blocking=False,
+        )
+        clear_count = cl.enqueue_copy(
+            self.command_queue,
+            slot.memobj_result_count,
+            slot.zero,
+            is_blocking=False,
+        )
+        self.kernel.set_arg(0, slot.memobj_key32)
+        self.kernel.set_arg(1, slot.memobj_result_count)
+        self.kernel.set_arg(2, slot.memobj_results)
+        self.kernel.set_arg(5, slot.memobj_key_offset)
+        if slot.memobj_match_depths is not None:
+            cl.enqueue_copy(
+                self.command_queue,
+                slot.memobj_match_depths,
+                slot.zero_depths,
+                is_blocking=False,
+            )
+            self.kernel.set_arg(self.match_depth_arg, slot.memobj_match_depths)
+        launch = cl.enqueue_nd_range_kernel(
             self.command_queue,
             self.kernel,
             (global_size,),
             (local_size,),
         )
+        if slot.memobj_match_depths is not None:
+            # in order before the hit count, complete once slot.event is
+            cl.enqueue_copy(
+                self.command_queue,
+                slot.match_depths,
+                slot.memobj_match_depths,
+                is_blocking=False,
+            )
+        slot.event = cl.enqueue_copy(
+            self.command_queue,
+            slot.result_count,
+            slot.memobj_result_count,
+            is_blocking=False,
+        )
         self.command_queue.flush()
-        self.setting.increase_key32()
-        if self.prev_time is not None and self.is_nvidia:
-            time.sleep(self.prev_time * 0.98)
-        cl.enqueue_copy(self.command_queue, self.output, self.memobj_output).wait()
-        self.prev_time = time.time() - start_time
+        slot.first_event = write_seed
+        slot.kernel_event = launch
+        if self.tracer is not None:
+            slot.commands = [
+                ("write seed", write_seed, {}),
+                ("write key offset", write_offset, {}),
+                ("clear hit count", clear_count, {}),
+                (
+                    "generate_pubkey",
+                    launch,
+                    {"keys": global_work_size, "offset": chunk.offset},
+                ),
+                ("read hit count", slot.event, {}),
+            ]
+        self.in_flight.append(slot)
+
+    def wait_oldest(self) -> LaunchSlot:
+        slot = self.in_flight.popleft()
+        with self.trace_span("wait for launch"):
+            if (
+                self.is_nvidia
+                and self.launch_time is not None
+                and self.prev_time is not None
+            ):
+                # NVIDIA drivers spin a core in clWaitForEvents, sleep through
+                # most of the launch first; the launches queued behind keep the
+                # device busy
+                remaining = self.prev_time + self.launch_time * 0.9 - time.time()
+                if remaining > 0:
+                    time.sleep(remaining)
+            slot.event.wait()
+        if self.tracer is not None:
+            self.trace_commands(slot)
+        self.free_slots.append(slot)
+        return slot
+
+    def find(self, log_stats: bool = True) -> List[bytearray]:
+        """
+        Keep pipeline_depth launches queued, wait for the oldest one and
+        return every hit of it as a RESULT_SIZE byte record
+        """
+        start_time = time.time()
+        while self.free_slots:
+            self.enqueue_launch()
+        slot = self.wait_oldest()
+        # the other queued launches keep the device busy while hits are read
+        hit_count = int.from_bytes(slot.result_count, "little")
+        results = self.read_results(slot, hit_count)
+        if self.counters is not None and not self.aborted:
+            self.count_launch(slot, hit_count)
+        # launches cut short by abort() did not search all of their keys, and
+        # hits beyond the result capacity are lost: both chunks stay unmarked
+        # and a resumed search covers them again
+        complete = not self.aborted and hit_count <= len(results)
+        self.completed_chunk = slot.chunk if complete else None
+        self.enqueue_launch()
+        now = time.time()
+        # with a full pipeline launches complete back to back, so the time
+        # between completions is the launch duration
+        elapsed = now - (self.prev_time if self.prev_time is not None else start_time)
+        if self.prev_time is not None:
+            self.launch_time = elapsed
+            if self.allocator is not None:
+                self.allocator.record(self.index, slot.work_size, elapsed)
+        self.prev_time = now
         if log_stats:
             logging.info(
-                f"GPU {self.display_index} Speed: {global_work_size / ((time.time() - start_time) * 1e6):.2f} MH/s"
+                f"Device {self.display_index} Speed: {slot.work_size / (elapsed * 1e6):.2f} MH/s"
+            )
+        return results
+
+    def count_launch(self, slot: LaunchSlot, hit_count: int) -> None:
+        """
+        Publish a completed launch to the shared counters. The device idled
+        from the end of the previous launch to the start of this one.
+        """
+        kernel = slot.kernel_event.profile
+        start = slot.first_event.profile.start
+        end = slot.event.profile.end
+        idle = 0 if self.prev_end is None else max(start - self.prev_end, 0)
+        self.prev_end = end
+        match_depths = self.launch_match_depths(slot)
+        self.counters.record_launch(
+            self.index,
+            slot.work_size,
+            hit_count,
+            (kernel.end - kernel.start) / 1e9,
+            idle / 1e9,
+            match_depths,
+            # the kernel only counts the keys passing the prefilters
+            max(slot.work_size - sum(match_depths), 0) if match_depths else 0,
+        )
+
+    def launch_match_depths(self, slot: LaunchSlot) -> List[int]:
+        """
+        Keys of a completed launch that passed the prefilters by match depth,
+        empty without match_histogram
+        """
+        if slot.memobj_match_depths is None:
+            return []
+        return [
+            int.from_bytes(slot.match_depths[i : i + 4], "little")
+            for i in range(0, len(slot.match_depths), 4)
+        ]
+
+    def measure_speed(self, min_time: float = 0.1) -> float:
+        """
+        Keys per second of this device alone: single launches from one work
+        group up, doubled until one runs for min_time. Hits are dropped.
+        """
+        size = self.setting.keys_per_item * self.setting.local_work_size
+        # the first launch may include lazy compilation, it is not timed
+        self.time_launch(size)
+        while True:
+            elapsed = self.time_launch(size)
+            if elapsed >= min_time or size >= self.setting.global_work_size:
+                return size / elapsed
+            size *= 2
+
+    def time_launch(self, size: int) -> float:
+        """
+        Seconds of one launch of size keys on an idle device, hits are dropped
+        """
+        self.discard_in_flight()
+        start_time = time.time()
+        self.enqueue_launch(Chunk(bytes(self.setting.key32), 0, size))
+        self.wait_oldest()
+        return time.time() - start_time
+
+    def read_results(self, slot: LaunchSlot, count: int) -> List[bytearray]:
+        if count == 0:
+            return []
+        capacity = self.setting.result_capacity
+        if count > capacity:
+            logging.warning(
+                f"Device {self.display_index} dropped {count - capacity} hit(s), result capacity is {capacity}"
+            )
+            count = capacity
+        output = bytearray(RESULT_SIZE * count)
+        with self.trace_span("read hits", hits=count):
+            event = cl.enqueue_copy(self.read_queue, output, slot.memobj_results)
+            event.wait()
+        if self.tracer is not None:
+            self.tracer.device_command(
+                "read hits", event, self.clock_offset, self.trace_pid, READ_QUEUE_TID
             )
-        return self.output
+        return [
+            output[i * RESULT_SIZE : (i + 1) * RESULT_SIZE] for i in range(count)
+        ]
+
+    def discard_in_flight(self) -> None:
+        """
+        Wait for queued launches and drop their hits
+        """
+        while self.in_flight:
+            self.wait_oldest()
+        self.prev_time = None
+        self.launch_time = None
+        # the device idles on purpose until the next counted launch
+        self.prev_end = None
+
+    def abort(self) -> None:
+        """
+        Make queued and running launches return early, safe to call from
+        another thread. Hits of launches cut short are lost.
+        """
+        if self.aborted or self.closed:
+            return
+        self.aborted = True
+        cl.enqueue_copy(
+            self.abort_queue, self.memobj_abort, self.abort_word, is_blocking=False
+        )
+        self.abort_queue.flush()
+
+    def close(self) -> None:
+        self.discard_in_flight()
+        self.command_queue.finish()
+        self.abort_queue.finish()
+        self.closed = True
+
+
+def abort_on_cancel(searcher: Searcher, cancel_token) -> threading.Thread:
+    """
+    Abort the searcher's launches as soon as cancel_token is cancelled,
+    instead of after the launch being waited on
+    """
+
+    def watch() -> None:
+        cancel_token.wait()
+        searcher.abort()
+
+    watcher = threading.Thread(target=watch, daemon=True)
+    watcher.start()
+    return watcher
+
+
+def log_cancel_latency(searcher: Searcher, cancel_token) -> None:
+    if cancel_token.is_cancelled():
+        latency = time.time() - cancel_token.cancelled_at
+        logging.info(
+            f"Device {searcher.display_index} idle {latency * 1e3:.1f} ms after cancel"
+        )
 
 
 def multi_gpu_init(
@@ -94,6 +593,7 @@ def multi_gpu_init(
     stop_flag,
     lock,
     chosen_devices: Optional[Tuple[int, List[int]]] = None,
+    device_filter: str = DEFAULT_DEVICE_FILTER,
 ) -> List:
     try:
         searcher = Searcher(
@@ -101,37 +601,100 @@ def multi_gpu_init(
             index=index,
             setting=setting,
             chosen_devices=chosen_devices,
+            device_filter=device_filter,
         )
-        i = 0
-        st = time.time()
-        while True:
-            result = searcher.find(i == 0)
-            if result[0]:
-                with lock:
-                    if not stop_flag.value:
-                        stop_flag.value = 1
-                return list(result)
-            if time.time() - st > max(gpu_counts, 1):
-                i = 0
-                st = time.time()
-                with lock:
-                    if stop_flag.value:
-                        return list(result)
-            else:
-                i += 1
+        try:
+            last_log = 0.0
+            while True:
+                log_stats = time.time() - last_log > max(gpu_counts, 1)
+                if log_stats:
+                    last_log = time.time()
+                results = searcher.find(log_stats)
+                if results:
+                    with lock:
+                        if not stop_flag.value:
+                            stop_flag.value = 1
+                    return [list(result) for result in results]
+                # checked after every launch, a few hundred microseconds of
+                # IPC against launches that run for much longer
+                if stop_flag.value:
+                    return []
+        finally:
+            searcher.close()
+    except Exception as e:
+        logging.exception(e)
+    return []
+
+
+def search_worker(
+    index: int,
+    setting: HostSetting,
+    cancel_token,
+    result_queue,
+    chosen_devices: Optional[Tuple[int, List[int]]] = None,
+    binary: Optional[bytes] = None,
+    device_filter: str = DEFAULT_DEVICE_FILTER,
+    allocator: Optional[KeyspaceAllocator] = None,
+    tracer: Optional[Tracer] = None,
+    counters: Optional[SearchCounters] = None,
+) -> None:
+    """
+    Search on one device until cancel_token is cancelled, streaming every hit
+    to result_queue. The program is built once for the whole run, None is put
+    on the queue when the worker exits. Launches take their keys from
+    allocator when one is shared between the workers, and every chunk
+    searched completely is then put on the queue after its hits. Launches
+    are traced by tracer and published to counters when set.
+    """
+    try:
+        searcher = Searcher(
+            kernel_source=setting.kernel_source,
+            index=index,
+            setting=setting,
+            chosen_devices=chosen_devices,
+            binary=binary,
+            device_filter=device_filter,
+            allocator=allocator,
+            tracer=tracer,
+            counters=counters,
+        )
+        abort_on_cancel(searcher, cancel_token)
+        try:
+            last_log = 0.0
+            while not cancel_token.is_cancelled():
+                log_stats = time.time() - last_log > 1
+                if log_stats:
+                    last_log = time.time()
+                for result in searcher.find(log_stats):
+                    result_queue.put(bytes(result))
+                if allocator is not None and searcher.completed_chunk is not None:
+                    # after its hits, so whoever reads the queue saved them
+                    # before it learns the chunk is done
+                    result_queue.put(searcher.completed_chunk)
+        finally:
+            searcher.close()
+        log_cancel_latency(searcher, cancel_token)
     except Exception as e:
         logging.exception(e)
-    return [0]
+    finally:
+        if tracer is not None:
+            # before the driver sees the worker exit and merges the trace
+            tracer.flush()
+        result_queue.put(None)
 
 
-def save_result(outputs: List, output_dir: str) -> int:
+def save_result(outputs: List, output_dir: str, limit: Optional[int] = None) -> int:
+    """
+    Save the hits returned by every device, at most limit of them
+    """
     from core.utils.crypto import save_keypair
 
     result_count = 0
     for output in outputs:
-        if not output[0]:
-            continue
-        result_count += 1
-        pv_bytes = bytes(output[1:])
-        save_keypair(pv_bytes, output_dir)
+        for result in output:
+            if limit is not None and result_count >= limit:
+                return result_count
+            result_count += 1
+            pv_bytes = bytes(result[1:])
+            save_keypair(pv_bytes, output_dir)
     return result_count
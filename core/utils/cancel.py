@@ -0,0 +1,43 @@
+import multiprocessing
+import time
+from typing import Optional
+
+
+class CancelToken:
+    """
+    Cancellation shared by the workers of one search. Backed by a semaphore
+    and shared memory, so it can be waited on from threads and spawned
+    processes alike.
+    """
+
+    def __init__(self) -> None:
+        self._event = multiprocessing.Event()
+        self._cancelled_at = multiprocessing.Value("d", 0.0, lock=False)
+
+    def cancel(self) -> None:
+        if not self._event.is_set():
+            self._cancelled_at.value = time.time()
+        self._event.set()
+
+    def is_cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._event.wait(timeout)
+
+    @property
+    def cancelled_at(self) -> float:
+        """
+        Wall clock time of the first cancel() call, 0 while not cancelled
+        """
+        return self._cancelled_at.value
+
+    @property
+    def value(self) -> int:
+        # stop_flag compatible view: reading polls, assigning non-zero cancels
+        return int(self._event.is_set())
+
+    @value.setter
+    def value(self, value: int) -> None:
+        if value:
+            self.cancel()
@@ -0,0 +1,227 @@
+import json
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from core.utils.counters import DeviceCounters, SearchCounters
+from core.utils.keyspace import Chunk, KeyspaceAllocator
+from core.utils.ranges import Range, merge_ranges
+
+CHECKPOINT_VERSION = 1
+# seconds between checkpoints written as chunks complete
+DEFAULT_CHECKPOINT_SECONDS = 60.0
+
+
+class SearchJob(NamedTuple):
+    """
+    What a search looks for, a resumed search must look for the same
+    """
+
+    starts_with: Tuple[str, ...]
+    ends_with: Tuple[str, ...]
+    is_case_sensitive: bool
+    iteration_bits: int
+    count: int
+
+
+class CheckpointState(NamedTuple):
+    job: SearchJob
+    base_seed: bytes
+    granularity: int
+    # keys handed out, none after it were searched
+    cursor: int
+    # inclusive cursor ranges searched completely
+    searched: Tuple[Range, ...]
+    # public keys of the hits saved
+    hits: Tuple[str, ...]
+    devices: Tuple[DeviceCounters, ...]
+
+    @property
+    def searched_keys(self) -> int:
+        return sum(high - low + 1 for low, high in self.searched)
+
+    def gaps(self) -> List[Tuple[int, int]]:
+        """
+        [start, end) ranges before the cursor that were never searched
+        completely: the launches in flight when the checkpoint was written
+        """
+        gaps = []
+        position = 0
+        for low, high in self.searched:
+            if low > position:
+                gaps.append((position, low))
+            position = high + 1
+        if position < self.cursor:
+            gaps.append((position, self.cursor))
+        return gaps
+
+
+class Checkpoint:
+    """
+    Records which chunks of a KeyspaceAllocator's keyspace were searched and
+    which hits were saved, and writes them to path atomically every interval
+    seconds. Only the process reading the workers' result queue updates it,
+    chunks arrive there after their hits, so every checkpoint is a state the
+    search really was in.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        job: SearchJob,
+        allocator: KeyspaceAllocator,
+        counters: Optional[SearchCounters] = None,
+        resumed: Optional[CheckpointState] = None,
+        interval: float = DEFAULT_CHECKPOINT_SECONDS,
+    ) -> None:
+        self.path = Path(path)
+        self.job = job
+        self.allocator = allocator
+        self.counters = counters
+        self.interval = interval
+        self.searched: List[Range] = []
+        self.hits: List[str] = []
+        # counters of the runs before this one
+        self.previous_devices: Tuple[DeviceCounters, ...] = ()
+        if resumed is not None:
+            self.searched = list(resumed.searched)
+            self.hits = list(resumed.hits)
+            self.previous_devices = resumed.devices
+        self.last_save = time.time()
+
+    def add_chunk(self, chunk: Chunk) -> None:
+        start = self.allocator.chunk_start(chunk)
+        self.searched = merge_ranges(self.searched + [(start, start + chunk.size - 1)])
+        if time.time() - self.last_save >= self.interval:
+            self.save()
+
+    def add_hit(self, pubkey: str) -> bool:
+        """
+        Record a saved hit, False when it was saved before: its chunk was in
+        flight when the search stopped and got searched again
+        """
+        if pubkey in self.hits:
+            return False
+        self.hits.append(pubkey)
+        return True
+
+    def device_counters(self) -> List[DeviceCounters]:
+        """
+        Counters of every device, added to those of the runs before when
+        the devices are the same
+        """
+        current = [] if self.counters is None else self.counters.snapshot()
+        if len(current) != len(self.previous_devices):
+            return current or list(self.previous_devices)
+        return [add_counters(a, b) for a, b in zip(self.previous_devices, current)]
+
+    def save(self) -> Path:
+        data = {
+            "version": CHECKPOINT_VERSION,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "job": {
+                **self.job._asdict(),
+                "starts_with": list(self.job.starts_with),
+                "ends_with": list(self.job.ends_with),
+            },
+            "base_seed": self.allocator.base_seed.hex(),
+            "granularity": self.allocator.granularity,
+            "cursor": self.allocator.cursor,
+            "searched": [list(r) for r in self.searched],
+            "hits": self.hits,
+            "devices": [counters._asdict() for counters in self.device_counters()],
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            # the rename must not be on disk before the data is
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.last_save = time.time()
+        return self.path
+
+
+def add_counters(a: DeviceCounters, b: DeviceCounters) -> DeviceCounters:
+    return DeviceCounters(
+        *(
+            tuple(x + y for x, y in zip(left, right))
+            if isinstance(left, tuple)
+            else left + right
+            for left, right in zip(a, b)
+        )
+    )
+
+
+def load_checkpoint(path: str) -> CheckpointState:
+    """
+    Read a checkpoint written by Checkpoint.save, ValueError when it is
+    unreadable
+    """
+    try:
+        with open(path) as f:
+            data = json.load(f)
+        if data["version"] != CHECKPOINT_VERSION:
+            raise ValueError(f"unsupported version {data['version']}")
+        job = data["job"]
+        devices: Sequence[Dict] = data["devices"]
+        return CheckpointState(
+            job=SearchJob(
+                starts_with=tuple(job["starts_with"]),
+                ends_with=tuple(job["ends_with"]),
+                is_case_sensitive=bool(job["is_case_sensitive"]),
+                iteration_bits=int(job["iteration_bits"]),
+                count=int(job["count"]),
+            ),
+            base_seed=bytes.fromhex(data["base_seed"]),
+            granularity=int(data["granularity"]),
+            cursor=int(data["cursor"]),
+            searched=tuple(
+                (int(low), int(high))
+                for low, high in merge_ranges(data["searched"])
+            ),
+            hits=tuple(data["hits"]),
+            devices=tuple(
+                DeviceCounters(
+                    **{
+                        name: tuple(value) if isinstance(value, list) else value
+                        for name, value in device.items()
+                    }
+                )
+                for device in devices
+            ),
+        )
+    except (OSError, KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"Cannot resume from {path}: {e}") from e
+
+
+def resume_allocator(
+    state: CheckpointState, device_count: int, granularity: int
+) -> KeyspaceAllocator:
+    """
+    Allocator continuing a checkpointed search: the same keyspace and cursor,
+    with the never completed gaps before it handed out first
+    """
+    if state.granularity % granularity:
+        raise ValueError(
+            f"The checkpoint's chunks are aligned to {state.granularity} keys, "
+            f"the devices need {granularity}"
+        )
+    allocator = KeyspaceAllocator(
+        state.job.iteration_bits,
+        device_count,
+        state.granularity,
+        base_seed=state.base_seed,
+        cursor=state.cursor,
+        gaps=state.gaps(),
+    )
+    logging.info(
+        f"Resuming after {state.searched_keys:,} keys and {len(state.hits)} of "
+        f"{state.job.count} pubkey(s), {len(allocator.gaps)} unfinished chunk "
+        "range(s) are searched again first"
+    )
+    return allocator
@@ -0,0 +1,216 @@
+import multiprocessing
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+from core.config import MATCH_DEPTH_BINS
+from core.utils.ranges import ALPHABET
+
+# upper bounds in keys per second of the launch throughput histogram
+THROUGHPUT_BUCKETS: Tuple[float, ...] = tuple(
+    m * 10.0**e for e in range(4, 10) for m in (1, 2.5, 5)
+)
+
+
+class DeviceCounters(NamedTuple):
+    """
+    Totals of one device since the search started
+    """
+
+    keys: int
+    launches: int
+    hits: int
+    kernel_seconds: float
+    idle_seconds: float
+    # launches per THROUGHPUT_BUCKETS bound they fell under, the last entry
+    # counts the faster ones
+    throughput_counts: Tuple[int, ...]
+    # keys per second of every launch added up
+    throughput_sum: float
+    # keys passing the prefilters by the number of pattern characters they
+    # matched, all zero without match_histogram
+    match_depths: Tuple[int, ...]
+    # keys the prefilters rejected before encoding, with match_histogram
+    prefiltered: int = 0
+
+
+class SearchCounters:
+    """
+    Exact per-device totals of a search, published by the workers after every
+    launch: keys tried, launches, hits, kernel time, device idle time and,
+    with match_histogram, keys by match depth and keys prefiltered.
+    Backed by shared memory like CancelToken, so it can be read from threads
+    and spawned processes alike.
+    """
+
+    def __init__(self, device_count: int) -> None:
+        self.device_count = device_count
+        # one lock, so a snapshot never sees half of a launch
+        self._lock = multiprocessing.Lock()
+        self._keys = multiprocessing.Array("Q", device_count, lock=False)
+        self._launches = multiprocessing.Array("Q", device_count, lock=False)
+        self._hits = multiprocessing.Array("Q", device_count, lock=False)
+        self._kernel_seconds = multiprocessing.Array("d", device_count, lock=False)
+        self._idle_seconds = multiprocessing.Array("d", device_count, lock=False)
+        self._bucket_count = len(THROUGHPUT_BUCKETS) + 1
+        self._throughput_counts = multiprocessing.Array(
+            "Q", device_count * self._bucket_count, lock=False
+        )
+        self._throughput_sum = multiprocessing.Array("d", device_count, lock=False)
+        self._match_depths = multiprocessing.Array(
+            "Q", device_count * MATCH_DEPTH_BINS, lock=False
+        )
+        self._prefiltered = multiprocessing.Array("Q", device_count, lock=False)
+
+    def record_launch(
+        self,
+        device: int,
+        keys: int,
+        hits: int,
+        kernel_seconds: float,
+        idle_seconds: float,
+        match_depths: Sequence[int] = (),
+        prefiltered: int = 0,
+    ) -> None:
+        """
+        Add a completed launch of keys keys, whose kernel ran for
+        kernel_seconds after the device idled for idle_seconds, and
+        prefiltered of them were rejected by the prefilters
+        """
+        bucket = next(
+            (
+                i
+                for i, bound in enumerate(THROUGHPUT_BUCKETS)
+                if keys <= bound * kernel_seconds
+            ),
+            len(THROUGHPUT_BUCKETS),
+        )
+        with self._lock:
+            self._keys[device] += keys
+            self._launches[device] += 1
+            self._hits[device] += hits
+            self._kernel_seconds[device] += kernel_seconds
+            self._idle_seconds[device] += idle_seconds
+            self._throughput_counts[device * self._bucket_count + bucket] += 1
+            if kernel_seconds > 0:
+                self._throughput_sum[device] += keys / kernel_seconds
+            for depth, count in enumerate(match_depths):
+                self._match_depths[device * MATCH_DEPTH_BINS + depth] += count
+            self._prefiltered[device] += prefiltered
+
+    def snapshot(self) -> List[DeviceCounters]:
+        with self._lock:
+            return [
+                self._device_counters(device) for device in range(self.device_count)
+            ]
+
+    def _device_counters(self, device: int) -> DeviceCounters:
+        first_bucket = device * self._bucket_count
+        return DeviceCounters(
+            self._keys[device],
+            self._launches[device],
+            self._hits[device],
+            self._kernel_seconds[device],
+            self._idle_seconds[device],
+            tuple(
+                self._throughput_counts[
+                    first_bucket : first_bucket + self._bucket_count
+                ]
+            ),
+            self._throughput_sum[device],
+            tuple(
+                self._match_depths[
+                    device * MATCH_DEPTH_BINS : (device + 1) * MATCH_DEPTH_BINS
+                ]
+            ),
+            self._prefiltered[device],
+        )
+
+    def total_keys(self) -> int:
+        with self._lock:
+            return sum(self._keys)
+
+    def device_keys(self, device: int) -> int:
+        with self._lock:
+            return self._keys[device]
+
+
+def total_match_depths(counters: Sequence[DeviceCounters]) -> List[int]:
+    return [sum(depths) for depths in zip(*(c.match_depths for c in counters))]
+
+
+def acceptance_rates(match_depths: Sequence[int]) -> List[Optional[float]]:
+    """
+    Measured probability of every pattern character matching, given that the
+    characters before it did: keys of depth d or more over keys of d - 1 or
+    more, None while no key got that far
+    """
+    rates: List[Optional[float]] = []
+    reached = sum(match_depths)
+    for depth in range(1, len(match_depths)):
+        deeper = sum(match_depths[depth:])
+        rates.append(deeper / reached if reached else None)
+        reached = deeper
+    return rates
+
+
+def expected_rate(character: str, is_case_sensitive: bool) -> float:
+    """
+    Probability of a uniformly random base58 digit matching character
+    """
+    if is_case_sensitive:
+        return 1 / len(ALPHABET)
+    matches = [c for c in ALPHABET if c.lower() == character.lower()]
+    return len(matches) / len(ALPHABET)
+
+
+def expected_rates(
+    starts_with: Sequence[str], ends_with: Sequence[str], is_case_sensitive: bool
+) -> List[Optional[float]]:
+    """
+    Theoretical acceptance_rates of a single prefix and suffix, empty for
+    several. The first character of an address is not uniform, it has none.
+    """
+    if len(starts_with) > 1 or len(ends_with) > 1:
+        return []
+    prefix = starts_with[0] if starts_with else ""
+    suffix = ends_with[0] if ends_with else ""
+    rates: List[Optional[float]] = [
+        None if i == 0 else expected_rate(c, is_case_sensitive)
+        for i, c in enumerate(prefix)
+    ]
+    # suffixes are matched from the last character on
+    rates += [expected_rate(c, is_case_sensitive) for c in reversed(suffix)]
+    return rates
+
+
+def format_acceptance(
+    match_depths: Sequence[int],
+    pattern_length: int,
+    expected: Sequence[Optional[float]] = (),
+    prefiltered: int = 0,
+    expected_prefilter: Optional[float] = None,
+) -> str:
+    """
+    Measured acceptance rate of the prefilters when they rejected keys, then
+    of the first pattern_length characters of the keys passing them, as 1 in
+    n, each followed by the expected one when known. The characters decided
+    by the prefilters match nearly every key passing them, the per-character
+    expectation of a random key does not apply then.
+    """
+    parts = []
+    if prefiltered:
+        passed = sum(match_depths)
+        rate = passed / (passed + prefiltered)
+        text = f"prefilter 1/{1 / rate:.1f}" if rate else "prefilter 0"
+        if expected_prefilter:
+            text += f" (1/{1 / expected_prefilter:.1f})"
+        parts.append(text)
+        expected = ()
+    rates = acceptance_rates(match_depths)[:pattern_length]
+    for depth, rate in enumerate(rates):
+        if rate is None:
+            break
+        text = f"#{depth + 1} 1/{1 / rate:.1f}" if rate else f"#{depth + 1} 0"
+        if depth < len(expected) and expected[depth]:
+            text += f" (1/{1 / expected[depth]:.1f})"
+        parts.append(text)
+    return ", ".join(parts)
@@ -0,0 +1,113 @@
+import struct
+from functools import lru_cache
+from typing import List, Tuple
+
+P = 2**255 - 19
+D = -121665 * pow(121666, P - 2, P) % P
+BASE_Y = 4 * pow(5, P - 2, P) % P
+# limb offsets of ref10's fe, alternating 26 and 25 bits
+LIMB_SHIFTS = (0, 26, 51, 77, 102, 128, 153, 179, 204, 230)
+# limb offsets of the radix 2^51 fe of kernel.cl (FE_RADIX51)
+LIMB_SHIFTS_51 = (0, 51, 102, 153, 204)
+# ge_precomp is three fe of ten int32 limbs, aligned to 32 bytes in kernel.cl
+PRECOMP_SIZE = 128
+WIDE_TABLE_POSITIONS = 32
+WIDE_TABLE_MULTIPLES = 128
+
+Point = Tuple[int, int]
+
+
+def recover_x(y: int) -> int:
+    xx = (y * y - 1) * pow(D * y * y + 1, P - 2, P) % P
+    x = pow(xx, (P + 3) // 8, P)
+    if (x * x - xx) % P != 0:
+        x = x * pow(2, (P - 1) // 4, P) % P
+    return P - x if x & 1 else x
+
+
+BASE = (recover_x(BASE_Y), BASE_Y)
+IDENTITY = (0, 1)
+
+
+def point_add(p: Point, q: Point) -> Point:
+    """
+    Affine twisted Edwards addition, complete on ed25519
+    """
+    x1, y1 = p
+    x2, y2 = q
+    t = D * x1 * x2 * y1 * y2 % P
+    # one inversion for both denominators
+    inverse = pow((1 + t) * (1 - t), P - 2, P)
+    x3 = (x1 * y2 + x2 * y1) * (1 - t) * inverse % P
+    y3 = (y1 * y2 + x1 * x2) * (1 + t) * inverse % P
+    return x3, y3
+
+
+def scalar_mult(k: int, p: Point = BASE) -> Point:
+    result = IDENTITY
+    while k:
+        if k & 1:
+            result = point_add(result, p)
+        p = point_add(p, p)
+        k >>= 1
+    return result
+
+
+def encode_point(p: Point) -> bytes:
+    x, y = p
+    return (y | ((x & 1) << 255)).to_bytes(32, "little")
+
+
+def fe_limbs(value: int, shifts: Tuple[int, ...] = LIMB_SHIFTS) -> List[int]:
+    """
+    ref10 fe limbs of a field element, reduced. Pass LIMB_SHIFTS_51 for the
+    radix 2^51 representation.
+    """
+    value %= P
+    bounds = shifts[1:] + (255,)
+    return [
+        (value >> shift) & ((1 << (end - shift)) - 1)
+        for shift, end in zip(shifts, bounds)
+    ]
+
+
+def limbs_value(limbs: List[int], shifts: Tuple[int, ...] = LIMB_SHIFTS) -> int:
+    return sum(limb << shift for limb, shift in zip(limbs, shifts)) % P
+
+
+def precomp(
+    p: Point, shifts: Tuple[int, ...] = LIMB_SHIFTS
+) -> Tuple[List[int], List[int], List[int]]:
+    """
+    ge_precomp of an affine point: y + x, y - x and 2 * d * x * y
+    """
+    x, y = p
+    return (
+        fe_limbs(y + x, shifts),
+        fe_limbs(y - x, shifts),
+        fe_limbs(2 * D * x * y, shifts),
+    )
+
+
+@lru_cache(maxsize=2)
+def wide_base_table(field: str = "ref10") -> bytes:
+    """
+    ge_precomp entries m * 256^i * B for i < 32 and 1 <= m <= 128, position
+    major, as read by ge_scalarmult_base_wide in kernel.cl. The limbs follow
+    the field backend the kernel is built with.
+    """
+    if field == "radix51":
+        shifts, layout = LIMB_SHIFTS_51, "<15Q8x"
+    else:
+        shifts, layout = LIMB_SHIFTS, "<30i8x"
+    entries = []
+    position_base = BASE
+    for _ in range(WIDE_TABLE_POSITIONS):
+        multiple = position_base
+        for _ in range(WIDE_TABLE_MULTIPLES):
+            limbs = [limb for fe in precomp(multiple, shifts) for limb in fe]
+            entries.append(struct.pack(layout, *limbs))
+            multiple = point_add(multiple, position_base)
+        for _ in range(8):
+            position_base = point_add(position_base, position_base)
+    return b"".join(entries)
@@ -1,11 +1,20 @@
 import logging
 import platform
 from pathlib import Path
-from typing import Tuple
+from typing import Sequence, Tuple, Union
 
 import pyopencl as cl
 from base58 import b58decode
 
+from core.utils.odds import PatternOdds, check_pattern
+from core.utils.pattern import normalize_suffixes
+from core.utils.ranges import (
+    build_prefix_ranges,
+    build_suffix_residues,
+    range_words,
+    residue_words,
+)
+
 
 def check_character(name: str, character: str) -> None:
     try:
@@ -17,11 +26,23 @@ def check_character(name: str, character: str) -> None:
         raise e
 
 
+def check_pattern_odds(
+    starts_with: Sequence[str], ends_with: Sequence[str], is_case_sensitive: bool
+) -> PatternOdds:
+    try:
+        return check_pattern(starts_with, ends_with, is_case_sensitive)
+    except ValueError as e:
+        logging.error(str(e))
+        raise SystemExit(1)
+
+
 def load_kernel_source(
-    starts_with_list: Tuple[str], ends_with: str, is_case_sensitive: bool
+    starts_with_list: Tuple[str],
+    ends_with: Union[str, Sequence[str]],
+    is_case_sensitive: bool,
 ) -> str:
     """
-    Update OpenCL codes with parameters
+    Update OpenCL codes with parameters, ends_with is one suffix or several
     """
     prefixes = (
         [list(prefix.encode()) for prefix in starts_with_list]
@@ -34,7 +55,16 @@ def load_kernel_source(
     for p in prefixes:
         p.extend([0] * (max_prefix_len - len(p)))
 
-    SUFFIX_BYTES = list(ends_with.encode())
+    suffixes = [list(s.encode()) for s in normalize_suffixes(ends_with)] or [[]]
+    max_suffix_len = max(len(s) for s in suffixes)
+    # suffixes are right aligned, the kernel compares them with the address end
+    suffixes = [[0] * (max_suffix_len - len(s)) + s for s in suffixes]
+    prefix_ranges = build_prefix_ranges(starts_with_list, is_case_sensitive)
+    # an array needs at least one element, NR tells the kernel how many are used
+    prefix_range_words = range_words(prefix_ranges) or [0]
+    suffix_residues = build_suffix_residues(
+        normalize_suffixes(ends_with), is_case_sensitive
+    )
 
     kernel_path = Path(__file__).parent.parent / "opencl" / "kernel.cl"
     if not kernel_path.exists():
@@ -53,18 +83,40 @@ def load_kernel_source(
                 prefixes_str += "{" + ", ".join(map(str, prefix)) + "}, "
             prefixes_str = prefixes_str.rstrip(", ") + "}"
             source_lines[i] = f"constant uchar PREFIXES[N][L] = {prefixes_str};\n"
-        elif line.startswith("constant uchar SUFFIX[]"):
-            source_lines[i] = (
-                f"constant uchar SUFFIX[] = {{{', '.join(map(str, SUFFIX_BYTES))}}};\n"
+        elif line.startswith("#define M "):
+            source_lines[i] = f"#define M {len(suffixes)}\n"
+        elif line.startswith("#define K "):
+            source_lines[i] = f"#define K {max_suffix_len}\n"
+        elif line.startswith("constant uchar SUFFIXES"):
+            suffixes_str = ", ".join(
+                "{" + ", ".join(map(str, suffix)) + "}" for suffix in suffixes
             )
+            source_lines[i] = f"constant uchar SUFFIXES[M][K] = {{{suffixes_str}}};\n"
         elif line.startswith("constant bool CASE_SENSITIVE"):
             source_lines[i] = (
                 f"constant bool CASE_SENSITIVE = {str(is_case_sensitive).lower()};\n"
             )
+        elif line.startswith("#define NR "):
+            source_lines[i] = f"#define NR {len(prefix_ranges)}\n"
+        elif line.startswith("constant uint PREFIX_RANGE_TABLE[]"):
+            source_lines[i] = (
+                f"constant uint PREFIX_RANGE_TABLE[] = {{{', '.join(map(str, prefix_range_words))}}};\n"
+            )
+        elif line.startswith("#define NS "):
+            source_lines[i] = f"#define NS {sum(map(len, suffix_residues))}\n"
+        elif line.startswith("constant uint SUFFIX_RESIDUE_TABLE[]"):
+            source_lines[i] = (
+                f"constant uint SUFFIX_RESIDUE_TABLE[] = {{{', '.join(map(str, residue_words(suffix_residues)))}}};\n"
+            )
 
     source_str = "".join(source_lines)
     if "NVIDIA" in str(cl.get_platforms()) and platform.system() == "Windows":
         source_str = source_str.replace("#define __generic\n", "")
-    if cl.get_cl_header_version()[0] != 1 and platform.system() != "Windows":
-        source_str = source_str.replace("#define __generic\n", "")
     return source_str
+
+
+def load_runtime_kernel_source() -> str:
+    """
+    Pattern independent kernel source, the pattern is uploaded at runtime
+    """
+    return load_kernel_source((), "", True)
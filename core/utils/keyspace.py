@@ -0,0 +1,159 @@
+import multiprocessing
+import secrets
+from math import ceil
+from typing import NamedTuple, Optional, Sequence, Tuple
+
+# launches sized to last about this long once a device's speed is known
+DEFAULT_CHUNK_SECONDS = 0.25
+# weight of the latest launch in a device's speed estimate
+SPEED_SMOOTHING = 0.5
+# launches of a device not measured yet cover at most this many keys, blocks
+# of up to 2^64 keys are far too large for a first launch
+FIRST_CHUNK_KEYS = 1 << 16
+# the cursor is a 64-bit word of shared memory
+MAX_CURSOR = (1 << 64) - 1
+
+
+class Chunk(NamedTuple):
+    """
+    Keys [offset, offset + size) of the 2^iteration_bits block starting at seed
+    """
+
+    seed: bytes
+    offset: int
+    size: int
+
+
+class KeyspaceAllocator:
+    """
+    Hands out consecutive chunks of one keyspace to the devices of a search as
+    they ask for work, so no range is searched twice and fast devices never
+    wait for slow ones. Chunks are sized from each device's recent speed.
+
+    The keyspace is every 2^iteration_bits block after a random base seed,
+    walked by a cursor counting keys. A resumed search passes the cursor it
+    stopped at and the [start, end) gaps before it that were never completed,
+    which are handed out first. Backed by shared memory like CancelToken, so
+    it can be used from threads and spawned processes alike.
+    """
+
+    def __init__(
+        self,
+        iteration_bits: int,
+        device_count: int,
+        granularity: int,
+        chunk_seconds: float = DEFAULT_CHUNK_SECONDS,
+        base_seed: Optional[bytes] = None,
+        cursor: int = 0,
+        gaps: Sequence[Tuple[int, int]] = (),
+    ) -> None:
+        self.iteration_bits = iteration_bits
+        self.block_size = 1 << iteration_bits
+        # chunks start at multiples of granularity, whole blocks when smaller
+        self.granularity = min(granularity, self.block_size)
+        if cursor % self.granularity:
+            raise ValueError("cursor must be a multiple of the granularity")
+        self.device_count = device_count
+        self.chunk_seconds = chunk_seconds
+        if base_seed is None:
+            iteration_bytes = int(ceil(iteration_bits / 8))
+            base_seed = secrets.token_bytes(32 - iteration_bytes) + bytes(
+                iteration_bytes
+            )
+        if len(base_seed) != 32:
+            raise ValueError("base_seed must be 32 bytes")
+        self.base_seed = bytes(base_seed)
+        self._cursor = multiprocessing.Value("Q", cursor)
+        # start and end of every gap left, guarded by the cursor's lock
+        self._gaps = multiprocessing.Array(
+            "Q", [bound for gap in gaps for bound in gap] or [0], lock=False
+        )
+        self._gap_count = multiprocessing.Value("Q", len(gaps), lock=False)
+        # keys per second of every device, 0 until its first launch completes
+        self._speeds = multiprocessing.Array("d", device_count)
+        # most keys per launch of every device, 0 for no limit
+        self._limits = multiprocessing.Array("Q", device_count)
+
+    @property
+    def cursor(self) -> int:
+        """
+        Keys handed out so far, every key before it belongs to some chunk
+        """
+        return self._cursor.value
+
+    @property
+    def gaps(self) -> Tuple[Tuple[int, int], ...]:
+        """
+        [start, end) ranges before the cursor still to be handed out
+        """
+        with self._cursor.get_lock():
+            return tuple(
+                (self._gaps[2 * i], self._gaps[2 * i + 1])
+                for i in range(self._gap_count.value)
+            )
+
+    def block_seed(self, block: int) -> bytes:
+        seed = int.from_bytes(self.base_seed, "big") + block * self.block_size
+        return (seed % (1 << 256)).to_bytes(32, "big")
+
+    def chunk_start(self, chunk: Chunk) -> int:
+        """
+        Cursor position of the first key of a chunk this allocator handed out
+        """
+        seed = int.from_bytes(chunk.seed, "big") - int.from_bytes(self.base_seed, "big")
+        return seed % (1 << 256) + chunk.offset
+
+    def chunk_size(self, device: int) -> int:
+        """
+        Keys a launch of device should cover: chunk_seconds of its speed, an
+        even share of one block up to FIRST_CHUNK_KEYS until it is measured
+        """
+        speed = self._speeds[device]
+        if speed > 0:
+            size = int(speed * self.chunk_seconds)
+        else:
+            size = min(self.block_size // self.device_count, FIRST_CHUNK_KEYS)
+        if self._limits[device]:
+            size = min(size, self._limits[device])
+        size -= size % self.granularity
+        return min(max(size, self.granularity), self.block_size)
+
+    def set_limit(self, device: int, launch_keys: int) -> None:
+        """
+        Never give device chunks of more than launch_keys keys, e.g. the
+        launch size its profile was tuned for
+        """
+        self._limits[device] = launch_keys
+
+    def allocate(self, device: int) -> Chunk:
+        size = self.chunk_size(device)
+        with self._cursor.get_lock():
+            gap = self._gap_count.value - 1
+            start = self._gaps[2 * gap] if gap >= 0 else self._cursor.value
+            block, offset = divmod(start, self.block_size)
+            # chunks stay inside one block, the kernel adds offsets without carry
+            size = min(size, self.block_size - offset)
+            if gap >= 0:
+                size = min(size, self._gaps[2 * gap + 1] - start)
+                self._gaps[2 * gap] = start + size
+                if start + size == self._gaps[2 * gap + 1]:
+                    self._gap_count.value = gap
+            else:
+                if start + size > MAX_CURSOR:
+                    raise OverflowError("the keyspace of this allocator is exhausted")
+                self._cursor.value = start + size
+        return Chunk(self.block_seed(block), offset, size)
+
+    def record(self, device: int, keys: int, seconds: float) -> None:
+        """
+        Fold the speed of a completed launch into the device's estimate
+        """
+        if seconds <= 0:
+            return
+        speed = keys / seconds
+        previous = self._speeds[device]
+        self._speeds[device] = (
+            speed
+            if previous == 0
+            else previous + SPEED_SMOOTHING * (speed - previous)
+        )
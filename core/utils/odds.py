@@ -0,0 +1,342 @@
+import math
+from bisect import bisect_left
+from datetime import timedelta
+from itertools import product
+from typing import Dict, List, NamedTuple, Sequence, Tuple
+
+from core.utils.ranges import (
+    ALPHABET,
+    KEY_BITS,
+    Range,
+    adjust_case,
+    build_prefix_ranges,
+    build_suffix_residues,
+    digit_variants,
+    digits_ranges,
+    merge_ranges,
+    to_digits,
+)
+
+# case variants of a prefix enumerated exactly, the digits beyond are
+# counted as uniform
+MAX_EXACT_VARIANTS = 1 << 14
+# address length of any key
+MAX_ADDRESS_LENGTH = 44
+PERCENTILES = (0.5, 0.9, 0.99)
+
+
+class PatternOdds(NamedTuple):
+    """
+    Probability of a random key matching a pattern, and of its parts
+    """
+
+    prefix: float
+    suffix: float
+    # of the whole pattern, prefix and suffix counted jointly
+    probability: float
+
+    @property
+    def expected_keys(self) -> float:
+        return math.inf if self.probability == 0 else 1 / self.probability
+
+
+class Eta(NamedTuple):
+    """
+    Seconds until the requested number of hits: the mean and the times by
+    which they arrived with 50, 90 and 99 percent probability
+    """
+
+    expected: float
+    p50: float
+    p90: float
+    p99: float
+
+
+def _variant_count(digits: Sequence[int], is_case_sensitive: bool) -> int:
+    return math.prod(len(digit_variants(d, is_case_sensitive)) for d in digits)
+
+
+def _without_extensions(
+    patterns: Sequence[str], is_case_sensitive: bool, from_end: bool
+) -> List[str]:
+    """
+    One of every set of patterns matching the same addresses, without the
+    patterns that start (end, from_end) with another one, their keys are
+    already counted. What remains matches disjoint sets of keys.
+    """
+
+    def key(pattern: str) -> Tuple[int, ...]:
+        digits = to_digits(pattern)
+        if not is_case_sensitive:
+            digits = [adjust_case(d) for d in digits]
+        return tuple(digits[::-1] if from_end else digits)
+
+    keys: Dict[Tuple[int, ...], str] = {}
+    for pattern in sorted(patterns):
+        keys.setdefault(key(pattern), pattern)
+    return [
+        pattern
+        for digits, pattern in keys.items()
+        if not any(
+            len(other) < len(digits) and digits[: len(other)] == other
+            for other in keys
+        )
+    ]
+
+
+def _prefix_ranges(prefix: str, is_case_sensitive: bool) -> Tuple[List[Range], float]:
+    """
+    Key ranges of the addresses starting with the longest head of prefix whose
+    case variants can be enumerated, and the odds of the digits after it,
+    counted as uniform
+    """
+    digits = to_digits(prefix)
+    head = len(digits)
+    while _variant_count(digits[:head], is_case_sensitive) > MAX_EXACT_VARIANTS:
+        head -= 1
+    ranges: List[Range] = []
+    choices = [digit_variants(d, is_case_sensitive) for d in digits[:head]]
+    for variant in product(*choices):
+        ranges.extend(digits_ranges(variant))
+    rest = _variant_count(digits[head:], is_case_sensitive) / 58 ** (
+        len(digits) - head
+    )
+    return merge_ranges(ranges), rest
+
+
+def _suffix_residues(
+    suffix: str, is_case_sensitive: bool
+) -> Tuple[int, List[int], float]:
+    """
+    Modulus and sorted residues of the keys whose addresses end with the
+    longest tail of suffix whose case variants can be enumerated, and the
+    odds of the digits before it, counted as uniform
+    """
+    digits = to_digits(suffix)
+    tail = len(digits)
+    while _variant_count(digits[-tail:], is_case_sensitive) > MAX_EXACT_VARIANTS:
+        tail -= 1
+    head = digits[: len(digits) - tail]
+    residues = set()
+    for variant in product(
+        *(digit_variants(d, is_case_sensitive) for d in digits[len(head) :])
+    ):
+        residue = 0
+        for d in variant:
+            residue = residue * 58 + d
+        residues.add(residue)
+    rest = _variant_count(head, is_case_sensitive) / 58 ** len(head)
+    return 58**tail, sorted(residues), rest
+
+
+def prefix_probability(starts_with: Sequence[str], is_case_sensitive: bool) -> float:
+    """
+    Probability of a uniformly random 256-bit key encoding to an address that
+    starts with one of the prefixes: the exact size of their key ranges over
+    2^256. 43 and 44 character addresses and the skewed leading digits are
+    part of the ranges. Characters beyond MAX_EXACT_VARIANTS case variants
+    are counted as uniform digits.
+    """
+    if not starts_with or "" in starts_with:
+        return 1.0
+    total = 0.0
+    for prefix in _without_extensions(starts_with, is_case_sensitive, False):
+        ranges, rest = _prefix_ranges(prefix, is_case_sensitive)
+        size = sum(high - low + 1 for low, high in ranges)
+        total += size / (1 << KEY_BITS) * rest
+    return min(total, 1.0)
+
+
+def suffix_probability(ends_with: Sequence[str], is_case_sensitive: bool) -> float:
+    """
+    Probability of an address ending with one of the suffixes. Its last k
+    digits are the key modulo 58^k, uniform to within 58^k / 2^256.
+    """
+    if not ends_with or "" in ends_with:
+        return 1.0
+    total = 0.0
+    for suffix in _without_extensions(ends_with, is_case_sensitive, True):
+        digits = to_digits(suffix)
+        if len(digits) > MAX_ADDRESS_LENGTH:
+            continue
+        total += _variant_count(digits, is_case_sensitive) / 58 ** len(digits)
+    return min(total, 1.0)
+
+
+def _keys_with_residues(
+    ranges: Sequence[Range], modulus: int, residues: Sequence[int]
+) -> int:
+    """
+    Keys of the ranges that are one of the sorted residues modulo modulus
+    """
+    count = 0
+    for low, high in ranges:
+        periods, rest = divmod(high - low + 1, modulus)
+        count += periods * len(residues)
+        # the last rest keys are the residues from low % modulus on, wrapping
+        start = low % modulus
+        end = start + rest
+        count += bisect_left(residues, min(end, modulus)) - bisect_left(
+            residues, start
+        )
+        if end > modulus:
+            count += bisect_left(residues, end - modulus)
+    return count
+
+
+def prefilter_probability(
+    starts_with: Sequence[str], ends_with: Sequence[str], is_case_sensitive: bool
+) -> float:
+    """
+    Probability of a uniformly random key passing the kernel's prefilters:
+    its prefix ranges, and its suffix residues once residues whose last
+    digits are in a shorter group are dropped, counted exactly
+    """
+    ranges = build_prefix_ranges(starts_with, is_case_sensitive) or [
+        (0, (1 << KEY_BITS) - 1)
+    ]
+    groups = build_suffix_residues(ends_with, is_case_sensitive)
+    if not any(groups):
+        keys = sum(high - low + 1 for low, high in ranges)
+        return keys / (1 << KEY_BITS)
+    keys = 0
+    for m, group in enumerate(groups, 1):
+        shorter = [(58**j, set(g)) for j, g in enumerate(groups[: m - 1], 1)]
+        residues = [
+            r for r in group if not any(r % mod in g for mod, g in shorter)
+        ]
+        keys += _keys_with_residues(ranges, 58**m, residues)
+    return keys / (1 << KEY_BITS)
+
+
+def joint_probability(
+    starts_with: Sequence[str], ends_with: Sequence[str], is_case_sensitive: bool
+) -> float:
+    """
+    Probability of an address starting with one of the prefixes and ending
+    with one of the suffixes: the keys in a prefix's ranges that are one of a
+    suffix's residues, counted exactly. Unlike the product of both odds this
+    holds for prefixes and suffixes sharing characters of short addresses, or
+    not fitting in one. Digits beyond MAX_EXACT_VARIANTS case variants on
+    either end are counted as uniform.
+    """
+    if not ends_with or "" in ends_with:
+        return prefix_probability(starts_with, is_case_sensitive)
+    if not starts_with or "" in starts_with:
+        return suffix_probability(ends_with, is_case_sensitive)
+    prefixes = [
+        _prefix_ranges(prefix, is_case_sensitive)
+        for prefix in _without_extensions(starts_with, is_case_sensitive, False)
+    ]
+    total = 0.0
+    for suffix in _without_extensions(ends_with, is_case_sensitive, True):
+        if len(suffix) > MAX_ADDRESS_LENGTH:
+            continue
+        modulus, residues, suffix_rest = _suffix_residues(suffix, is_case_sensitive)
+        for ranges, prefix_rest in prefixes:
+            keys = _keys_with_residues(ranges, modulus, residues)
+            total += keys / (1 << KEY_BITS) * prefix_rest * suffix_rest
+    return min(total, 1.0)
+
+
+def pattern_odds(
+    starts_with: Sequence[str], ends_with: Sequence[str], is_case_sensitive: bool
+) -> PatternOdds:
+    return PatternOdds(
+        prefix_probability(starts_with, is_case_sensitive),
+        suffix_probability(ends_with, is_case_sensitive),
+        joint_probability(starts_with, ends_with, is_case_sensitive),
+    )
+
+
+def check_pattern(
+    starts_with: Sequence[str], ends_with: Sequence[str], is_case_sensitive: bool
+) -> PatternOdds:
+    """
+    Odds of a pattern, ValueError when no key can match it
+    """
+    for pattern in list(starts_with) + list(ends_with):
+        bad = sorted(set(pattern) - set(ALPHABET))
+        if bad:
+            raise ValueError(f"{pattern!r} contains non-base58 characters {bad}")
+    odds = pattern_odds(starts_with, ends_with, is_case_sensitive)
+    if odds.prefix == 0:
+        raise ValueError(
+            f"No address starts with {' or '.join(map(repr, starts_with))}"
+        )
+    if odds.suffix == 0:
+        raise ValueError(f"No address ends with {' or '.join(map(repr, ends_with))}")
+    shortest = min(map(len, starts_with), default=0) + min(
+        map(len, ends_with), default=0
+    )
+    if shortest > MAX_ADDRESS_LENGTH:
+        raise ValueError(
+            f"Prefix and suffix need {shortest} characters, addresses have at "
+            f"most {MAX_ADDRESS_LENGTH}"
+        )
+    if odds.probability == 0:
+        raise ValueError(
+            f"No address starts with {' or '.join(map(repr, starts_with))} and "
+            f"ends with {' or '.join(map(repr, ends_with))}"
+        )
+    return odds
+
+
+def hits_by(mean_hits: float, count: int) -> float:
+    """
+    Probability of at least count hits when mean_hits are expected, the
+    Poisson tail. Terms are computed in log space, exp(-mean_hits) alone
+    underflows for large counts.
+    """
+    if mean_hits <= 0:
+        return 0.0 if count > 0 else 1.0
+    log_mean = math.log(mean_hits)
+    below = sum(
+        math.exp(k * log_mean - mean_hits - math.lgamma(k + 1)) for k in range(count)
+    )
+    return max(1.0 - below, 0.0)
+
+
+def time_to_hits(
+    probability: float, keys_per_second: float, count: int = 1
+) -> Eta:
+    """
+    Time until count hits at keys_per_second: Gamma distributed with mean
+    count / rate, its percentiles found by bisection on the Poisson tail
+    """
+    rate = probability * keys_per_second
+    if rate <= 0:
+        return Eta(math.inf, math.inf, math.inf, math.inf)
+    percentiles = []
+    for q in PERCENTILES:
+        # hits are expected after count / rate, bracket the percentile
+        low, high = 0.0, count / rate
+        while hits_by(high * rate, count) < q:
+            high *= 2
+        for _ in range(60):
+            middle = (low + high) / 2
+            if hits_by(middle * rate, count) < q:
+                low = middle
+            else:
+                high = middle
+        percentiles.append(high)
+    return Eta(count / rate, *percentiles)
+
+
+def format_duration(seconds: float) -> str:
+    if math.isinf(seconds):
+        return "never"
+    if seconds >= 365 * 86400:
+        return f"{seconds / (365.25 * 86400):.3g} years"
+    return str(timedelta(seconds=round(seconds)))
+
+
+def describe_odds(odds: PatternOdds) -> str:
+    return f"1 in {odds.expected_keys:,.0f} keys"
+
+
+def describe_eta(eta: Eta) -> str:
+    return (
+        f"expected {format_duration(eta.expected)}, P50 {format_duration(eta.p50)}, "
+        f"P90 {format_duration(eta.p90)}, P99 {format_duration(eta.p99)}"
+    )
@@ -0,0 +1,42 @@
+from typing import List, Sequence, Tuple
+
+WorkRange = Tuple[int, int]
+
+
+def partition_work(
+    total: int, weights: Sequence[float], granularity: int = 1
+) -> List[WorkRange]:
+    """
+    Split total keys into contiguous (offset, size) ranges, one per weight and
+    in proportion to it. Offsets and sizes are multiples of granularity, the
+    last range takes what is left. Every range gets at least one granule when
+    there are enough of them.
+    """
+    if not weights:
+        return []
+    if any(weight < 0 for weight in weights) or not any(weights):
+        raise ValueError("weights must be non-negative and not all zero")
+    units = total // granularity
+    weight_sum = sum(weights)
+    quotas = [units * weight / weight_sum for weight in weights]
+    counts = [int(quota) for quota in quotas]
+    # largest remainder first
+    by_remainder = sorted(
+        range(len(weights)), key=lambda i: quotas[i] - counts[i], reverse=True
+    )
+    for i in by_remainder[: units - sum(counts)]:
+        counts[i] += 1
+    if units >= len(weights):
+        for i, count in enumerate(counts):
+            if count == 0:
+                counts[counts.index(max(counts))] -= 1
+                counts[i] = 1
+
+    ranges: List[WorkRange] = []
+    offset = 0
+    for count in counts:
+        ranges.append((offset, count * granularity))
+        offset += count * granularity
+    last_offset, last_size = ranges[-1]
+    ranges[-1] = (last_offset, last_size + total - offset)
+    return ranges
@@ -0,0 +1,68 @@
+import struct
+from typing import List, Sequence, Tuple, Union
+
+from core.utils.ranges import (
+    build_prefix_ranges,
+    build_suffix_residues,
+    pack_ranges,
+    residue_words,
+)
+
+PATTERN_HEADER_WORDS = 8
+
+
+def normalize_suffixes(ends_with: Union[str, Sequence[str]]) -> Tuple[str, ...]:
+    if isinstance(ends_with, str):
+        return (ends_with,) if ends_with else ()
+    return tuple(s for s in ends_with if s)
+
+
+def build_pattern_table(
+    starts_with: Sequence[str],
+    ends_with: Union[str, Sequence[str]],
+    is_case_sensitive: bool,
+    pairs: Sequence[Tuple[int, int]] = (),
+) -> bytes:
+    """
+    Pack a pattern into the buffer read by kernels built with RUNTIME_PATTERN.
+
+    Without pairs a key matches when it has any of the prefixes and any of the
+    suffixes. With pairs it must match one of the (prefix index, suffix index)
+    combinations instead. The prefix ranges and suffix residues of every
+    pattern are appended, the kernel skips base58 for keys outside of them.
+    """
+    prefixes: List[bytes] = [p.encode() for p in starts_with if p] or [b""]
+    suffixes: List[bytes] = [s.encode() for s in normalize_suffixes(ends_with)] or [
+        b""
+    ]
+    for prefix_index, suffix_index in pairs:
+        if not (0 <= prefix_index < len(prefixes) and 0 <= suffix_index < len(suffixes)):
+            raise ValueError(f"Invalid pattern pair ({prefix_index}, {suffix_index})")
+        if prefix_index > 255 or suffix_index > 255:
+            raise ValueError("Pattern pairs support at most 256 prefixes and suffixes")
+
+    prefix_ranges = build_prefix_ranges(starts_with, is_case_sensitive)
+    suffix_residues = build_suffix_residues(
+        normalize_suffixes(ends_with), is_case_sensitive
+    )
+    prefix_width = max(len(p) for p in prefixes)
+    suffix_width = max(len(s) for s in suffixes)
+    header = struct.pack(
+        f"<{PATTERN_HEADER_WORDS}I",
+        len(prefixes),
+        prefix_width,
+        len(suffixes),
+        suffix_width,
+        int(is_case_sensitive),
+        len(pairs),
+        len(prefix_ranges),
+        sum(len(g) for g in suffix_residues),
+    )
+    body = b"".join(p.ljust(prefix_width, b"\x00") for p in prefixes)
+    body += b"".join(s.rjust(suffix_width, b"\x00") for s in suffixes)
+    body += bytes(i for pair in pairs for i in pair)
+    body += b"\x00" * (-len(body) % 4)
+    body += pack_ranges(prefix_ranges)
+    words = residue_words(suffix_residues)
+    body += struct.pack(f"<{len(words)}I", *words)
+    return header + body
@@ -0,0 +1,194 @@
+import struct
+from itertools import product
+from typing import List, Sequence, Tuple
+
+ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+KEY_BITS = 256
+# constant memory holds at most 64KB, a range takes 64 bytes
+MAX_PREFIX_RANGES = 256
+RANGE_WORDS = 16
+# the kernel filters on the key modulo 58^5, which fits in a uint
+SUFFIX_FILTER_DIGITS = 5
+MAX_SUFFIX_RESIDUES = 1024
+
+Range = Tuple[int, int]
+
+
+def adjust_case(digit: int) -> int:
+    """
+    ADJUST_INPUT_CASE of kernel.cl: maps the digits of both cases of a letter
+    to the same value
+    """
+    return digit - (digit > 32) * ((67091966 >> (digit & 31)) & 1) * (
+        24 + ((67079168 >> (digit & 31)) & 1)
+    )
+
+
+def to_digits(text: str) -> List[int]:
+    return [ALPHABET.index(c) for c in text]
+
+
+def digit_variants(digit: int, is_case_sensitive: bool) -> List[int]:
+    if is_case_sensitive:
+        return [digit]
+    return [d for d in range(58) if adjust_case(d) == adjust_case(digit)]
+
+
+def digits_ranges(digits: Sequence[int]) -> List[Range]:
+    """
+    Inclusive ranges of big-endian 256-bit public keys whose base58 address
+    starts with digits. Leading zero bytes encode as '1' (digit 0), the rest
+    of the key as base58 without leading zeros.
+    """
+    ones = next((i for i, d in enumerate(digits) if d != 0), len(digits))
+    if ones == len(digits):
+        # only '1's: the first len(digits) bytes are zero
+        if ones > KEY_BITS // 8:
+            return []
+        return [(0, (1 << (KEY_BITS - 8 * ones)) - 1)]
+    if ones >= KEY_BITS // 8:
+        return []
+
+    # exactly `ones` leading zero bytes, then the remaining digits
+    rest = digits[ones:]
+    value = 0
+    for d in rest:
+        value = value * 58 + d
+    rest_low = 1 << (KEY_BITS - 8 * ones - 8)
+    rest_high = (1 << (KEY_BITS - 8 * ones)) - 1
+    ranges = []
+    scale = 1
+    while value * scale <= rest_high:
+        low = max(value * scale, rest_low)
+        high = min((value + 1) * scale - 1, rest_high)
+        if low <= high:
+            ranges.append((low, high))
+        scale *= 58
+    return ranges
+
+
+def merge_ranges(ranges: Sequence[Range]) -> List[Range]:
+    merged: List[Range] = []
+    for low, high in sorted(ranges):
+        if merged and low <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], high))
+        else:
+            merged.append((low, high))
+    return merged
+
+
+def coarsen_ranges(ranges: Sequence[Range], max_ranges: int) -> List[Range]:
+    """
+    Close the smallest gaps until at most max_ranges remain. The result
+    covers a superset of the input, so it stays usable as a filter.
+    """
+    if len(ranges) <= max_ranges:
+        return list(ranges)
+    gaps = sorted(
+        range(1, len(ranges)), key=lambda i: ranges[i][0] - ranges[i - 1][1]
+    )
+    closed = set(gaps[: len(ranges) - max_ranges])
+    coarse: List[Range] = []
+    for i, (low, high) in enumerate(ranges):
+        if i in closed:
+            coarse[-1] = (coarse[-1][0], high)
+        else:
+            coarse.append((low, high))
+    return coarse
+
+
+def build_prefix_ranges(
+    starts_with: Sequence[str],
+    is_case_sensitive: bool,
+    max_ranges: int = MAX_PREFIX_RANGES,
+) -> List[Range]:
+    """
+    Sorted disjoint key ranges containing every key whose address starts with
+    one of the prefixes. Empty when there is nothing to filter on.
+
+    Case insensitive prefixes expand to one range set per case variant; long
+    prefixes are shortened until the variants fit, and the union is
+    coarsened to max_ranges. Both only widen the ranges, candidates inside
+    are still compared character by character.
+    """
+    prefixes = [p for p in starts_with if p]
+    if not prefixes or len(prefixes) < len(starts_with):
+        # an empty prefix matches every key
+        return []
+    if any(c not in ALPHABET for prefix in prefixes for c in prefix):
+        return []
+    budget = max(1, max_ranges // len(prefixes))
+    ranges: List[Range] = []
+    for prefix in prefixes:
+        choices = [digit_variants(d, is_case_sensitive) for d in to_digits(prefix)]
+        variants = 1
+        for length, options in enumerate(choices):
+            if variants * len(options) > budget:
+                choices = choices[:length]
+                break
+            variants *= len(options)
+        for digits in product(*choices):
+            ranges.extend(digits_ranges(digits))
+    return coarsen_ranges(merge_ranges(ranges), max_ranges)
+
+
+def build_suffix_residues(
+    ends_with: Sequence[str],
+    is_case_sensitive: bool,
+    max_residues: int = MAX_SUFFIX_RESIDUES,
+) -> List[List[int]]:
+    """
+    Sorted residues of the key modulo 58^m for m = 1..SUFFIX_FILTER_DIGITS,
+    one list per m. The last k digits of an address are the key modulo 58^k,
+    so a key ends with a suffix when its residue is listed. All lists are
+    empty when there is nothing to filter on.
+
+    Suffixes are cut to their last SUFFIX_FILTER_DIGITS characters, and the
+    longest residues are cut further while there are more than max_residues.
+    Both only widen the filter, candidates are still compared character by
+    character.
+    """
+    groups: List[set] = [set() for _ in range(SUFFIX_FILTER_DIGITS)]
+    suffixes = [s for s in ends_with if s]
+    if not suffixes or len(suffixes) < len(ends_with):
+        # an empty suffix matches every key
+        return [[] for _ in groups]
+    if any(c not in ALPHABET for suffix in suffixes for c in suffix):
+        return [[] for _ in groups]
+    for suffix in suffixes:
+        tail = to_digits(suffix)[-SUFFIX_FILTER_DIGITS:]
+        for digits in product(*(digit_variants(d, is_case_sensitive) for d in tail)):
+            residue = 0
+            for d in digits:
+                residue = residue * 58 + d
+            groups[len(digits) - 1].add(residue)
+    for m in range(SUFFIX_FILTER_DIGITS - 1, 0, -1):
+        if sum(len(g) for g in groups) <= max_residues:
+            break
+        groups[m - 1].update(r % 58**m for r in groups[m])
+        groups[m].clear()
+    return [sorted(g) for g in groups]
+
+
+def residue_words(groups: Sequence[Sequence[int]]) -> List[int]:
+    """
+    The size of each residue group followed by the residues of every group
+    """
+    return [len(g) for g in groups] + [r for g in groups for r in g]
+
+
+def range_words(ranges: Sequence[Range]) -> List[int]:
+    """
+    RANGE_WORDS uint words per range: the first and last key of the range,
+    most significant word first
+    """
+    words: List[int] = []
+    for low, high in ranges:
+        for value in (low, high):
+            words.extend((value >> (32 * (7 - i))) & 0xFFFFFFFF for i in range(8))
+    return words
+
+
+def pack_ranges(ranges: Sequence[Range]) -> bytes:
+    words = range_words(ranges)
+    return struct.pack(f"<{len(words)}I", *words)
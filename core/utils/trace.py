@@ -0,0 +1,177 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+# track of the main process: hit saving and builds before the search
+HOST_PID = 0
+# tracks of every device's process
+HOST_TID = 0
+QUEUE_TID = 1
+READ_QUEUE_TID = 2
+THREAD_NAMES = {HOST_TID: "host", QUEUE_TID: "queue", READ_QUEUE_TID: "read queue"}
+# events kept in memory before they are appended to the process's part file
+FLUSH_EVENTS = 10000
+
+
+def device_pid(display_index: int) -> int:
+    return display_index + 1
+
+
+class Tracer:
+    """
+    Records host phases and profiled OpenCL commands as Chrome trace events,
+    open the saved file in chrome://tracing or ui.perfetto.dev.
+
+    Every process appends its events to a part file next to path, save()
+    merges them once the workers exited. Tracers are picklable, so one can
+    be handed to spawned workers as well as threads. Timestamps are wall clock
+    microseconds, device timestamps are shifted onto it with calibrate().
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = Path(path)
+        self.parts_dir = Path(f"{path}.parts")
+        # left behind by a run that did not exit cleanly
+        shutil.rmtree(self.parts_dir, ignore_errors=True)
+        self.parts_dir.mkdir(parents=True, exist_ok=True)
+        self._init_buffer()
+
+    def _init_buffer(self) -> None:
+        self._events: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> Dict:
+        return {"path": self.path, "parts_dir": self.parts_dir}
+
+    def __setstate__(self, state: Dict) -> None:
+        self.__dict__.update(state)
+        self._init_buffer()
+
+    def add(self, event: Dict) -> None:
+        with self._lock:
+            self._events.append(event)
+            if len(self._events) < FLUSH_EVENTS:
+                return
+        self.flush()
+
+    def complete(
+        self,
+        name: str,
+        start_ns: int,
+        end_ns: int,
+        pid: int,
+        tid: int = HOST_TID,
+        args: Optional[Dict] = None,
+    ) -> None:
+        event = {
+            "name": name,
+            "ph": "X",
+            "ts": start_ns / 1e3,
+            "dur": max(end_ns - start_ns, 0) / 1e3,
+            "pid": pid,
+            "tid": tid,
+        }
+        if args:
+            event["args"] = args
+        self.add(event)
+
+    @contextmanager
+    def span(
+        self, name: str, pid: int, tid: int = HOST_TID, **args
+    ) -> Iterator[None]:
+        start_ns = time.time_ns()
+        try:
+            yield
+        finally:
+            self.complete(name, start_ns, time.time_ns(), pid, tid, args)
+
+    def name_process(
+        self, pid: int, name: str, thread_names: Dict[int, str] = THREAD_NAMES
+    ) -> None:
+        self.add(
+            {"name": "process_name", "ph": "M", "pid": pid, "args": {"name": name}}
+        )
+        for tid, thread_name in thread_names.items():
+            self.add(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": pid,
+                    "tid": tid,
+                    "args": {"name": thread_name},
+                }
+            )
+
+    def device_command(
+        self, name: str, event, clock_offset: int, pid: int, tid: int, **args
+    ) -> None:
+        """
+        Record a completed command of a profiling queue as the span it ran
+        for, with its queued and submit times. clock_offset shifts device
+        timestamps onto the host clock.
+        """
+        profile = event.profile
+        queued, submit, start, end = (
+            profile.queued,
+            profile.submit,
+            profile.start,
+            profile.end,
+        )
+        args.update(
+            queued_us=(queued + clock_offset) / 1e3,
+            submit_us=(submit + clock_offset) / 1e3,
+            # time between the host queueing the command and the device
+            # running it
+            wait_us=(start - queued) / 1e3,
+        )
+        self.complete(name, start + clock_offset, end + clock_offset, pid, tid, args)
+
+    def flush(self) -> None:
+        """
+        Append the recorded events to this process's part file
+        """
+        with self._lock:
+            events, self._events = self._events, []
+            if not events:
+                return
+            part = self.parts_dir / f"{os.getpid()}.jsonl"
+            with open(part, "a") as f:
+                for event in events:
+                    f.write(json.dumps(event) + "\n")
+
+    def save(self) -> Path:
+        """
+        Merge the part files of every process into one trace and remove them
+        """
+        self.flush()
+        events = []
+        for part in sorted(self.parts_dir.glob("*.jsonl")):
+            with open(part) as f:
+                events.extend(json.loads(line) for line in f if line.strip())
+        # metadata first, then in time order
+        events.sort(key=lambda event: (event["ph"] != "M", event.get("ts", 0)))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        os.replace(tmp_path, self.path)
+        shutil.rmtree(self.parts_dir, ignore_errors=True)
+        return self.path
+
+
+def calibrate(command_queue) -> int:
+    """
+    Offset from the device clock of a profiling queue to the host's wall
+    clock in nanoseconds, accurate to the latency of one wait
+    """
+    import pyopencl as cl
+
+    marker = cl.enqueue_marker(command_queue)
+    marker.wait()
+    return time.time_ns() - marker.profile.end
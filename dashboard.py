@@ -8,7 +8,7 @@ import termios
 import threading
 import time
 import tty
-from ctypes import c_double, c_int
+from contextlib import nullcontext
 from datetime import timedelta
 from pathlib import Path
 
@@ -21,15 +21,35 @@ from rich.panel import Panel
 from rich.table import Table
 from rich.text import Text
 
-from core.config import DEFAULT_ITERATION_BITS, HostSetting
-from core.opencl.manager import get_all_gpu_devices
-from core.utils.helpers import check_character, load_kernel_source
+from core.config import DEFAULT_ITERATION_BITS, MAX_KEYS_PER_ITEM, HostSetting
+from core.driver import DRIVERS, create_driver, get_settings_binaries
+from core.metrics import DEFAULT_METRICS_HOST, serve_metrics
+from core.opencl.cache import get_cache_dir
+from core.opencl.manager import get_all_devices
+from core.opencl.profile import apply_profile
+from core.utils.counters import (
+    SearchCounters,
+    expected_rates,
+    format_acceptance,
+    total_match_depths,
+)
+from core.utils.crypto import save_keypair
+from core.utils.helpers import (
+    check_character,
+    check_pattern_odds,
+    load_kernel_source,
+)
+from core.utils.keyspace import KeyspaceAllocator
+from core.utils.odds import format_duration, prefilter_probability, time_to_hits
+from core.utils.trace import HOST_PID, Tracer
 
 SAND = "#D4A574"
 LIGHT_SAND = "#F4E7D7"
 BROWN = "#8B7355"
 SPICE_GOLD = "#FFD700"
 DESERT_ORANGE = "#FF8C00"
+# seconds the device speeds are averaged over
+SPEED_SECONDS = 1.0
 
 console = Console()
 
@@ -46,79 +66,12 @@ def format_number(num: int) -> str:
 
 def get_gpu_names() -> list[str]:
     try:
-        devices = get_all_gpu_devices()
+        devices = get_all_devices()
         return [d.name.strip() for d in devices]
     except Exception:
         return []
 
 
-def gpu_worker(
-    index: int,
-    kernel_source: str,
-    iteration_bits: int,
-    gpu_counts: int,
-    speed_array,
-    result_queue,
-    stop_flag,
-):
-    try:
-        from core.config import HostSetting
-        from core.searcher import Searcher
-
-        setting = HostSetting(kernel_source, iteration_bits)
-        searcher = Searcher(
-            kernel_source=kernel_source,
-            index=index,
-            setting=setting,
-        )
-
-        while not stop_flag.value:
-            start_time = time.time()
-            result = searcher.find(log_stats=False)
-            elapsed = time.time() - start_time
-
-            global_work_size = setting.global_work_size // gpu_counts
-            speed_mhs = global_work_size / (elapsed * 1e6) if elapsed > 0 else 0.0
-            speed_array[index] = speed_mhs
-
-            if result[0]:
-                result_queue.put(bytes(result[1:]))
-                setting = HostSetting(kernel_source, iteration_bits)
-                searcher = Searcher(
-                    kernel_source=kernel_source,
-                    index=index,
-                    setting=setting,
-                )
-
-    except Exception:
-        speed_array[index] = 0.0
-
-
-def result_monitor_thread(
-    result_queue,
-    output_dir: str,
-    stats: "DuneStats",
-    stop_flag,
-    target_count: int,
-):
-    from core.utils.crypto import save_keypair
-
-    while not stop_flag.value or not result_queue.empty():
-        try:
-            pv_bytes = result_queue.get(timeout=0.25)
-        except Exception:
-            continue
-
-        try:
-            pubkey = save_keypair(pv_bytes, output_dir)
-            stats.add_wallet_found(pubkey)
-
-            if stats.wallets_found >= target_count:
-                stop_flag.value = 1
-        except Exception:
-            pass
-
-
 def keyboard_thread(
     stats: "DuneStats", stop_event: threading.Event, export_flag: threading.Event
 ):
@@ -157,23 +110,35 @@ class DuneStats:
         self.wallets_found: int = 0
         self.gpu_speeds: dict[int, float] = {i: 0.0 for i in range(gpu_count)}
         self.found_addresses: list[str] = []
+        # keys by the number of pattern characters they matched
+        self.match_depths: list[int] = []
+        # keys the prefilters rejected before encoding
+        self.prefiltered: int = 0
         self.start_time: float = time.time()
+        # keys of every device when the speeds were last updated
+        self.speed_keys: list[int] = [0] * gpu_count
+        self.speed_time: float = self.start_time
         self.paused: bool = False
         self.lock = threading.Lock()
         self.animation_frame: int = 0
-        self._last_sync: float = time.time()
 
-    def sync_from_shared(self, speed_array) -> None:
+    def sync_from_shared(self, counters: SearchCounters) -> None:
+        # keys of every completed launch, exact
+        snapshot = counters.snapshot()
+        now = time.time()
         with self.lock:
-            now = time.time()
-            dt = now - self._last_sync
-            self._last_sync = now
-
-            for i in range(self.gpu_count):
-                speed = speed_array[i]
-                self.gpu_speeds[i] = speed
-                if speed > 0:
-                    self.wallets_generated += int(speed * 1e6 * dt)
+            self.wallets_generated = sum(c.keys for c in snapshot)
+            self.match_depths = total_match_depths(snapshot)
+            self.prefiltered = sum(c.prefiltered for c in snapshot)
+            # launches complete a few times a second, average over a second
+            elapsed = now - self.speed_time
+            if elapsed < SPEED_SECONDS:
+                return
+            for i, device in enumerate(snapshot):
+                keys = device.keys - self.speed_keys[i]
+                self.gpu_speeds[i] = keys / (elapsed * 1e6)
+            self.speed_keys = [device.keys for device in snapshot]
+            self.speed_time = now
 
     def add_wallet_found(self, address: str) -> None:
         with self.lock:
@@ -257,13 +222,16 @@ def create_stats_panel(stats: DuneStats, search_params: dict) -> Panel:
     elapsed = stats.get_elapsed_time()
 
     if stats.wallets_found < stats.target_count and total_speed > 0:
-        prefix_len = search_params.get("prefix_len", 0)
-        suffix = search_params.get("ends_with", "")
-        difficulty = prefix_len + len(suffix)
-        est_total = (
-            int((58**difficulty) / (total_speed * 1e6)) if total_speed > 0 else 0
+        # time left for the wallets still missing at the current speed
+        remaining = time_to_hits(
+            search_params["probability"],
+            total_speed * 1e6,
+            stats.target_count - stats.wallets_found,
+        )
+        eta = (
+            f"{format_duration(remaining.expected)} "
+            f"(P90 {format_duration(remaining.p90)})"
         )
-        eta = str(timedelta(seconds=est_total))
     else:
         eta = "N/A"
 
@@ -277,6 +245,19 @@ def create_stats_panel(stats: DuneStats, search_params: dict) -> Panel:
         "",
     ]
 
+    if search_params.get("match_histogram") and (
+        stats.prefiltered or any(stats.match_depths[1:])
+    ):
+        acceptance = format_acceptance(
+            stats.match_depths,
+            search_params["pattern_len"],
+            search_params["expected_rates"],
+            stats.prefiltered,
+            search_params["prefilter_probability"],
+        )
+        lines.append(f"  [{LIGHT_SAND}]Char Odds:[/]          [{SAND}]{acceptance}[/]")
+        lines.append("")
+
     if search_params.get("starts_with"):
         prefix_label = "Prefix(es)" if "," in search_params["starts_with"] else "Prefix"
         lines.append(
@@ -406,7 +387,49 @@ def export_wallets(output_dir: str):
 @click.option(
     "--is-case-sensitive", type=bool, default=True, help="Case sensitive search"
 )
-def main(starts_with, ends_with, count, output_dir, iteration_bits, is_case_sensitive):
+@click.option(
+    "--driver",
+    type=click.Choice(DRIVERS),
+    default="process",
+    help="One process per GPU, or every GPU on threads of this process",
+)
+@click.option(
+    "--trace",
+    type=click.Path(dir_okay=False, writable=True),
+    default=None,
+    help="Write a Chrome trace of every launch, copy and host phase to this file",
+)
+@click.option(
+    "--metrics-port",
+    type=click.IntRange(0, 65535),
+    default=None,
+    help="Serve per-device counters in the Prometheus text format on this port",
+)
+@click.option(
+    "--metrics-host",
+    type=str,
+    default=DEFAULT_METRICS_HOST,
+    help="Address the metrics endpoint listens on",
+)
+@click.option(
+    "--match-histogram/--no-match-histogram",
+    default=False,
+    help="Show the measured odds of the prefilters and of every pattern "
+    "character behind them matching",
+)
+def main(
+    starts_with,
+    ends_with,
+    count,
+    output_dir,
+    iteration_bits,
+    is_case_sensitive,
+    driver,
+    trace,
+    metrics_port,
+    metrics_host,
+    match_histogram,
+):
     if not starts_with and not ends_with:
         console.print(
             f"[{DESERT_ORANGE}]Error:[/] Provide at least --starts-with or --ends-with"
@@ -417,58 +440,90 @@ def main(starts_with, ends_with, count, output_dir, iteration_bits, is_case_sens
         check_character("starts_with", prefix)
     if ends_with:
         check_character("ends_with", ends_with)
+    odds = check_pattern_odds(
+        starts_with, (ends_with,) if ends_with else (), is_case_sensitive
+    )
 
     multiprocessing.set_start_method("spawn", force=True)
 
     gpu_names = get_gpu_names()
-    gpu_counts = len(gpu_names) if gpu_names else len(get_all_gpu_devices())
+    gpu_counts = len(gpu_names)
     if gpu_counts == 0:
-        console.print(f"[{DESERT_ORANGE}]Error:[/] No GPU devices found.")
+        console.print(f"[{DESERT_ORANGE}]Error:[/] No OpenCL devices found.")
         sys.exit(1)
 
+    tracer = None
+    if trace:
+        tracer = Tracer(trace)
+        tracer.name_process(HOST_PID, "Dashboard", {0: "main"})
+
     kernel_source = load_kernel_source(starts_with, ends_with, is_case_sensitive)
+    devices = get_all_devices()
+    settings = []
+    for device in devices:
+        setting = HostSetting(kernel_source, iteration_bits)
+        # workers build what the profile selects, warm the cache for it
+        apply_profile(setting, device)
+        setting.match_histogram = match_histogram
+        settings.append(setting)
+    allocator = KeyspaceAllocator(
+        iteration_bits,
+        len(devices),
+        MAX_KEYS_PER_ITEM * max(setting.local_work_size for setting in settings),
+    )
+    counters = SearchCounters(gpu_counts)
+    with console.status(f"[{SAND}]Preparing OpenCL kernels...[/]"):
+        with nullcontext() if tracer is None else tracer.span(
+            "build programs", HOST_PID
+        ):
+            if driver == "process" and get_cache_dir() is not None:
+                # compile every device in parallel once, workers then load
+                # cached binaries
+                get_settings_binaries(devices, settings)
+        # the thread driver builds and shares the binaries itself
+        search_driver = create_driver(
+            driver, settings, allocator=allocator, tracer=tracer, counters=counters
+        )
 
-    speed_array = multiprocessing.Array(c_double, gpu_counts)
-    result_queue = multiprocessing.Queue()
-    stop_flag = multiprocessing.Value(c_int, 0)
+    if metrics_port is not None:
+        serve_metrics(counters, gpu_names, metrics_port, metrics_host)
 
     stats = DuneStats(gpu_count=gpu_counts, target_count=count)
     starts_with_display = ", ".join(starts_with) if starts_with else ""
-    shortest_prefix_len = min((len(p) for p in starts_with), default=0)
     search_params = {
         "starts_with": starts_with_display,
         "ends_with": ends_with,
-        "prefix_len": shortest_prefix_len,
+        "probability": odds.probability,
+        "match_histogram": match_histogram,
+        "pattern_len": max((len(p) for p in starts_with), default=0) + len(ends_with),
+        "expected_rates": expected_rates(
+            starts_with, (ends_with,) if ends_with else (), is_case_sensitive
+        ),
+        "prefilter_probability": prefilter_probability(
+            starts_with, (ends_with,) if ends_with else (), is_case_sensitive
+        ),
     }
 
     stop_event = threading.Event()
     export_flag = threading.Event()
     export_flag.set()
 
-    processes: list[multiprocessing.Process] = []
-    for i in range(gpu_counts):
-        p = multiprocessing.Process(
-            target=gpu_worker,
-            args=(
-                i,
-                kernel_source,
-                iteration_bits,
-                gpu_counts,
-                speed_array,
-                result_queue,
-                stop_flag,
-            ),
-            daemon=True,
-        )
-        p.start()
-        processes.append(p)
-
-    result_t = threading.Thread(
-        target=result_monitor_thread,
-        args=(result_queue, output_dir, stats, stop_flag, count),
+    def on_result(result: bytes) -> None:
+        with nullcontext() if tracer is None else tracer.span(
+            "save_keypair", HOST_PID
+        ):
+            pubkey = save_keypair(result[1:], output_dir)
+        stats.add_wallet_found(pubkey)
+
+    search_driver.start()
+    # saves hits until count are found or the driver is stopped
+    collector = threading.Thread(
+        target=search_driver.collect,
+        args=(count,),
+        kwargs={"on_result": on_result},
         daemon=True,
     )
-    result_t.start()
+    collector.start()
 
     kb_t = threading.Thread(
         target=keyboard_thread,
@@ -486,7 +541,7 @@ def main(starts_with, ends_with, count, output_dir, iteration_bits, is_case_sens
         ) as live:
             while True:
                 stats.animation_frame += 1
-                stats.sync_from_shared(speed_array)
+                stats.sync_from_shared(counters)
                 live.update(create_layout(stats, search_params, gpu_names))
 
                 if stats.wallets_found >= count:
@@ -501,15 +556,14 @@ def main(starts_with, ends_with, count, output_dir, iteration_bits, is_case_sens
     except KeyboardInterrupt:
         pass
 
-    stop_flag.value = 1
     stop_event.set()
-
-    for p in processes:
-        p.join(timeout=3)
-        if p.is_alive():
-            p.terminate()
+    search_driver.stop()
+    # the collector joins the workers once each of them exited
+    collector.join()
 
     console.clear()
+    if tracer is not None:
+        console.print(f"[{SAND}]Trace written to {tracer.save()}[/]")
 
     if should_export:
         export_wallets(output_dir)
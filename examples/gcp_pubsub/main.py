@@ -15,7 +15,7 @@ from core.searcher import multi_gpu_init, save_result
 from core.utils.helpers import check_character, load_kernel_source
 from core.config import HostSetting
 from core.opencl.manager import (
-    get_all_gpu_devices,
+    get_all_devices,
     get_chosen_devices,
 )
 
@@ -91,7 +91,7 @@ def generate_address(prefix, suffix, jobId, is_case_sensitive):
         chosen_devices = get_chosen_devices()
         gpu_counts = len(chosen_devices[1])
     else:
-        gpu_counts = len(get_all_gpu_devices())
+        gpu_counts = len(get_all_devices())
 
     logging.info(
         f"Searching Solana pubkey with starts_with='{starts_with}', ends_with='{ends_with}', case_sensitive={'on' if is_case_sensitive else 'off'}"
@@ -128,8 +128,8 @@ def generate_address(prefix, suffix, jobId, is_case_sensitive):
                     if isinstance(partial_result, dict) and 'error' in partial_result:
                         logging.error(f"Error in worker process: {partial_result['error']}")
                         continue
-                    if isinstance(partial_result, (bytes, bytearray, list, tuple)) and len(partial_result) > 0 and partial_result[0]:
-                        results.append(list(partial_result))
+                    if isinstance(partial_result, list):
+                        results.extend(partial_result)
 
 
 
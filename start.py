@@ -8,6 +8,8 @@ from rich.panel import Panel
 from rich.prompt import Prompt, Confirm
 from rich.text import Text
 
+from core.utils.odds import check_pattern, describe_eta, describe_odds, time_to_hits
+
 console = Console()
 
 SAND = "#D4A574"
@@ -77,6 +79,13 @@ def get_search_params():
     console.print(f"[dim]Yes = Exact match only[/]")
     case_sensitive = Confirm.ask(f"[{DESERT_ORANGE}]Case-sensitive[/]", default=False)
 
+    suffixes = [suffix] if suffix else []
+    try:
+        check_pattern(prefixes, suffixes, case_sensitive)
+    except ValueError as e:
+        console.print(f"\n[{DESERT_ORANGE}]⚠️  {e}[/]\n")
+        return get_search_params()
+
     return {
         "prefixes": prefixes,
         "suffix": suffix,
@@ -99,30 +108,35 @@ def show_summary(params):
         f"[{SAND}]Case-sensitive:[/] [{SPICE_GOLD}]{'Yes' if params['case_sensitive'] else 'No'}[/]"
     )
 
-    shortest_prefix = min((len(p) for p in params["prefixes"]), default=0)
-    difficulty = shortest_prefix + len(params["suffix"])
-
-    if difficulty <= 3:
-        estimate = "~seconds to minutes"
-        emoji = "🟢"
-    elif difficulty == 4:
-        estimate = "~minutes"
-        emoji = "🟡"
-    elif difficulty == 5:
-        estimate = "~hours"
-        emoji = "🟠"
-    else:
-        if params["case_sensitive"]:
-            estimate = "~days to weeks"
-            emoji = "🔴"
-        else:
-            estimate = "~hours to days"
-            emoji = "🟠"
+    suffixes = [params["suffix"]] if params["suffix"] else []
+    odds = check_pattern(params["prefixes"], suffixes, params["case_sensitive"])
+    console.print(f"\n[{SAND}]Odds per key:[/] [{DESERT_ORANGE}]{describe_odds(odds)}[/]")
 
+    speed = get_profiled_speed()
+    if speed is None:
+        console.print(
+            f"[dim]Run python3 main.py autotune once for time estimates.[/]"
+        )
+        return
+    eta = time_to_hits(odds.probability, speed, params["count"])
     console.print(
-        f"\n[{SAND}]Difficulty:[/] [{DESERT_ORANGE}]{difficulty} characters {emoji}[/]"
+        f"[{SAND}]Estimated time at {speed / 1e6:.1f} MH/s:[/] "
+        f"[{DESERT_ORANGE}]{describe_eta(eta)}[/]"
     )
-    console.print(f"[{SAND}]Estimated time:[/] [{DESERT_ORANGE}]{estimate}[/]")
+
+
+def get_profiled_speed():
+    """
+    Keys per second autotune measured for the dashboard's devices, None
+    without profiles or OpenCL
+    """
+    try:
+        from core.opencl.manager import get_all_devices
+        from core.opencl.profile import profiled_speed
+
+        return profiled_speed(get_all_devices())
+    except Exception:
+        return None
 
 
 def launch_dashboard(params):
@@ -0,0 +1,39 @@
+import unittest
+from types import SimpleNamespace
+
+import pyopencl as cl
+
+from core.autotune import get_variants, tune_launch
+
+
+class TestAutotune(unittest.TestCase):
+    def test_launch_grows_until_the_target_duration(self) -> None:
+        sizes = []
+
+        def time_launch(size: int) -> float:
+            sizes.append(size)
+            # 1000 keys per second after a fixed overhead
+            return 0.01 + size / 1000
+
+        launch_keys, speed = tune_launch(time_launch, 16, 0.2)
+
+        self.assertEqual(launch_keys, 128)
+        self.assertAlmostEqual(speed, 128 / 0.138)
+        # doubling 128 keys would overshoot, so 256 is never launched
+        self.assertEqual(sizes, [16, 16, 32, 64, 128])
+
+    def test_cpus_also_try_vector_kernels(self) -> None:
+        cpu = SimpleNamespace(type=cl.device_type.CPU, native_vector_width_int=16)
+        gpu = SimpleNamespace(type=cl.device_type.GPU, native_vector_width_int=1)
+
+        cpu_variants = get_variants(cpu, (1, 2), ((), ("-cl-mad-enable",)))
+
+        self.assertEqual(len(cpu_variants), 8)
+        self.assertIn((8, 8, ("-cl-mad-enable",)), cpu_variants)
+        self.assertEqual(
+            get_variants(gpu, (1, 4), ((),)), [(1, 1, ()), (4, 1, ())]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+
+from core.bench import (
+    DEFAULT_CASES,
+    VARIANT_ARGS,
+    VARIANTS,
+    case_seed,
+    compare_metrics,
+    variant_setting,
+)
+from core.utils.ranges import ALPHABET
+
+
+class TestBench(unittest.TestCase):
+    def test_regressions_respect_metric_direction(self) -> None:
+        baseline = {
+            "gpu/scalar/prefix3/keys_per_second": 100.0,
+            "gpu/vector/prefix3/keys_per_second": 100.0,
+            "gpu/scalar/build_seconds": 10.0,
+            "host/increase_key32_seconds": 1.0,
+            "host/removed_seconds": 1.0,
+        }
+        current = {
+            "gpu/scalar/prefix3/keys_per_second": 85.0,
+            "gpu/vector/prefix3/keys_per_second": 95.0,
+            "gpu/scalar/build_seconds": 12.0,
+            "host/increase_key32_seconds": 0.5,
+        }
+
+        regressions = compare_metrics(baseline, current, 0.1)
+
+        self.assertEqual(
+            [r.metric for r in regressions],
+            ["gpu/scalar/build_seconds", "gpu/scalar/prefix3/keys_per_second"],
+        )
+        self.assertAlmostEqual(regressions[1].change, -0.15)
+
+    def test_case_seeds_are_fixed_and_leave_iteration_bytes_free(self) -> None:
+        seed = case_seed("prefix3")
+
+        self.assertEqual(seed, case_seed("prefix3"))
+        self.assertNotEqual(seed, case_seed("prefix4"))
+        self.assertEqual(seed[-5:], bytes(5))
+
+    def test_case_patterns_are_base58(self) -> None:
+        for case in DEFAULT_CASES:
+            for text in case.starts_with + case.ends_with:
+                self.assertTrue(set(text) <= set(ALPHABET), text)
+
+    def test_every_variant_is_a_valid_setting(self) -> None:
+        self.assertEqual(
+            set(VARIANTS) - set(VARIANT_ARGS), {"vector", "match-histogram"}
+        )
+        for variant, args in VARIANT_ARGS.items():
+            # only the vector kernel looks at the device
+            setting = variant_setting(variant, None, "")
+            for name, value in args.items():
+                self.assertEqual(getattr(setting, name), value, variant)
+            self.assertFalse(setting.use_profile)
+        self.assertTrue(variant_setting("match-histogram", None, "").match_histogram)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+from core.opencl import cache
+
+
+def make_device(name: str = "Device", driver_version: str = "1.0"):
+    platform = SimpleNamespace(name="Platform", version="OpenCL 3.0")
+    return SimpleNamespace(
+        name=name,
+        version="OpenCL 3.0",
+        driver_version=driver_version,
+        platform=platform,
+    )
+
+
+class TestProgramCache(unittest.TestCase):
+    def test_cache_key_depends_on_source_device_driver_and_options(self) -> None:
+        device = make_device()
+        key = cache.program_cache_key("source", device)
+
+        self.assertEqual(key, cache.program_cache_key("source", make_device()))
+        self.assertNotEqual(key, cache.program_cache_key("other", device))
+        self.assertNotEqual(
+            key, cache.program_cache_key("source", make_device(name="Other"))
+        )
+        self.assertNotEqual(
+            key, cache.program_cache_key("source", make_device(driver_version="2.0"))
+        )
+        self.assertNotEqual(
+            key, cache.program_cache_key("source", device, ["-cl-mad-enable"])
+        )
+
+    def test_store_and_load_binary(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache.store_binary(Path(tmpdir), "key", b"binary")
+
+            self.assertEqual(cache.load_binary(Path(tmpdir), "key"), b"binary")
+            self.assertIsNone(cache.load_binary(Path(tmpdir), "missing"))
+            self.assertEqual(os.listdir(tmpdir), ["key.bin"])
+
+    def test_get_program_binaries_compiles_identical_devices_once(self) -> None:
+        devices = [make_device(), make_device(), make_device(name="Other")]
+
+        with tempfile.TemporaryDirectory() as tmpdir, mock.patch.dict(
+            os.environ, {"VANITY_KERNEL_CACHE_DIR": tmpdir}
+        ), mock.patch.object(
+            cache, "compile_binary", side_effect=lambda d, s, o: d.name.encode()
+        ) as compile_binary:
+            binaries = cache.get_program_binaries(devices, "source")
+            self.assertEqual(compile_binary.call_count, 2)
+            self.assertEqual(binaries, {0: b"Device", 1: b"Device", 2: b"Other"})
+
+            cache.get_program_binaries(devices, "source")
+            self.assertEqual(compile_binary.call_count, 2)
+
+    def test_cache_can_be_disabled(self) -> None:
+        with mock.patch.dict(os.environ, {"VANITY_KERNEL_CACHE": "0"}):
+            self.assertIsNone(cache.get_cache_dir())
+
+
+if __name__ == "__main__":
+    unittest.main()
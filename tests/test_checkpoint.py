@@ -0,0 +1,72 @@
+import os
+import tempfile
+import unittest
+
+from core.utils.checkpoint import (
+    Checkpoint,
+    SearchJob,
+    load_checkpoint,
+    resume_allocator,
+)
+from core.utils.counters import SearchCounters
+from core.utils.keyspace import KeyspaceAllocator
+
+BASE_SEED = bytes(range(1, 31)) + bytes(2)
+JOB = SearchJob(("Wat",), ("ab",), False, 20, 3)
+
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "job.json")
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_resume_searches_unfinished_chunks_first(self) -> None:
+        allocator = KeyspaceAllocator(20, 1, 4096, base_seed=BASE_SEED)
+        chunks = [allocator.allocate(0) for _ in range(5)]
+        counters = SearchCounters(1)
+        counters.record_launch(0, 4096, 1, 0.5, 0.0)
+        checkpoint = Checkpoint(self.path, JOB, allocator, counters)
+        # the second chunk was still in flight
+        for chunk in chunks[:1] + chunks[2:]:
+            checkpoint.add_chunk(chunk)
+        self.assertTrue(checkpoint.add_hit("Wat1"))
+        self.assertFalse(checkpoint.add_hit("Wat1"))
+        checkpoint.save()
+
+        state = load_checkpoint(self.path)
+        self.assertEqual(state.job, JOB)
+        self.assertEqual(state.cursor, allocator.cursor)
+        self.assertEqual(state.hits, ("Wat1",))
+        self.assertEqual(state.devices[0].keys, 4096)
+        self.assertEqual(state.searched_keys, allocator.cursor - chunks[1].size)
+
+        resumed = resume_allocator(state, 2, 1024)
+        self.assertEqual(resumed.allocate(1), chunks[1])
+        # then on from the cursor, with no gaps left
+        self.assertEqual(resumed.gaps, ())
+        self.assertEqual(resumed.chunk_start(resumed.allocate(1)), state.cursor)
+
+    def test_chunk_start_crosses_blocks(self) -> None:
+        allocator = KeyspaceAllocator(12, 1, 4096, base_seed=b"\xff" * 30 + b"\xf0\x00")
+        allocator.allocate(0)
+        chunk = allocator.allocate(0)
+
+        # the seed wrapped around 2^256
+        self.assertEqual(chunk.seed, bytes(32))
+        self.assertEqual(allocator.chunk_start(chunk), 4096)
+
+    def test_misaligned_resume_is_rejected(self) -> None:
+        allocator = KeyspaceAllocator(16, 1, 1024, base_seed=BASE_SEED)
+        Checkpoint(self.path, JOB, allocator).save()
+
+        with self.assertRaises(ValueError):
+            resume_allocator(load_checkpoint(self.path), 1, 4096)
+        with self.assertRaises(ValueError):
+            load_checkpoint(self.path + ".missing")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -9,7 +9,58 @@ class TestHostSetting(unittest.TestCase):
         with self.assertRaises(ValueError):
             HostSetting(kernel_source="kernel", iteration_bits=-1)
         with self.assertRaises(ValueError):
-            HostSetting(kernel_source="kernel", iteration_bits=256)
+            HostSetting(kernel_source="kernel", iteration_bits=65)
+
+    def test_64_iteration_bits(self) -> None:
+        setting = HostSetting(kernel_source="kernel", iteration_bits=64)
+
+        self.assertEqual(setting.iteration_bytes, 8)
+        self.assertEqual(setting.key32[-8:], bytes(8))
+
+    def test_keys_per_item_must_be_a_small_power_of_two(self) -> None:
+        for keys_per_item in (0, 3, 512):
+            with self.assertRaises(ValueError):
+                HostSetting("kernel", 24, keys_per_item=keys_per_item)
+        with self.assertRaises(ValueError):
+            HostSetting("kernel", 2, keys_per_item=8)
+        self.assertEqual(HostSetting("kernel", 24, keys_per_item=8).keys_per_item, 8)
+
+    def test_unknown_base_table_raises(self) -> None:
+        with self.assertRaises(ValueError):
+            HostSetting("kernel", 24, base_table="radix-64")
+        self.assertEqual(HostSetting("kernel", 24, base_table="wide").base_table, "wide")
+
+    def test_unknown_field_raises(self) -> None:
+        with self.assertRaises(ValueError):
+            HostSetting("kernel", 24, field="radix64")
+        self.assertEqual(HostSetting("kernel", 24, field="radix51").field, "radix51")
+
+    def test_local_table_memory_requires_variable_time_ref10_lookups(self) -> None:
+        with self.assertRaises(ValueError):
+            HostSetting("kernel", 24, table_memory="local")
+        with self.assertRaises(ValueError):
+            HostSetting(
+                "kernel",
+                24,
+                base_table="wide",
+                lookup="variable-time",
+                table_memory="local",
+            )
+        setting = HostSetting(
+            "kernel", 24, lookup="variable-time", table_memory="local"
+        )
+        self.assertEqual(setting.table_memory, "local")
+
+    def test_vector_width_sets_keys_per_item(self) -> None:
+        self.assertEqual(HostSetting("kernel", 24, vector_width=8).keys_per_item, 8)
+        for kwargs in (
+            {"vector_width": 2},
+            {"vector_width": 4, "keys_per_item": 8},
+            {"vector_width": 4, "field": "radix51"},
+            {"vector_width": 4, "base_table": "wide"},
+        ):
+            with self.assertRaises(ValueError):
+                HostSetting("kernel", 24, **kwargs)
 
     def test_iteration_bytes_rounds_up(self) -> None:
         self.assertEqual(
@@ -0,0 +1,114 @@
+import unittest
+import urllib.request
+
+from core.metrics import format_metrics, serve_metrics
+from core.utils.counters import (
+    THROUGHPUT_BUCKETS,
+    SearchCounters,
+    acceptance_rates,
+    expected_rates,
+    format_acceptance,
+    total_match_depths,
+)
+
+
+class TestSearchCounters(unittest.TestCase):
+    def test_launches_add_up_per_device(self) -> None:
+        counters = SearchCounters(2)
+        counters.record_launch(1, 1 << 20, 2, 0.5, 0.01)
+        counters.record_launch(1, 1 << 20, 0, 0.25, 0.0)
+
+        idle, busy = counters.snapshot()
+
+        self.assertEqual(idle.keys, 0)
+        self.assertEqual(busy.keys, 1 << 21)
+        self.assertEqual(busy.launches, 2)
+        self.assertEqual(busy.hits, 2)
+        self.assertAlmostEqual(busy.kernel_seconds, 0.75)
+        self.assertAlmostEqual(busy.idle_seconds, 0.01)
+        self.assertEqual(counters.total_keys(), 1 << 21)
+        # 2.1 and 4.2 million keys per second
+        self.assertEqual(busy.throughput_counts[THROUGHPUT_BUCKETS.index(2.5e6)], 1)
+        self.assertEqual(busy.throughput_counts[THROUGHPUT_BUCKETS.index(5e6)], 1)
+        self.assertAlmostEqual(busy.throughput_sum, 3 * (1 << 21))
+
+    def test_prometheus_histogram_is_cumulative(self) -> None:
+        counters = SearchCounters(1)
+        counters.record_launch(0, 1000, 0, 1.0, 0.0)
+        counters.record_launch(0, 10**12, 1, 1.0, 0.0)
+
+        text = format_metrics(counters.snapshot(), ['GPU "A"'])
+
+        labels = 'device="0",name="GPU \\"A\\""'
+        self.assertIn(f"vanity_keys_total{{{labels}}} {10**12 + 1000}\n", text)
+        self.assertIn(
+            f'vanity_launch_keys_per_second_bucket{{{labels},le="10000.0"}} 1\n', text
+        )
+        self.assertIn(
+            f'vanity_launch_keys_per_second_bucket{{{labels},le="+Inf"}} 2\n', text
+        )
+        self.assertIn(f"vanity_launch_keys_per_second_count{{{labels}}} 2\n", text)
+        self.assertIn("# TYPE vanity_launch_keys_per_second histogram\n", text)
+
+    def test_match_depths_add_up_and_are_exported(self) -> None:
+        counters = SearchCounters(2)
+        counters.record_launch(0, 4096, 0, 0.1, 0.0, [4000, 90, 6])
+        counters.record_launch(1, 4096, 0, 0.1, 0.0, [4030, 64, 2])
+        counters.record_launch(1, 4096, 0, 0.1, 0.0)
+
+        depths = total_match_depths(counters.snapshot())
+        text = format_metrics(counters.snapshot(), ["a", "b"])
+
+        self.assertEqual(depths[:3], [8030, 154, 8])
+        self.assertIn(
+            'vanity_match_depth_keys_total{device="1",name="b",depth="1"} 64\n', text
+        )
+        self.assertNotIn("vanity_match_depth", format_metrics([], []))
+
+    def test_prefiltered_keys_are_a_stage(self) -> None:
+        counters = SearchCounters(1)
+        counters.record_launch(0, 4096, 0, 0.1, 0.0, [0, 0, 32], 4064)
+
+        snapshot = counters.snapshot()
+        text = format_metrics(snapshot, ["a"])
+
+        self.assertEqual(snapshot[0].prefiltered, 4064)
+        self.assertIn('vanity_prefiltered_keys_total{device="0",name="a"} 4064\n', text)
+        self.assertEqual(
+            format_acceptance(
+                snapshot[0].match_depths, 2, [None, 1 / 58], 4064, 1 / 100
+            ),
+            "prefilter 1/128.0 (1/100.0), #1 1/1.0, #2 1/1.0",
+        )
+
+    def test_acceptance_rates_are_conditional(self) -> None:
+        rates = acceptance_rates([5700, 290, 10, 0])
+
+        self.assertEqual(rates, [0.05, 0.03333333333333333, 0.0])
+        self.assertEqual(acceptance_rates([0, 0]), [None])
+        self.assertEqual(
+            expected_rates(("Wa",), ("1",), False), [None, 2 / 58, 1 / 58]
+        )
+        self.assertEqual(expected_rates(("Wa", "Wb"), (), True), [])
+        self.assertEqual(
+            format_acceptance([5700, 290, 10, 0], 2, [None, 1 / 58]),
+            "#1 1/20.0, #2 1/30.0 (1/58.0)",
+        )
+
+    def test_endpoint_serves_the_counters(self) -> None:
+        counters = SearchCounters(1)
+        counters.record_launch(0, 4096, 0, 0.1, 0.0)
+        server = serve_metrics(counters, ["cpu"], 0)
+        try:
+            port = server.server_address[1]
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as r:
+                body = r.read().decode()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        self.assertIn('vanity_keys_total{device="0",name="cpu"} 4096\n', body)
+
+
+if __name__ == "__main__":
+    unittest.main()
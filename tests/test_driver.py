@@ -0,0 +1,124 @@
+import queue
+import threading
+import unittest
+from unittest import mock
+
+from core.config import HostSetting
+from core.driver import (
+    Driver,
+    create_driver,
+    get_settings_binaries,
+    measure_work_ranges,
+)
+from core.utils.cancel import CancelToken
+from core.utils.keyspace import Chunk
+
+
+def fake_worker(cancel_token, result_queue, hits) -> None:
+    for hit in hits:
+        if cancel_token.is_cancelled():
+            break
+        result_queue.put(hit)
+    result_queue.put(None)
+
+
+def make_driver(*device_hits) -> Driver:
+    cancel_token = CancelToken()
+    result_queue: queue.Queue = queue.Queue()
+    workers = [
+        threading.Thread(target=fake_worker, args=(cancel_token, result_queue, hits))
+        for hits in device_hits
+    ]
+    return Driver(cancel_token, result_queue, workers)
+
+
+class TestDriver(unittest.TestCase):
+    def test_collect_stops_at_count(self) -> None:
+        driver = make_driver([b"a", b"b", b"c"], [b"d"])
+        seen = []
+        driver.start()
+        results = driver.collect(2, on_result=seen.append)
+
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results, seen)
+        self.assertTrue(driver.cancel_token.is_cancelled())
+        self.assertFalse(any(worker.is_alive() for worker in driver.workers))
+
+    def test_collect_returns_when_every_worker_exited(self) -> None:
+        driver = make_driver([b"a"], [])
+        driver.start()
+
+        self.assertEqual(driver.collect(5), [b"a"])
+
+    def test_collect_routes_chunks_and_skips_rejected_hits(self) -> None:
+        chunk = Chunk(bytes(32), 0, 4096)
+        driver = make_driver([b"a", chunk, b"b", b"c"])
+        chunks = []
+        driver.start()
+
+        results = driver.collect(
+            2, on_result=lambda hit: hit != b"b", on_chunk=chunks.append
+        )
+
+        self.assertEqual(results, [b"a", b"c"])
+        self.assertEqual(chunks, [chunk])
+
+    def test_cancel_token_records_first_cancel(self) -> None:
+        cancel_token = CancelToken()
+        self.assertFalse(cancel_token.wait(0))
+        self.assertEqual(cancel_token.value, 0)
+
+        cancel_token.value = 1
+        cancelled_at = cancel_token.cancelled_at
+        cancel_token.cancel()
+
+        self.assertTrue(cancel_token.wait(0))
+        self.assertGreater(cancelled_at, 0)
+        self.assertEqual(cancel_token.cancelled_at, cancelled_at)
+
+    def test_settings_binaries_compile_once_per_build_options(self) -> None:
+        settings = [
+            HostSetting("kernel", 8),
+            HostSetting("kernel", 8, vector_width=4),
+            HostSetting("kernel", 8),
+        ]
+        calls = []
+
+        def fake_binaries(devices, source, options):
+            calls.append((list(devices), tuple(options)))
+            return {i: f"{device}{options}".encode() for i, device in enumerate(devices)}
+
+        with mock.patch("core.driver.get_program_binaries", side_effect=fake_binaries):
+            binaries = get_settings_binaries(["gpu0", "cpu", "gpu1"], settings)
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(calls[0][0], ["gpu0", "gpu1"])
+        self.assertEqual(binaries[0], b"gpu0()")
+        self.assertEqual(binaries[2], b"gpu1()")
+        self.assertIn(b"VECTOR_WIDTH=4", binaries[1])
+
+    def test_work_ranges_follow_measured_speeds(self) -> None:
+        settings = [
+            HostSetting("kernel", 20),
+            HostSetting("kernel", 20, vector_width=8),
+        ]
+        searchers = []
+        for index, speed in enumerate((1e6, 3e6)):
+            searchers.append(mock.Mock(display_index=index, device_name="device"))
+            searchers[-1].measure_speed.return_value = speed
+
+        with mock.patch("core.driver.Searcher", side_effect=searchers):
+            with self.assertLogs(level="INFO"):
+                measure_work_ranges(settings)
+
+        self.assertEqual(settings[0].work_range, (0, 1 << 18))
+        self.assertEqual(settings[1].work_range, (1 << 18, 3 << 18))
+        self.assertTrue(all(searcher.close.called for searcher in searchers))
+
+    def test_unknown_driver_raises(self) -> None:
+        with self.assertRaises(ValueError):
+            create_driver("fiber", [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import hashlib
+import re
+import struct
+import unittest
+from pathlib import Path
+
+from nacl.signing import SigningKey
+
+from core.utils.ed25519 import (
+    LIMB_SHIFTS_51,
+    PRECOMP_SIZE,
+    WIDE_TABLE_MULTIPLES,
+    WIDE_TABLE_POSITIONS,
+    encode_point,
+    limbs_value,
+    scalar_mult,
+    wide_base_table,
+)
+
+KERNEL_PATH = Path(__file__).resolve().parents[1] / "core" / "opencl" / "kernel.cl"
+
+
+def kernel_base_table():
+    """
+    The 32 x 8 ge_precomp entries of ref10's base table in kernel.cl
+    """
+    source = KERNEL_PATH.read_text()
+    start = source.index("constant ge_precomp base[32][8]")
+    body = source[start : source.index("};", start)]
+    numbers = [int(n) for n in re.findall(r"-?\d+", body.split("=", 1)[1])]
+    return [numbers[i : i + 30] for i in range(0, len(numbers), 30)]
+
+
+class TestEd25519(unittest.TestCase):
+    def test_scalar_mult_matches_pynacl(self) -> None:
+        seed = bytes(range(1, 33))
+        digest = bytearray(hashlib.sha512(seed).digest()[:32])
+        digest[0] &= 248
+        digest[31] = (digest[31] & 127) | 64
+
+        point = scalar_mult(int.from_bytes(digest, "little"))
+
+        self.assertEqual(encode_point(point), bytes(SigningKey(seed).verify_key))
+
+    def test_wide_table_extends_the_ref10_table(self) -> None:
+        table = wide_base_table()
+        self.assertEqual(
+            len(table), WIDE_TABLE_POSITIONS * WIDE_TABLE_MULTIPLES * PRECOMP_SIZE
+        )
+
+        ref10 = kernel_base_table()
+        self.assertEqual(len(ref10), 32 * 8)
+        for index, expected in enumerate(ref10):
+            position, multiple = divmod(index, 8)
+            offset = (position * WIDE_TABLE_MULTIPLES + multiple) * PRECOMP_SIZE
+            limbs = struct.unpack_from("<30i", table, offset)
+            for fe in range(3):
+                self.assertEqual(
+                    limbs_value(list(limbs[10 * fe : 10 * fe + 10])),
+                    limbs_value(expected[10 * fe : 10 * fe + 10]),
+                )
+
+    def test_radix51_wide_table_holds_the_same_points(self) -> None:
+        ref10 = wide_base_table()
+        radix51 = wide_base_table("radix51")
+        self.assertEqual(len(radix51), len(ref10))
+
+        for index in (0, 1, 127, 128, 4095):
+            offset = index * PRECOMP_SIZE
+            limbs10 = struct.unpack_from("<30i", ref10, offset)
+            limbs51 = struct.unpack_from("<15Q", radix51, offset)
+            for fe in range(3):
+                self.assertEqual(
+                    limbs_value(list(limbs51[5 * fe : 5 * fe + 5]), LIMB_SHIFTS_51),
+                    limbs_value(list(limbs10[10 * fe : 10 * fe + 10])),
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
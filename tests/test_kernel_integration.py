@@ -5,12 +5,19 @@ from nacl.signing import SigningKey
 import pyopencl as cl
 
 from core.config import HostSetting
+from core.opencl.manager import DEFAULT_DEVICE_FILTER, filter_devices
 from core.searcher import Searcher
-from core.utils.helpers import load_kernel_source
+from core.utils.helpers import load_kernel_source, load_runtime_kernel_source
+from core.utils.keyspace import Chunk
+from core.utils.pattern import build_pattern_table
 
 
 class TestKernelIntegration(unittest.TestCase):
-    def _get_first_gpu_selection(self):
+    def _get_first_device_selection(self):
+        """
+        First device the searcher's default --device-type picks on a
+        platform: a GPU, or a CPU runtime such as PoCL without one
+        """
         try:
             platforms = cl.get_platforms()
         except Exception:
@@ -18,7 +25,7 @@ class TestKernelIntegration(unittest.TestCase):
 
         for p_index, platform in enumerate(platforms):
             try:
-                devices = platform.get_devices(device_type=cl.device_type.GPU)
+                devices = filter_devices(platform.get_devices(), DEFAULT_DEVICE_FILTER)
             except Exception:
                 continue
             if devices:
@@ -26,9 +33,9 @@ class TestKernelIntegration(unittest.TestCase):
         return None
 
     def test_kernel_output_matches_pynacl(self) -> None:
-        selection = self._get_first_gpu_selection()
+        selection = self._get_first_device_selection()
         if selection is None:
-            self.skipTest("No OpenCL GPU devices available")
+            self.skipTest("No OpenCL devices available")
 
         seed = bytes(range(1, 33))
         pubkey = b58encode(bytes(SigningKey(seed).verify_key)).decode()
@@ -44,11 +51,270 @@ class TestKernelIntegration(unittest.TestCase):
             setting=setting,
             chosen_devices=selection,
         )
-        cl.enqueue_copy(searcher.command_queue, searcher.memobj_output, bytearray(33)).wait()
-        result = searcher.find(log_stats=False)
+        results = searcher.find(log_stats=False)
 
-        self.assertEqual(result[0], len(pubkey))
-        self.assertEqual(bytes(result[1:33]), seed)
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0][0], len(pubkey))
+        self.assertEqual(bytes(results[0][1:33]), seed)
+
+    def test_runtime_pattern_switches_without_rebuild(self) -> None:
+        selection = self._get_first_device_selection()
+        if selection is None:
+            self.skipTest("No OpenCL devices available")
+
+        seed = bytes(range(1, 33))
+        pubkey = b58encode(bytes(SigningKey(seed).verify_key)).decode()
+        kernel_source = load_runtime_kernel_source()
+
+        setting = HostSetting(
+            kernel_source,
+            iteration_bits=0,
+            pattern_table=build_pattern_table(("zz",), "", True),
+        )
+        setting.local_work_size = 1
+        searcher = Searcher(
+            kernel_source=kernel_source,
+            index=0,
+            setting=setting,
+            chosen_devices=selection,
+        )
+        setting.key32 = bytearray(seed)
+        self.assertEqual(searcher.find(log_stats=False), [])
+
+        searcher.set_pattern_table(
+            build_pattern_table((pubkey[:2].swapcase(),), pubkey[-2:], False)
+        )
+        setting.key32 = bytearray(seed)
+        results = searcher.find(log_stats=False)
+
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0][0], len(pubkey))
+        self.assertEqual(bytes(results[0][1:33]), seed)
+
+    def test_find_returns_every_hit_of_a_launch(self) -> None:
+        selection = self._get_first_device_selection()
+        if selection is None:
+            self.skipTest("No OpenCL devices available")
+
+        # a single character suffix matches roughly one key in 58
+        kernel_source = load_kernel_source((), "2", True)
+        setting = HostSetting(kernel_source, iteration_bits=12)
+        searcher = Searcher(
+            kernel_source=kernel_source,
+            index=0,
+            setting=setting,
+            chosen_devices=selection,
+        )
+        results = searcher.find(log_stats=False)
+
+        self.assertGreater(len(results), 1)
+        seeds = {bytes(result[1:33]) for result in results}
+        self.assertEqual(len(seeds), len(results))
+        for seed in seeds:
+            pubkey = b58encode(bytes(SigningKey(seed).verify_key)).decode()
+            self.assertTrue(pubkey.endswith("2"))
+
+    def test_overflowing_launch_is_not_complete(self) -> None:
+        selection = self._get_first_device_selection()
+        if selection is None:
+            self.skipTest("No OpenCL devices available")
+
+        kernel_source = load_kernel_source((), "2", True)
+        setting = HostSetting(kernel_source, iteration_bits=12)
+        setting.result_capacity = 2
+        searcher = Searcher(
+            kernel_source=kernel_source,
+            index=0,
+            setting=setting,
+            chosen_devices=selection,
+        )
+        with self.assertLogs(level="WARNING"):
+            results = searcher.find(log_stats=False)
+        searcher.close()
+
+        # hits were dropped, the chunk has to be searched again
+        self.assertEqual(len(results), 2)
+        self.assertIsNone(searcher.completed_chunk)
+
+    def test_chunks_fill_whole_work_groups(self) -> None:
+        selection = self._get_first_device_selection()
+        if selection is None:
+            self.skipTest("No OpenCL devices available")
+
+        kernel_source = load_kernel_source((), "2", True)
+        setting = HostSetting(kernel_source, iteration_bits=12)
+        searcher = Searcher(
+            kernel_source=kernel_source,
+            index=0,
+            setting=setting,
+            chosen_devices=selection,
+        )
+        # padding the last work group would wrap around to keys 0..15
+        with self.assertRaises(ValueError):
+            searcher.enqueue_launch(Chunk(bytes(setting.key32), 0, 48))
+        searcher.close()
+
+        # a keyspace smaller than a work group gets a smaller group
+        setting = HostSetting(kernel_source, iteration_bits=3)
+        searcher = Searcher(
+            kernel_source=kernel_source,
+            index=0,
+            setting=setting,
+            chosen_devices=selection,
+        )
+        searcher.find(log_stats=False)
+        searcher.close()
+        self.assertEqual(setting.local_work_size, 8)
+
+    def test_pipelined_launches_cover_distinct_keys(self) -> None:
+        selection = self._get_first_device_selection()
+        if selection is None:
+            self.skipTest("No OpenCL devices available")
+
+        kernel_source = load_kernel_source((), "2", True)
+        setting = HostSetting(kernel_source, iteration_bits=12)
+        setting.pipeline_depth = 3
+        searcher = Searcher(
+            kernel_source=kernel_source,
+            index=0,
+            setting=setting,
+            chosen_devices=selection,
+        )
+        seeds = set()
+        for _ in range(4):
+            for result in searcher.find(log_stats=False):
+                seed = bytes(result[1:33])
+                self.assertNotIn(seed, seeds)
+                seeds.add(seed)
+        searcher.close()
+
+        self.assertGreater(len(seeds), 4)
+
+    def test_abort_drains_queued_launches(self) -> None:
+        selection = self._get_first_device_selection()
+        if selection is None:
+            self.skipTest("No OpenCL devices available")
+
+        kernel_source = load_kernel_source((), "2", True)
+        setting = HostSetting(kernel_source, iteration_bits=16)
+        searcher = Searcher(
+            kernel_source=kernel_source,
+            index=0,
+            setting=setting,
+            chosen_devices=selection,
+        )
+        searcher.abort()
+        searcher.abort_queue.finish()
+
+        # every work item returns before computing a key
+        self.assertEqual(searcher.find(log_stats=False), [])
+        searcher.close()
+
+    def test_keys_per_item_covers_the_same_keys(self) -> None:
+        selection = self._get_first_device_selection()
+        if selection is None:
+            self.skipTest("No OpenCL devices available")
+
+        kernel_source = load_kernel_source((), "2", True)
+        seeds = []
+        for keys_per_item in (1, 4):
+            setting = HostSetting(kernel_source, 12, keys_per_item=keys_per_item)
+            setting.key32 = bytearray(range(32))
+            setting.key32[-2:] = b"\x00\x00"
+            searcher = Searcher(
+                kernel_source=kernel_source,
+                index=0,
+                setting=setting,
+                chosen_devices=selection,
+            )
+            seeds.append({bytes(r[1:33]) for r in searcher.find(log_stats=False)})
+            searcher.close()
+
+        self.assertGreater(len(seeds[0]), 0)
+        self.assertEqual(seeds[0], seeds[1])
+
+    def test_wide_base_table_finds_the_same_keys(self) -> None:
+        selection = self._get_first_device_selection()
+        if selection is None:
+            self.skipTest("No OpenCL devices available")
+
+        kernel_source = load_kernel_source((), "2", True)
+        seeds = []
+        for base_table in ("ref10", "wide"):
+            setting = HostSetting(kernel_source, 12, base_table=base_table)
+            setting.key32 = bytearray(range(32))
+            setting.key32[-2:] = b"\x00\x00"
+            searcher = Searcher(
+                kernel_source=kernel_source,
+                index=0,
+                setting=setting,
+                chosen_devices=selection,
+            )
+            seeds.append({bytes(r[1:33]) for r in searcher.find(log_stats=False)})
+            searcher.close()
+
+        self.assertGreater(len(seeds[0]), 0)
+        self.assertEqual(seeds[0], seeds[1])
+
+    def test_radix51_field_finds_the_same_keys(self) -> None:
+        selection = self._get_first_device_selection()
+        if selection is None:
+            self.skipTest("No OpenCL devices available")
+
+        kernel_source = load_kernel_source((), "2", True)
+        seeds = []
+        for field, base_table in (
+            ("ref10", "ref10"),
+            ("radix51", "ref10"),
+            ("radix51", "wide"),
+        ):
+            setting = HostSetting(
+                kernel_source, 12, base_table=base_table, field=field
+            )
+            setting.key32 = bytearray(range(32))
+            setting.key32[-2:] = b"\x00\x00"
+            searcher = Searcher(
+                kernel_source=kernel_source,
+                index=0,
+                setting=setting,
+                chosen_devices=selection,
+            )
+            seeds.append({bytes(r[1:33]) for r in searcher.find(log_stats=False)})
+            searcher.close()
+
+        self.assertGreater(len(seeds[0]), 0)
+        self.assertEqual(seeds[0], seeds[1])
+        self.assertEqual(seeds[0], seeds[2])
+
+    def test_variable_time_lookups_find_the_same_keys(self) -> None:
+        selection = self._get_first_device_selection()
+        if selection is None:
+            self.skipTest("No OpenCL devices available")
+
+        kernel_source = load_kernel_source((), "2", True)
+        seeds = []
+        for lookup, table_memory in (
+            ("constant-time", "constant"),
+            ("variable-time", "constant"),
+            ("variable-time", "local"),
+        ):
+            setting = HostSetting(
+                kernel_source, 12, lookup=lookup, table_memory=table_memory
+            )
+            setting.key32 = bytearray(range(32))
+            setting.key32[-2:] = b"\x00\x00"
+            searcher = Searcher(
+                kernel_source=kernel_source,
+                index=0,
+                setting=setting,
+                chosen_devices=selection,
+            )
+            seeds.append({bytes(r[1:33]) for r in searcher.find(log_stats=False)})
+            searcher.close()
+
+        self.assertGreater(len(seeds[0]), 0)
+        self.assertEqual(seeds[0], seeds[1])
+        self.assertEqual(seeds[0], seeds[2])
 
 
 if __name__ == "__main__":
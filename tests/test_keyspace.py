@@ -0,0 +1,81 @@
+import threading
+import unittest
+
+from core.utils.keyspace import FIRST_CHUNK_KEYS, Chunk, KeyspaceAllocator
+
+BASE_SEED = bytes(range(1, 31)) + bytes(2)
+
+
+class TestKeyspaceAllocator(unittest.TestCase):
+    def test_chunks_are_consecutive_and_stay_in_one_block(self) -> None:
+        allocator = KeyspaceAllocator(16, 3, 4096, base_seed=BASE_SEED)
+
+        chunks = [allocator.allocate(0) for _ in range(4)]
+
+        # an even share of a block, rounded down to the granularity
+        self.assertEqual(chunks[0], Chunk(BASE_SEED, 0, 20480))
+        self.assertEqual(chunks[2], Chunk(BASE_SEED, 40960, 20480))
+        # the last chunk of a block is cut at its end
+        self.assertEqual(chunks[3], Chunk(BASE_SEED, 61440, 4096))
+        self.assertEqual(allocator.cursor, 1 << 16)
+        next_block = allocator.allocate(0)
+        self.assertEqual(next_block.seed[-3:], b"\x1f\x00\x00")
+        self.assertEqual(next_block.offset, 0)
+
+    def test_chunk_size_follows_recorded_speed(self) -> None:
+        allocator = KeyspaceAllocator(24, 2, 1024, chunk_seconds=0.5)
+        allocator.record(1, 1 << 20, 0.5)
+        allocator.record(1, 1 << 21, 0.5)
+
+        self.assertEqual(allocator.chunk_size(0), FIRST_CHUNK_KEYS)
+        # halfway between the 2 and 4 million keys per second launches
+        self.assertEqual(allocator.chunk_size(1), 3 << 19)
+
+    def test_launch_limit_caps_chunks(self) -> None:
+        allocator = KeyspaceAllocator(24, 1, 1024)
+        allocator.record(0, 1 << 24, 1.0)
+        allocator.set_limit(0, 5000)
+
+        self.assertEqual(allocator.allocate(0).size, 4096)
+
+    def test_64_bit_blocks(self) -> None:
+        allocator = KeyspaceAllocator(64, 300, 8192, base_seed=bytes(32))
+        allocator.allocate(0)
+        allocator.record(299, 1 << 40, 1.0)
+
+        chunk = allocator.allocate(299)
+
+        self.assertEqual(chunk.offset, FIRST_CHUNK_KEYS)
+        self.assertEqual(chunk.size, 1 << 38)
+        self.assertEqual(chunk.seed, bytes(32))
+
+    def test_concurrent_allocations_never_overlap(self) -> None:
+        allocator = KeyspaceAllocator(20, 4, 256)
+        chunks = []
+        lock = threading.Lock()
+
+        def work(device: int) -> None:
+            for _ in range(50):
+                chunk = allocator.allocate(device)
+                with lock:
+                    chunks.append(chunk)
+
+        threads = [threading.Thread(target=work, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        spans = sorted(
+            (int.from_bytes(c.seed, "big") + c.offset, c.size) for c in chunks
+        )
+        for (start, size), (next_start, _) in zip(spans, spans[1:]):
+            self.assertEqual(start + size, next_start)
+
+    def test_resume_cursor_must_be_aligned(self) -> None:
+        with self.assertRaises(ValueError):
+            KeyspaceAllocator(16, 1, 4096, cursor=100)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,28 @@
+import unittest
+from types import SimpleNamespace
+
+import pyopencl as cl
+
+from core.opencl.manager import filter_devices
+
+GPU = SimpleNamespace(type=cl.device_type.GPU)
+CPU = SimpleNamespace(type=cl.device_type.CPU | cl.device_type.DEFAULT)
+
+
+class TestFilterDevices(unittest.TestCase):
+    def test_auto_prefers_gpus(self) -> None:
+        self.assertEqual(filter_devices([CPU, GPU], "auto"), [GPU])
+        self.assertEqual(filter_devices([CPU], "auto"), [CPU])
+
+    def test_explicit_types(self) -> None:
+        self.assertEqual(filter_devices([CPU, GPU], "cpu"), [CPU])
+        self.assertEqual(filter_devices([CPU, GPU], "gpu"), [GPU])
+        self.assertEqual(filter_devices([CPU, GPU], "all"), [CPU, GPU])
+
+    def test_unknown_filter_raises(self) -> None:
+        with self.assertRaises(ValueError):
+            filter_devices([GPU], "fpga")
+
+
+if __name__ == "__main__":
+    unittest.main()
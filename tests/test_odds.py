@@ -0,0 +1,108 @@
+import math
+import unittest
+
+from core.utils.odds import (
+    check_pattern,
+    format_duration,
+    hits_by,
+    pattern_odds,
+    prefilter_probability,
+    prefix_probability,
+    suffix_probability,
+    time_to_hits,
+)
+
+
+class TestPatternOdds(unittest.TestCase):
+    def test_leading_ones_are_zero_bytes(self) -> None:
+        self.assertEqual(prefix_probability(["1"], True), 1 / 256)
+        self.assertEqual(prefix_probability(["11"], True), 1 / 256**2)
+
+    def test_leading_digit_is_not_uniform(self) -> None:
+        # 2^256 lies between 2 * 58^43 and 3 * 58^43: 44 character addresses
+        # start with 1 or 2 only, most of the keys
+        self.assertGreater(prefix_probability(["2"], True), 0.05)
+        self.assertLess(prefix_probability(["W"], True), 0.002)
+
+    def test_case_insensitive_counts_both_cases(self) -> None:
+        sensitive = prefix_probability(["Wat"], True)
+        insensitive = prefix_probability(["Wat"], False)
+        self.assertGreater(insensitive, 4 * sensitive)
+        self.assertEqual(
+            prefix_probability(["wat", "WAT"], False), insensitive
+        )
+
+    def test_overlapping_prefixes_count_once(self) -> None:
+        self.assertEqual(
+            prefix_probability(["Ab", "A"], True), prefix_probability(["A"], True)
+        )
+        self.assertAlmostEqual(
+            prefix_probability(["Ab", "Ac"], True),
+            2 * prefix_probability(["Ab"], True),
+        )
+
+    def test_suffix_digits_are_uniform(self) -> None:
+        self.assertEqual(suffix_probability(["ab"], True), 1 / 58**2)
+        self.assertEqual(suffix_probability(["ab"], False), 4 / 58**2)
+        self.assertEqual(suffix_probability(["ab", "b"], True), 1 / 58)
+
+    def test_joint_odds(self) -> None:
+        odds = pattern_odds(["Wat"], ["ab"], True)
+        self.assertAlmostEqual(odds.probability / (odds.prefix / 58**2), 1)
+        self.assertEqual(odds.expected_keys, 1 / odds.probability)
+        odds = pattern_odds(["Wat", "x"], ["ab", "C"], False)
+        self.assertAlmostEqual(odds.probability / (odds.prefix * odds.suffix), 1)
+
+    def test_joint_odds_of_overlapping_patterns(self) -> None:
+        # 32 leading ones are the zero key, whose address has no other digit
+        odds = pattern_odds(["1" * 32], ["2"], True)
+        self.assertGreater(odds.prefix * odds.suffix, 0)
+        self.assertEqual(odds.probability, 0)
+        self.assertEqual(pattern_odds(["1" * 32], ["1"], True).probability, 2**-256)
+
+    def test_prefilters_pass_what_they_are_built_for(self) -> None:
+        # exact prefix ranges, suffixes within the residue digits
+        self.assertAlmostEqual(
+            prefilter_probability(["Wat"], [], True), prefix_probability(["Wat"], True)
+        )
+        self.assertEqual(prefilter_probability([], ["ab", "b"], True), 1 / 58)
+        self.assertAlmostEqual(
+            prefilter_probability(["Wat"], ["ab"], False),
+            prefix_probability(["Wat"], False) * 4 / 58**2,
+        )
+        self.assertEqual(prefilter_probability([], [], True), 1.0)
+
+    def test_impossible_patterns_are_rejected(self) -> None:
+        with self.assertRaises(ValueError):
+            check_pattern(["1" * 33], [], True)
+        with self.assertRaises(ValueError):
+            check_pattern(["0"], [], True)
+        with self.assertRaises(ValueError):
+            check_pattern(["A" * 30], ["b" * 20], True)
+        with self.assertRaises(ValueError):
+            check_pattern(["1" * 32], ["2"], True)
+        check_pattern(["1" * 32], [], True)
+
+
+class TestTimeToHits(unittest.TestCase):
+    def test_single_hit_is_exponential(self) -> None:
+        eta = time_to_hits(1e-6, 1e6)
+        self.assertEqual(eta.expected, 1.0)
+        self.assertAlmostEqual(eta.p50, math.log(2))
+        self.assertAlmostEqual(eta.p90, math.log(10))
+        self.assertAlmostEqual(eta.p99, math.log(100))
+
+    def test_many_hits_concentrate_around_the_mean(self) -> None:
+        eta = time_to_hits(1e-6, 1e6, 1000)
+        self.assertEqual(eta.expected, 1000)
+        self.assertLess(eta.p50, 1000)
+        self.assertLess(eta.p99, 1100)
+        self.assertAlmostEqual(hits_by(1000, 1000), 0.5, places=1)
+
+    def test_no_throughput_never_finishes(self) -> None:
+        self.assertEqual(format_duration(time_to_hits(1e-6, 0).p90), "never")
+        self.assertEqual(format_duration(3661), "1:01:01")
+
+
+if __name__ == "__main__":
+    unittest.main()
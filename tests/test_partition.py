@@ -0,0 +1,32 @@
+import unittest
+
+from core.utils.partition import partition_work
+
+
+class TestPartitionWork(unittest.TestCase):
+    def test_ranges_are_contiguous_and_proportional(self) -> None:
+        ranges = partition_work(1 << 20, [3.0, 1.0], 256)
+
+        self.assertEqual(ranges, [(0, 3 << 18), (3 << 18, 1 << 18)])
+
+    def test_offsets_are_aligned_and_cover_the_total(self) -> None:
+        ranges = partition_work(10_000, [5.0, 0.0, 2.0], 256)
+
+        self.assertEqual(ranges[0][0], 0)
+        for (offset, size), (next_offset, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(offset % 256, 0)
+            self.assertEqual(offset + size, next_offset)
+        self.assertEqual(sum(size for _, size in ranges), 10_000)
+        # a device measured at zero still gets one granule
+        self.assertEqual(ranges[1][1], 256)
+
+    def test_too_few_granules_go_to_the_last_range(self) -> None:
+        self.assertEqual(partition_work(100, [1.0, 1.0], 256), [(0, 0), (0, 100)])
+
+    def test_invalid_weights_raise(self) -> None:
+        with self.assertRaises(ValueError):
+            partition_work(1024, [0.0, 0.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import struct
+import unittest
+
+from core.utils.pattern import PATTERN_HEADER_WORDS, build_pattern_table
+from core.utils.ranges import RANGE_WORDS
+
+
+def unpack_header(table: bytes):
+    return struct.unpack_from(f"<{PATTERN_HEADER_WORDS}I", table)
+
+
+class TestPatternTable(unittest.TestCase):
+    def test_header_and_tables(self) -> None:
+        table = build_pattern_table(("So", "Sot"), ("L", "xy"), False)
+
+        header = unpack_header(table)
+        self.assertEqual(header[:6], (2, 3, 2, 2, 0, 0))
+        body = table[PATTERN_HEADER_WORDS * 4 :]
+        self.assertEqual(body[:6], b"So\x00Sot")
+        self.assertEqual(body[6:10], b"\x00Lxy")
+        # prefix ranges and suffix residues follow the word aligned tables
+        self.assertGreater(header[6], 0)
+        # "l" is not base58 so "L" has one residue, "xy" folds to four
+        self.assertEqual(header[7], 5)
+        residues = body[12 + header[6] * RANGE_WORDS * 4 :]
+        self.assertEqual(struct.unpack_from("<5I", residues), (1, 4, 0, 0, 0))
+        self.assertEqual(len(residues), (5 + header[7]) * 4)
+
+    def test_missing_side_matches_everything(self) -> None:
+        table = build_pattern_table((), "abc", True)
+
+        prefix_count, prefix_width, suffix_count, suffix_width = unpack_header(table)[:4]
+        self.assertEqual((prefix_count, prefix_width), (1, 0))
+        self.assertEqual((suffix_count, suffix_width), (1, 3))
+        self.assertEqual(unpack_header(table)[6], 0)
+
+    def test_pairs_are_appended(self) -> None:
+        table = build_pattern_table(("a", "b"), ("c",), True, pairs=[(1, 0), (0, 0)])
+
+        self.assertEqual(unpack_header(table)[5], 2)
+        body = table[PATTERN_HEADER_WORDS * 4 :]
+        self.assertEqual(body[3:7], bytes([1, 0, 0, 0]))
+
+    def test_invalid_pair_raises(self) -> None:
+        with self.assertRaises(ValueError):
+            build_pattern_table(("a",), ("c",), True, pairs=[(1, 0)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from core.config import HostSetting
+from core.opencl import profile
+
+DEVICE = SimpleNamespace(
+    name="Device",
+    version="OpenCL 3.0",
+    driver_version="1.0",
+    platform=SimpleNamespace(name="Platform", version="OpenCL 3.0"),
+)
+TUNED = profile.DeviceProfile(128, 8, 8, ("-cl-mad-enable",), 1 << 20, 5e6)
+
+
+class TestDeviceProfile(unittest.TestCase):
+    def setUp(self) -> None:
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        patcher = mock.patch.dict(os.environ, {"VANITY_PROFILE_DIR": tmpdir.name})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_save_and_load(self) -> None:
+        self.assertIsNone(profile.load_profile(DEVICE))
+
+        path = profile.save_profile(DEVICE, TUNED)
+
+        self.assertEqual(profile.load_profile(DEVICE), TUNED)
+        self.assertIn('"driver_version": "1.0"', path.read_text())
+
+    def test_default_setting_takes_the_profile_once(self) -> None:
+        profile.save_profile(DEVICE, TUNED)
+        setting = HostSetting("kernel", 24)
+
+        self.assertEqual(profile.apply_profile(setting, DEVICE), TUNED)
+        self.assertEqual(
+            (setting.local_work_size, setting.keys_per_item, setting.vector_width),
+            (128, 8, 8),
+        )
+        self.assertEqual(setting.build_options, ("-cl-mad-enable",))
+        self.assertEqual(setting.launch_keys, 1 << 20)
+        self.assertIsNone(profile.apply_profile(setting, DEVICE))
+
+    def test_explicit_variant_keeps_its_setting(self) -> None:
+        profile.save_profile(DEVICE, TUNED)
+        setting = HostSetting("kernel", 24, keys_per_item=2)
+
+        self.assertIsNone(profile.apply_profile(setting, DEVICE))
+        self.assertEqual((setting.keys_per_item, setting.local_work_size), (2, 32))
+
+    def test_invalid_profile_is_ignored(self) -> None:
+        for fields in (
+            {"local_work_size": 48},
+            {"local_work_size": 512},
+            {"vector_width": 2},
+            {"launch_keys": 1000},
+        ):
+            profile.save_profile(DEVICE, TUNED._replace(**fields))
+            with self.assertLogs(level="WARNING"):
+                self.assertIsNone(profile.load_profile(DEVICE), fields)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import bisect
+import random
+import unittest
+
+from base58 import b58decode, b58encode
+
+from core.utils.ranges import (
+    ALPHABET,
+    adjust_case,
+    build_prefix_ranges,
+    build_suffix_residues,
+    coarsen_ranges,
+    pack_ranges,
+    residue_words,
+)
+
+
+def address(key: int) -> str:
+    return b58encode(key.to_bytes(32, "big")).decode()
+
+
+def in_ranges(ranges, key: int) -> bool:
+    i = bisect.bisect_right([low for low, _ in ranges], key)
+    return i > 0 and key <= ranges[i - 1][1]
+
+
+def folded(text: str):
+    return [adjust_case(ALPHABET.index(c)) for c in text]
+
+
+class TestPrefixRanges(unittest.TestCase):
+    def test_ranges_match_base58_prefixes(self) -> None:
+        rng = random.Random(7)
+        cases = [("2", True), ("So", True), ("so", False), ("1A", True), ("11", True)]
+        for prefix, is_case_sensitive in cases:
+            ranges = build_prefix_ranges([prefix], is_case_sensitive)
+            for _ in range(3000):
+                # a few keys with leading zero bytes, which encode as '1'
+                key = rng.getrandbits(256 - 8 * rng.choice([0, 0, 0, 1, 2]))
+                head = address(key)[: len(prefix)]
+                if is_case_sensitive:
+                    expected = head == prefix
+                else:
+                    expected = folded(head) == folded(prefix)
+                self.assertEqual(in_ranges(ranges, key), expected, (prefix, key))
+
+    def test_range_bounds_are_tight(self) -> None:
+        for low, high in build_prefix_ranges(["Sot", "z"], True):
+            self.assertTrue(address(low).startswith(("Sot", "z")))
+            self.assertTrue(address(high).startswith(("Sot", "z")))
+            self.assertFalse(address(low - 1).startswith(("Sot", "z")))
+
+    def test_no_ranges_without_prefix(self) -> None:
+        self.assertEqual(build_prefix_ranges([], True), [])
+        self.assertEqual(build_prefix_ranges(["ab", ""], True), [])
+
+    def test_long_case_insensitive_prefix_is_capped(self) -> None:
+        prefix = "abcdefghijkmn"
+        ranges = build_prefix_ranges([prefix], False, max_ranges=32)
+
+        self.assertLessEqual(len(ranges), 32)
+        # the shortened filter still admits every case variant
+        rng = random.Random(3)
+        for _ in range(200):
+            variant = "".join(rng.choice((c, c.upper())) for c in prefix)
+            variant = variant.replace("L", "l").replace("I", "i")
+            filler = "".join(rng.choice(ALPHABET) for _ in range(43 - len(prefix)))
+            key = int.from_bytes(b58decode(variant + filler), "big")
+            self.assertTrue(in_ranges(ranges, key), variant)
+
+    def test_coarsen_keeps_a_superset(self) -> None:
+        ranges = [(0, 1), (5, 6), (8, 9), (20, 30)]
+
+        self.assertEqual(coarsen_ranges(ranges, 2), [(0, 9), (20, 30)])
+
+    def test_pack_ranges_most_significant_word_first(self) -> None:
+        packed = pack_ranges([(1, 2**256 - 1)])
+
+        self.assertEqual(len(packed), 64)
+        self.assertEqual(packed[28:32], (1).to_bytes(4, "little"))
+        self.assertEqual(packed[32:], b"\xff" * 32)
+
+
+class TestSuffixResidues(unittest.TestCase):
+    def test_residues_match_base58_suffixes(self) -> None:
+        rng = random.Random(11)
+        suffixes = ["2", "zZ", "abcdefg"]
+        for is_case_sensitive in (True, False):
+            groups = build_suffix_residues(suffixes, is_case_sensitive)
+            for _ in range(3000):
+                key = rng.getrandbits(256)
+                tail = address(key)
+                matched = any(
+                    key % 58 ** (m + 1) in group for m, group in enumerate(groups)
+                )
+                if is_case_sensitive:
+                    expected = tail.endswith(tuple(s[-5:] for s in suffixes))
+                else:
+                    expected = any(
+                        folded(tail[-len(s[-5:]) :]) == folded(s[-5:])
+                        for s in suffixes
+                    )
+                self.assertEqual(matched, expected, tail)
+
+    def test_residue_cap_shortens_suffixes(self) -> None:
+        groups = build_suffix_residues(["abcde"], False, max_residues=8)
+
+        self.assertEqual([len(g) for g in groups], [0, 0, 8, 0, 0])
+        self.assertEqual(residue_words(groups)[:5], [0, 0, 8, 0, 0])
+
+    def test_no_residues_without_suffix(self) -> None:
+        self.assertEqual(build_suffix_residues([], True), [[], [], [], [], []])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import queue
+import unittest
+from unittest import mock
+
+from core import searcher
+from core.config import HostSetting
+from core.utils.cancel import CancelToken
+
+
+class FakeSearcher:
+    def __init__(self, cancel_token, launches):
+        self.cancel_token = cancel_token
+        self.launches = list(launches)
+        self.aborted = False
+        self.closed = False
+        self.display_index = 0
+
+    def find(self, log_stats: bool = True):
+        results = self.launches.pop(0)
+        if not self.launches:
+            self.cancel_token.cancel()
+        return results
+
+    def abort(self) -> None:
+        self.aborted = True
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class TestSearchWorker(unittest.TestCase):
+    def test_streams_hits_of_every_launch_until_stopped(self) -> None:
+        cancel_token = CancelToken()
+        result_queue = queue.Queue()
+        fake = FakeSearcher(
+            cancel_token,
+            [[bytearray(b"\x2c" + bytes(32))], [], [bytearray(b"\x2b" + bytes(32))]],
+        )
+
+        with mock.patch.object(searcher, "Searcher", return_value=fake) as build:
+            with self.assertLogs(level="INFO") as logs:
+                searcher.search_worker(
+                    0, HostSetting("", 8), cancel_token, result_queue
+                )
+
+        build.assert_called_once()
+        self.assertTrue(fake.closed)
+        self.assertIn("after cancel", logs.output[-1])
+        self.assertEqual(result_queue.get_nowait(), b"\x2c" + bytes(32))
+        self.assertEqual(result_queue.get_nowait(), b"\x2b" + bytes(32))
+        self.assertIsNone(result_queue.get_nowait())
+
+    def test_failure_still_signals_exit(self) -> None:
+        result_queue = queue.Queue()
+
+        with mock.patch.object(searcher, "Searcher", side_effect=RuntimeError):
+            with self.assertLogs(level="ERROR"):
+                searcher.search_worker(
+                    0, HostSetting("", 8), CancelToken(), result_queue
+                )
+
+        self.assertIsNone(result_queue.get_nowait())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import json
+import os
+import pickle
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+from core.utils.trace import HOST_PID, QUEUE_TID, Tracer, device_pid
+
+
+class TestTracer(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "trace.json")
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def load(self):
+        with open(self.path) as f:
+            return json.load(f)["traceEvents"]
+
+    def test_device_commands_are_shifted_onto_the_host_clock(self) -> None:
+        tracer = Tracer(self.path)
+        profile = SimpleNamespace(queued=1000, submit=2000, start=5000, end=9000)
+
+        tracer.device_command(
+            "generate_pubkey",
+            SimpleNamespace(profile=profile),
+            10_000,
+            device_pid(0),
+            QUEUE_TID,
+            keys=256,
+        )
+        tracer.save()
+
+        (event,) = self.load()
+        self.assertEqual(event["ts"], 15.0)
+        self.assertEqual(event["dur"], 4.0)
+        self.assertEqual(event["pid"], 1)
+        self.assertEqual(
+            event["args"],
+            {"keys": 256, "queued_us": 11.0, "submit_us": 12.0, "wait_us": 4.0},
+        )
+
+    def test_events_of_every_copy_are_merged(self) -> None:
+        tracer = Tracer(self.path)
+        tracer.name_process(HOST_PID, "Host", {0: "main"})
+        # a worker's copy, as in a spawned process
+        worker = pickle.loads(pickle.dumps(tracer))
+        with worker.span("wait for launch", device_pid(0)):
+            pass
+        worker.flush()
+        with tracer.span("save_keypair", HOST_PID):
+            pass
+
+        self.assertEqual(tracer.save(), tracer.path)
+
+        events = self.load()
+        self.assertEqual(
+            [event["name"] for event in events],
+            ["process_name", "thread_name", "wait for launch", "save_keypair"],
+        )
+        self.assertFalse(tracer.parts_dir.exists())
+
+    def test_parts_of_an_earlier_run_are_dropped(self) -> None:
+        stale = Tracer(self.path)
+        with stale.span("stale", HOST_PID):
+            pass
+        stale.flush()
+
+        Tracer(self.path).save()
+
+        self.assertEqual(self.load(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()